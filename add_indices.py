@@ -1,45 +1,83 @@
 #!/usr/bin/env python3
 import json
+import os
+import shutil
 import sys
+import tempfile
+
+from json_stream import JSONStreamReader
+
+def write_indexed(obj, index, outfile, array_mode):
+    if isinstance(obj, dict):
+        obj['_index'] = index
+    else:
+        print(f"Warning: Item at position {index} is not an object")
+    if array_mode:
+        # Same layout json.dump(data, indent=2) gives each array element
+        text = json.dumps(obj, indent=2, ensure_ascii=False)
+        outfile.write("  " + text.replace("\n", "\n  "))
+    else:
+        outfile.write(json.dumps(obj, ensure_ascii=False))
+        outfile.write("\n")
+
 
 def add_indices_to_json(file_path):
-    """Add _index property to each object in a JSON array."""
+    """Add _index property to each object in a JSON array.
+
+    Also accepts NDJSON and concatenated JSON documents, each document
+    being one object (rewritten one per line). Elements are streamed, so
+    memory stays flat, into a temporary file that atomically replaces the
+    original once complete.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    tmp_path = None
     try:
-        # Read the JSON file
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Check if it's a list
-        if not isinstance(data, list):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        count = 0
+        with open(file_path, 'r', encoding='utf-8') as infile, \
+                os.fdopen(fd, 'w', encoding='utf-8') as outfile:
+            reader = JSONStreamReader(infile)
+            array_mode = reader.peek() == "["
+            if array_mode:
+                reader.pos += 1
+                outfile.write("[")
+                for obj in reader.array_items():
+                    outfile.write(",\n" if count else "\n")
+                    write_indexed(obj, count, outfile, True)
+                    count += 1
+                outfile.write("\n]" if count else "]")
+                if reader.peek():
+                    raise reader.error("Extra data")
+            else:
+                # NDJSON or concatenated documents
+                while reader.peek():
+                    obj = reader.value()
+                    write_indexed(obj, count, outfile, False)
+                    count += 1
+
+        if not array_mode and count == 0:
             print("Error: JSON file must contain an array of objects")
+            os.unlink(tmp_path)
             return False
-        
-        # Add _index property to each object
-        for i, obj in enumerate(data):
-            if isinstance(obj, dict):
-                obj['_index'] = i
-            else:
-                print(f"Warning: Item at position {i} is not an object")
-        
-        # Write back to file with proper formatting
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        
-        print(f"Successfully added indices to {len(data)} objects")
+
+        shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+        print(f"Successfully added indices to {count} objects")
         return True
-        
+
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON: {e}")
-        return False
     except Exception as e:
         print(f"Error: {e}")
-        return False
+    if tmp_path and os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+    return False
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
         print("Usage: python add_indices.py <json_file>")
         sys.exit(1)
-    
+
     file_path = sys.argv[1]
     success = add_indices_to_json(file_path)
     sys.exit(0 if success else 1)
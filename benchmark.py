@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+# Benchmarks the converter and inference tools on synthetic inputs.
+#
+# Inputs are generated from a fixed seed (pipelines of 10-5000 processors,
+# nested fields.yml group trees, expected-JSON corpora of a given size),
+# each function is timed over a few rounds and run once more under
+# tracemalloc for its peak memory. Results are written as JSON, and
+# --compare prints the change against an earlier results file.
+
+import argparse
+import contextlib
+import copy
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import expected_types
+from add_indices import add_indices_to_json
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DEFAULT_OUTPUT = "benchmark-results.json"
+DEFAULT_ROUNDS = 3
+DEFAULT_SEED = 1234
+DEFAULT_THRESHOLD = 10.0
+
+PIPELINE_SIZES = [10, 100, 1000, 5000]
+FIELDS_DEPTHS = [4, 16, 64]
+JSON_SIZES_MB = [1, 16, 128]
+QUICK = {"pipelines": [10, 100], "depths": [4, 16], "json_mb": [1]}
+# Calls per timed round for the functions that take microseconds
+INNER_LOOPS = 100
+
+DATE_FORMATS = ["yyyy-MM-dd HH:mm:ss", "MMM dd yyyy HH:mm:ss", "EEE MMM d HH:mm:ss yyyy",
+                "dd/MMM/yyyy:HH:mm:ss", "yy-M-d hh:mm:ss a", "ISO8601"]
+WORDS = ["source", "destination", "user", "process", "file", "network", "host", "event",
+         "http", "url", "dns", "rule", "threat", "observer", "client", "server"]
+
+
+def load_script(name, file_name):
+    """Import one of the hyphenated scripts as a module."""
+    spec = importlib.util.spec_from_file_location(name, SCRIPT_DIR / file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Generators
+
+def field_name(rng, depth=3):
+    return ".".join(rng.choice(WORDS) for _ in range(rng.randint(1, depth)))
+
+
+def generate_processor(rng):
+    field = field_name(rng)
+    condition = f"ctx.{field.replace('.', '?.')} != null" if rng.random() < 0.3 else None
+    kind = rng.choice(["set", "rename", "convert", "date", "lowercase", "remove", "grok",
+                       "dissect", "append", "trim", "split", "gsub"])
+    if kind == "set":
+        body = {"field": field, "value": rng.choice(WORDS)}
+    elif kind == "rename":
+        body = {"field": f"cisco.{field}", "target_field": field}
+    elif kind == "convert":
+        body = {"field": field, "type": rng.choice(["long", "ip", "boolean"])}
+    elif kind == "date":
+        body = {"field": field, "target_field": "@timestamp",
+                "formats": rng.sample(DATE_FORMATS, 2)}
+    elif kind in ("lowercase", "trim"):
+        body = {"field": field}
+    elif kind == "remove":
+        body = {"field": [field_name(rng) for _ in range(rng.randint(1, 3))]}
+    elif kind == "grok":
+        body = {"field": "message",
+                "patterns": ["%{SYSLOGTIMESTAMP:ts} %{HOSTNAME:host.name} %{ACTION:event.action}"],
+                "pattern_definitions": {"ACTION": "%{WORD}|%{NOTSPACE}"}}
+    elif kind == "dissect":
+        body = {"field": "message", "pattern": "%{source.ip} - %{user.name} [%{ts}] %{rest}"}
+    elif kind == "append":
+        body = {"field": "related.ip", "value": "{{{source.ip}}}"}
+    elif kind == "split":
+        body = {"field": field, "separator": ","}
+    else:
+        body = {"field": field, "pattern": "\\s+", "replacement": " "}
+    if condition and kind not in ("grok", "dissect"):
+        body["if"] = condition
+    return {kind: body}
+
+
+def generate_pipeline(count, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    return [generate_processor(rng) for _ in range(count)]
+
+
+def generate_fields_tree(depth, breadth=4, seed=DEFAULT_SEED):
+    """A fields.yml list whose group chain nests `depth` levels, with
+    `breadth` leaves and a side group at every level."""
+    rng = random.Random(seed)
+
+    def leaves(level):
+        return [{"name": f"f{level}_{i}", "type": rng.choice(["keyword", "long", "ip", "date"])}
+                for i in range(breadth)]
+
+    tree = leaves(depth)
+    for level in range(depth - 1, -1, -1):
+        side = {"name": f"side{level}", "type": "group", "fields": leaves(level)}
+        tree = [{"name": f"g{level}", "type": "group", "fields": tree}, side] + leaves(level)
+    return tree
+
+
+def generate_event(rng, depth=3):
+    event = {"@timestamp": "2024-01-01T00:00:00Z", "message": "x" * rng.randint(20, 200)}
+    for _ in range(rng.randint(4, 12)):
+        node = event
+        path = field_name(rng, depth).split(".")
+        for part in path[:-1]:
+            child = node.setdefault(part, {})
+            if not isinstance(child, dict):
+                break
+            node = child
+        else:
+            node[path[-1]] = rng.choice([rng.randint(0, 65535), rng.random(), rng.choice(WORDS),
+                                         True, [rng.choice(WORDS)], None])
+    event["cisco"] = {"asa": {"rule_name": rng.choice(WORDS), "mapped_source_port": 443}}
+    return event
+
+
+def generate_expected_json(path, size_bytes, seed=DEFAULT_SEED):
+    """Write a JSON array of events of about size_bytes, returns the count."""
+    rng = random.Random(seed)
+    count = 0
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        while written < size_bytes:
+            text = json.dumps(generate_event(rng), indent=2)
+            f.write(",\n  " if count else "\n  ")
+            f.write(text.replace("\n", "\n  "))
+            written += len(text) + 4
+            count += 1
+        f.write("\n]")
+    return count
+
+
+def generate_ecs_csv(path, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    rows = {f"{a}.{b}" for a in WORDS for b in WORDS}
+    rows.update(field_name(rng, 4) for _ in range(2000))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("ECS_Version,Indexed,Field_Set,Field,Type\n")
+        for name in sorted(rows):
+            f.write(f"8.11.0,true,{name.split('.')[0]},{name},keyword\n")
+    return len(rows)
+
+
+# Measurement
+
+def measure(func, setup=None, rounds=DEFAULT_ROUNDS):
+    """Best and mean wall time over rounds, then the peak traced memory of
+    one more run. setup() runs before each call, outside the timing, and
+    returns the arguments."""
+    times = []
+    for _ in range(rounds):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), sum(times) / len(times), peak
+
+
+class Suite:
+    def __init__(self, rounds=DEFAULT_ROUNDS, only=None):
+        self.rounds = rounds
+        self.only = only
+        self.results = []
+
+    def wanted(self, name):
+        return not self.only or any(pattern in name for pattern in self.only)
+
+    def run(self, name, params, func, setup=None, items=1, unit="items", rounds=None):
+        if not self.wanted(name):
+            return
+        best, mean, peak = measure(func, setup, rounds or self.rounds)
+        result = {
+            "name": name,
+            "params": params,
+            "seconds": round(best, 6),
+            "mean_seconds": round(mean, 6),
+            "rounds": rounds or self.rounds,
+            "items": items,
+            "unit": unit,
+            "throughput": round(items / best, 2) if best else None,
+            "peak_bytes": peak,
+        }
+        self.results.append(result)
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name} ({label}): {best * 1000:.2f} ms, "
+              f"{result['throughput']:,.0f} {unit}/s, peak {peak / 1024:,.0f} KiB")
+
+
+def looped(func):
+    """Call func INNER_LOOPS times, keeping no result (for the peak memory)."""
+    def wrapper(*args):
+        for _ in range(INNER_LOOPS):
+            func(*args)
+    return wrapper
+
+
+def quiet(func):
+    """Run func with stdout discarded (describe_types and add_indices print)."""
+    def wrapper(*args):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return func(*args)
+    return wrapper
+
+
+def run_suite(suite, work_dir, sizes, seed):
+    converter = load_script("pipeline_to_decoder", "pipeline-to-decoder.py")
+    custom_fields = load_script("elastic_custom_fields", "elastic-custom-fields.py")
+
+    for count in sizes["pipelines"]:
+        pipeline = generate_pipeline(count, seed)
+        suite.run("build_normalize", {"processors": count}, converter.build_normalize,
+                  setup=lambda p=pipeline: (copy.deepcopy(p),), items=count, unit="processors")
+        parsers = [p for p in pipeline if "grok" in p or "dissect" in p]
+        suite.run("handle_parse", {"processors": len(parsers)},
+                  looped(lambda ps: [converter.handle_parse(p) for p in ps]),
+                  setup=lambda ps=parsers: (ps,), items=len(parsers) * INNER_LOOPS,
+                  unit="processors")
+
+    formats = DATE_FORMATS * 1000
+    suite.run("elastic_to_strftime", {"formats": len(formats)},
+              lambda fs: [converter.elastic_to_strftime(f) for f in fs],
+              setup=lambda: (formats,), items=len(formats), unit="formats")
+
+    for depth in sizes["depths"]:
+        tree = generate_fields_tree(depth, seed=seed)
+        leaves = len(custom_fields.flatten(tree))
+        suite.run("flatten", {"depth": depth, "fields": leaves},
+                  looped(custom_fields.flatten),
+                  setup=lambda t=tree: (t,), items=leaves * INNER_LOOPS, unit="fields")
+
+    ecs_csv = work_dir / "ecs.csv"
+    ecs_rows = generate_ecs_csv(ecs_csv, seed)
+    suite.run("load_ecs_fields", {"rows": ecs_rows}, expected_types.load_ecs_fields,
+              setup=lambda: (ecs_csv,), items=ecs_rows, unit="rows")
+    suite.run("load_ecs_index", {"rows": ecs_rows},
+              lambda path: expected_types.load_ecs_index(path, use_cache=False),
+              setup=lambda: (ecs_csv,), items=ecs_rows, unit="rows")
+    ecs_index = expected_types.load_ecs_index(ecs_csv, use_cache=False)
+
+    rng = random.Random(seed)
+    events = [generate_event(rng) for _ in range(2000)]
+    describe = quiet(lambda evs: [expected_types.describe_types(e, ecs_index) for e in evs])
+    suite.run("describe_types", {"events": len(events)}, describe,
+              setup=lambda: (events,), items=len(events), unit="events")
+
+    for megabytes in sizes["json_mb"]:
+        corpus = work_dir / f"expected-{megabytes}mb.json"
+        generate_expected_json(corpus, megabytes * 1024 * 1024, seed)
+        size = corpus.stat().st_size
+        scratch = work_dir / "scratch.json"
+
+        def fresh_copy(source=corpus):
+            shutil.copyfile(source, scratch)
+            return (scratch,)
+
+        # One round for the large corpora, the copy alone takes a while
+        suite.run("add_indices_to_json", {"megabytes": megabytes}, quiet(add_indices_to_json),
+                  setup=fresh_copy, items=size / 1024 / 1024, unit="MB",
+                  rounds=1 if megabytes >= 128 else None)
+        corpus.unlink()
+        scratch.unlink(missing_ok=True)
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def result_key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results, baseline_path, threshold):
+    """Print the change of each benchmark against a baseline, returns the
+    number of regressions slower than threshold percent."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(r): r for r in json.load(f)["results"]}
+    regressions = 0
+    print(f"\nAgainst {baseline_path}:")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if not old or not old["seconds"]:
+            continue
+        change = (result["seconds"] - old["seconds"]) / old["seconds"] * 100
+        memory = result["peak_bytes"] - old["peak_bytes"]
+        flag = ""
+        if change > threshold:
+            flag = "  <- slower"
+            regressions += 1
+        label = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        print(f"  {result['name']} ({label}): {change:+.1f}% time, "
+              f"{memory / 1024:+.0f} KiB peak{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the converter and inference tools on synthetic inputs"
+    )
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT,
+                        help=f"Results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("-r", "--rounds", type=int, default=DEFAULT_ROUNDS,
+                        help=f"Timed rounds per benchmark (default: {DEFAULT_ROUNDS})")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help=f"Generator seed (default: {DEFAULT_SEED})")
+    parser.add_argument("--quick", action="store_true", help="Small inputs only")
+    parser.add_argument("--json-mb", type=int, nargs="+",
+                        help=f"Expected-JSON corpus sizes in MB (default: {JSON_SIZES_MB})")
+    parser.add_argument("--pipelines", type=int, nargs="+",
+                        help=f"Pipeline sizes in processors (default: {PIPELINE_SIZES})")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="Run only benchmarks whose name contains NAME, can be repeated")
+    parser.add_argument("-c", "--compare", metavar="BASELINE",
+                        help="Compare with an earlier results file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Slowdown percent counted as a regression (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    sizes = dict(QUICK) if args.quick else {
+        "pipelines": PIPELINE_SIZES, "depths": FIELDS_DEPTHS, "json_mb": JSON_SIZES_MB}
+    if args.json_mb:
+        sizes["json_mb"] = args.json_mb
+    if args.pipelines:
+        sizes["pipelines"] = args.pipelines
+
+    suite = Suite(args.rounds, args.only)
+    with tempfile.TemporaryDirectory(prefix="decoders-utils-bench-") as work_dir:
+        run_suite(suite, Path(work_dir), sizes, args.seed)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "results": suite.results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(suite.results, args.compare, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
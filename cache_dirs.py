@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+# Location of the on-disk caches shared by the tools.
+#
+# Environment:
+#   DECODERS_UTILS_CACHE_DIR   cache root (default: $XDG_CACHE_HOME/decoders-utils
+#                              or ~/.cache/decoders-utils)
+
+import os
+from pathlib import Path
+
+
+def cache_root():
+    base = os.environ.get("DECODERS_UTILS_CACHE_DIR")
+    if not base:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"), "decoders-utils")
+    return Path(base)
+
+
+def cache_dir(name):
+    """Directory for one kind of cached data, e.g. cache_dir("yaml")."""
+    return cache_root() / name
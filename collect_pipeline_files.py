@@ -1,30 +1,283 @@
 import argparse
+import hashlib
+import json
+import os
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import shutil
 import sys
+import tarfile
+import tempfile
+from requests.adapters import HTTPAdapter
+
+import cache_dirs
 
 GITHUB_REPO = "elastic/integrations"
 BASE_URL = f"https://api.github.com/repos/{GITHUB_REPO}/contents"
 RAW_BASE_URL = "https://raw.githubusercontent.com/elastic/integrations/main"
 
-def fetch_file_list(integration_name):
-    path = f"packages/{integration_name}/data_stream/log/_dev/test/pipeline"
+# Output file for each kind of test file, written in a single pass
+OUTPUTS = {
+    ".log": "combined_logs.log",
+    "-expected.json": "combined_expected.json",
+}
+DEFAULT_DATA_STREAM = "log"
+DEFAULT_JOBS = 8
+CHUNK_SIZE = 64 * 1024
+
+
+def default_cache_dir():
+    return cache_dirs.cache_dir("raw")
+
+
+def create_session(pool_size=DEFAULT_JOBS):
+    """Session shared by all downloads so connections are reused."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def pipeline_test_path(integration_name, data_stream=DEFAULT_DATA_STREAM):
+    return f"packages/{integration_name}/data_stream/{data_stream}/_dev/test/pipeline"
+
+
+def fetch_file_list(integration_name, session=None, data_stream=DEFAULT_DATA_STREAM):
+    path = pipeline_test_path(integration_name, data_stream)
     url = f"{BASE_URL}/{path}"
-    response = requests.get(url)
+    response = (session or requests).get(url)
     response.raise_for_status()
     return response.json()
 
-def download_and_merge_files(file_list, extension_filter, output_file):
-    with open(output_file, 'w', encoding='utf-8') as outfile:
-        for file_info in file_list:
-            filename = file_info['name']
+
+class DownloadCache:
+    """Local copies of raw files plus their ETags, used for conditional requests."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.directory / "index.json"
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def path_for(self, url):
+        return self.directory / hashlib.sha256(url.encode()).hexdigest()
+
+    def etag_for(self, url):
+        entry = self.index.get(url)
+        if entry and self.path_for(url).exists():
+            return entry.get("etag")
+        return None
+
+    def update(self, url, etag):
+        if etag:
+            self.index[url] = {"etag": etag}
+        else:
+            self.index.pop(url, None)
+
+    def save(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+
+def download_file(session, url, cache):
+    """Download url into the cache, streaming the body to disk.
+
+    Sends If-None-Match when a cached copy exists, a 304 reuses it.
+    Returns (local_path, etag, downloaded).
+    """
+    local_path = cache.path_for(url)
+    headers = {}
+    etag = cache.etag_for(url)
+    if etag:
+        headers["If-None-Match"] = etag
+
+    with session.get(url, headers=headers, stream=True) as response:
+        if response.status_code == 304:
+            return local_path, etag, False
+        response.raise_for_status()
+        fd, tmp_path = tempfile.mkstemp(dir=cache.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+            os.replace(tmp_path, local_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return local_path, response.headers.get("ETag"), True
+
+
+def select_files(file_list, outputs=OUTPUTS):
+    """Pair each wanted file with the output it is merged into, in list order."""
+    selected = []
+    for file_info in file_list:
+        filename = file_info['name']
+        for extension_filter, output_file in outputs.items():
             if filename.endswith(extension_filter):
-                raw_url = f"{RAW_BASE_URL}/{file_info['path']}"
-                print(f"Downloading: {raw_url}")
-                file_response = requests.get(raw_url)
-                file_response.raise_for_status()
-                outfile.write(file_response.text)
-                outfile.write('\n')
+                selected.append((file_info['path'], output_file))
+                break
+    return selected
+
+
+def merge_files(source, file_list, outputs=OUTPUTS):
+    """Merge the matching files of file_list, read through source, per output.
+
+    Files are merged in file_list order, whatever order they are fetched in.
+    """
+    selected = select_files(file_list, outputs)
+    handles = {output_file: open(output_file, 'wb') for output_file in outputs.values()}
+    try:
+        streams = source.open_files([path for path, _ in selected])
+        for (_, output_file), infile in zip(selected, streams):
+            with infile:
+                shutil.copyfileobj(infile, handles[output_file], CHUNK_SIZE)
+            handles[output_file].write(b'\n')
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+
+class GitHubSource:
+    """Lists files through the GitHub contents API and downloads raw files.
+
+    Downloads share one pooled session, run on a bounded thread pool and
+    are cached locally with their ETags for conditional re-downloads.
+    """
+
+    def __init__(self, session=None, jobs=DEFAULT_JOBS, cache_dir=None,
+                 raw_base_url=RAW_BASE_URL):
+        self.session = session or create_session(jobs)
+        self.jobs = jobs
+        self.cache_dir = cache_dir
+        self.raw_base_url = raw_base_url
+
+    def list_files(self, integration_name, data_stream=DEFAULT_DATA_STREAM):
+        return fetch_file_list(integration_name, self.session, data_stream)
+
+    def open_files(self, paths):
+        cache = DownloadCache(self.cache_dir or default_cache_dir())
+        urls = [f"{self.raw_base_url}/{path}" for path in paths]
+
+        def fetch(url):
+            return download_file(self.session, url, cache)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                results = list(executor.map(fetch, urls))
+            for url, (_, etag, downloaded) in zip(urls, results):
+                cache.update(url, etag)
+                print(f"{'Downloaded' if downloaded else 'Not modified'}: {url}")
+        finally:
+            cache.save()
+        return (open(local_path, 'rb') for local_path, _, _ in results)
+
+
+class MirrorSource:
+    """Base for offline sources: a path index of the pipeline test files,
+    built once, turns listing into a dictionary lookup."""
+
+    def __init__(self):
+        self.index = {}
+
+    def add_to_index(self, path):
+        # packages/<integration>/data_stream/<data_stream>/_dev/test/pipeline/<file>
+        parts = path.split("/")
+        if (len(parts) == 8 and parts[0] == "packages" and parts[2] == "data_stream"
+                and parts[4:7] == ["_dev", "test", "pipeline"]):
+            self.index.setdefault((parts[1], parts[3]), []).append(path)
+
+    def finish_index(self):
+        for paths in self.index.values():
+            paths.sort()
+
+    def integrations(self):
+        return sorted({integration for integration, _ in self.index})
+
+    def data_streams(self, integration_name):
+        return sorted(ds for name, ds in self.index if name == integration_name)
+
+    def list_files(self, integration_name, data_stream=DEFAULT_DATA_STREAM):
+        paths = self.index.get((integration_name, data_stream))
+        if paths is None:
+            raise FileNotFoundError(
+                f"No pipeline tests for {integration_name}/{data_stream} in {self}")
+        return [{"name": path.rsplit("/", 1)[-1], "path": path} for path in paths]
+
+
+class LocalSource(MirrorSource):
+    """Reads from a local clone of elastic/integrations."""
+
+    def __init__(self, root):
+        super().__init__()
+        self.root = Path(root)
+        pattern = "packages/*/data_stream/*/_dev/test/pipeline/*"
+        for path in self.root.glob(pattern):
+            if path.is_file():
+                self.add_to_index(path.relative_to(self.root).as_posix())
+        self.finish_index()
+
+    def __str__(self):
+        return str(self.root)
+
+    def open_files(self, paths):
+        return (open(self.root / path, 'rb') for path in paths)
+
+
+class TarballSource(MirrorSource):
+    """Reads from a downloaded tarball of elastic/integrations.
+
+    GitHub tarballs wrap the tree in a top-level directory, which is
+    stripped from the indexed paths.
+    """
+
+    def __init__(self, tarball_path):
+        super().__init__()
+        self.tarball_path = tarball_path
+        self.tar = tarfile.open(tarball_path, "r:*")
+        self.members = {}
+        for member in self.tar:
+            if not member.isfile():
+                continue
+            name = member.name
+            if not name.startswith("packages/"):
+                name = name.split("/", 1)[-1]
+            self.members[name] = member
+            self.add_to_index(name)
+        self.finish_index()
+
+    def __str__(self):
+        return str(self.tarball_path)
+
+    def open_files(self, paths):
+        return (self.tar.extractfile(self.members[path]) for path in paths)
+
+
+def open_source(mirror=None, session=None, jobs=DEFAULT_JOBS, cache_dir=None):
+    """Pick the source backend: a local clone or tarball when mirror is set,
+    the GitHub API otherwise."""
+    if mirror is None:
+        return GitHubSource(session, jobs, cache_dir)
+    if os.path.isdir(mirror):
+        return LocalSource(mirror)
+    if tarfile.is_tarfile(mirror):
+        return TarballSource(mirror)
+    raise ValueError(f"Mirror '{mirror}' is neither a directory nor a tarball")
+
+
+def download_and_merge_files(file_list, outputs=OUTPUTS, session=None, jobs=DEFAULT_JOBS,
+                             cache_dir=None, raw_base_url=RAW_BASE_URL):
+    """Download matching files from GitHub concurrently and merge them per output."""
+    source = GitHubSource(session, jobs, cache_dir, raw_base_url)
+    merge_files(source, file_list, outputs)
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -34,18 +287,37 @@ def main():
         "integration_name",
         help="Name of the integration (e.g., apache, nginx, cisco_ios, etc.)"
     )
+    parser.add_argument(
+        "-d", "--data-stream", default=DEFAULT_DATA_STREAM,
+        help=f"Data stream whose pipeline tests are merged (default: {DEFAULT_DATA_STREAM})"
+    )
+    parser.add_argument(
+        "-m", "--mirror",
+        help="Read from a local clone or tarball of elastic/integrations instead of GitHub"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_JOBS,
+        help=f"Number of concurrent downloads (default: {DEFAULT_JOBS})"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for downloaded files and their ETags (default: ~/.cache/decoders-utils/raw)"
+    )
 
     args = parser.parse_args()
     integration_name = args.integration_name
 
     try:
-        file_list = fetch_file_list(integration_name)
-    except requests.HTTPError as e:
-        print(f"Error fetching file list: {e}")
+        source = open_source(args.mirror, jobs=args.jobs, cache_dir=args.cache_dir)
+        file_list = source.list_files(integration_name, args.data_stream)
+        merge_files(source, file_list, OUTPUTS)
+    except requests.RequestException as e:
+        # Before OSError: connection errors and timeouts are OSErrors too
+        print(f"Error fetching files: {e}")
+        sys.exit(1)
+    except (OSError, ValueError, tarfile.TarError) as e:
+        print(f"Error reading mirror: {e}")
         sys.exit(1)
-
-    download_and_merge_files(file_list, ".log", "combined_logs.log")
-    download_and_merge_files(file_list, "-expected.json", "combined_expected.json")
 
 if __name__ == "__main__":
     main()
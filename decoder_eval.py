@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+
+# Offline evaluation of generated decoders against log lines.
+#
+# Check expressions, parse| expressions and the simple map statements of
+# a decoder are compiled once (memoized by their text) and run over an
+# event held as a flat {dotted field: value} dict, enough to tell which
+# blocks real logs go through without an engine running. Map helpers
+# that aren't modelled leave an UNKNOWN value behind, and checks reading
+# one are reported as undetermined instead of guessed.
+
+import re
+import sys
+from functools import lru_cache
+
+from grok_patterns import LIBRARY, group_name, library_resolver
+
+CHECK_TOKEN = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<field>\$[A-Za-z0-9_@.\-\[\]]+)
+  | (?P<op>==|!=|<=|>=|[<>(),])
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+""", re.VERBOSE)
+FIELD_REFERENCE = re.compile(r"\$([A-Za-z0-9_@.\-\[\]]+)")
+HELPER_CALL = re.compile(r"^(\w+)\((.*)\)$", re.S)
+# <NAME>, <NAME:field> or <NAME:field:type> of a standard grok pattern
+GROK_TOKEN = re.compile(r"^(\w+)(?::([^:]+))?(?::(\w+))?$")
+# Inline custom definition: <regex>, <regex:field> or <regex:field:type>
+INLINE_TOKEN = re.compile(r"^(.*?)(?::([A-Za-z_@][\w.@\-]*))?(?::(int|long|float|double|string|boolean))?$", re.S)
+DISSECT_TOKEN = re.compile(r"^([?+&*]?)([\w.@\[\]\-]*?)(->)?(?:/\d+)?$")
+PATTERN_NAME = re.compile(r"^[A-Z][A-Z0-9_]*$")
+CONVERSIONS = {"int": int, "long": int, "float": float, "double": float}
+
+
+class CheckError(ValueError):
+    """A check expression the evaluator can't parse."""
+
+    def __init__(self, message, source):
+        super().__init__(f"{message} in check: {source}")
+        self.source = source
+
+
+class Undetermined(Exception):
+    """A check read a value the evaluator doesn't model."""
+
+
+class _Marker:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+MISSING = _Marker("MISSING")
+UNKNOWN = _Marker("UNKNOWN")
+OBJECT = _Marker("OBJECT")
+
+
+class Event(dict):
+    """An event as {dotted field: value}."""
+
+    def lookup(self, path):
+        """The value of path, OBJECT if only subfields are set, MISSING if
+        absent. Raises Undetermined for values the map didn't model."""
+        parts = path.split(".")
+        for end in range(1, len(parts)):
+            if self.get(".".join(parts[:end])) is UNKNOWN:
+                raise Undetermined(path)
+        if path in self:
+            if self[path] is UNKNOWN:
+                raise Undetermined(path)
+            return self[path]
+        prefix = f"{path}."
+        if any(key.startswith(prefix) for key in self):
+            return OBJECT
+        return MISSING
+
+    def delete(self, path):
+        prefix = f"{path}."
+        for key in [k for k in self if k == path or k.startswith(prefix)]:
+            del self[key]
+
+    def assign(self, path, value):
+        self.delete(path)
+        self[path] = value
+
+
+def event_from_line(line, fields=("message", "event.original")):
+    return Event((field, line) for field in fields)
+
+
+# Checks
+
+def tokenize_check(source):
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = CHECK_TOKEN.match(source, position)
+        if not match:
+            raise CheckError(f"Unexpected character '{source[position]}'", source)
+        if match.lastgroup != "ws":
+            tokens.append((match.lastgroup, match.group()))
+        position = match.end()
+    tokens.append(("end", ""))
+    return tokens
+
+
+def literal_value(kind, text):
+    if kind == "string":
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    if kind == "number":
+        return float(text) if "." in text else int(text)
+    return {"true": True, "false": False, "null": None}[text]
+
+
+def compare(op, left, right):
+    if any(v is MISSING or v is OBJECT for v in (left, right)):
+        return False
+    numbers = all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (left, right))
+    if not numbers and type(left) is not type(right):
+        return False
+    if op == "==":
+        return left == right
+    if op == "!=":
+        return left != right
+    try:
+        return {"<": left < right, ">": left > right,
+                "<=": left <= right, ">=": left >= right}[op]
+    except TypeError:
+        return False
+
+
+def helper_contains(value, item):
+    if isinstance(value, str) and isinstance(item, str):
+        return item in value
+    return isinstance(value, list) and item in value
+
+
+CHECK_HELPERS = {
+    "exists": lambda value: value is not MISSING,
+    "contains": helper_contains,
+    "starts_with": lambda value, prefix: isinstance(value, str) and isinstance(prefix, str)
+    and value.startswith(prefix),
+    "ends_with": lambda value, suffix: isinstance(value, str) and isinstance(suffix, str)
+    and value.endswith(suffix),
+}
+
+
+class CheckParser:
+    """Recursive descent parser for check expressions, producing a
+    function of the event."""
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize_check(source)
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def fail(self, message=None):
+        kind, text = self.peek()
+        raise CheckError(message or (f"Unexpected token '{text}'" if kind != "end"
+                                     else "Unexpected end"), self.source)
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] != "end":
+            self.fail()
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ("name", "OR"):
+            self.advance()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else (lambda e: any(n(e) for n in nodes))
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == ("name", "AND"):
+            self.advance()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else (lambda e: all(n(e) for n in nodes))
+
+    def parse_not(self):
+        if self.peek() == ("name", "NOT"):
+            self.advance()
+            operand = self.parse_not()
+            return lambda e: not operand(e)
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        kind, text = self.peek()
+        if kind == "op" and text in ("==", "!=", "<=", ">=", "<", ">"):
+            self.advance()
+            right = self.parse_operand()
+            return lambda e: compare(text, left(e), right(e))
+        return lambda e: left(e) is True
+
+    def parse_operand(self):
+        kind, text = self.advance()
+        if text == "(":
+            node = self.parse_or()
+            if self.advance()[1] != ")":
+                self.fail("Expected ')'")
+            return node
+        if kind in ("string", "number") or (kind == "name" and text in ("true", "false", "null")):
+            value = literal_value(kind, text)
+            return lambda e: value
+        if kind == "field":
+            path = text[1:]
+            return lambda e: e.lookup(path)
+        if kind == "name" and self.peek()[1] == "(":
+            return self.parse_call(text)
+        self.index -= 1
+        self.fail()
+
+    def parse_call(self, name):
+        if name not in CHECK_HELPERS:
+            self.fail(f"Unsupported helper '{name}'")
+        helper = CHECK_HELPERS[name]
+        self.advance()
+        args = []
+        if self.peek()[1] != ")":
+            args.append(self.parse_operand())
+            while self.peek()[1] == ",":
+                self.advance()
+                args.append(self.parse_operand())
+        if self.advance()[1] != ")":
+            self.fail("Expected ')'")
+        return lambda e: helper(*(arg(e) for arg in args))
+
+
+@lru_cache(maxsize=4096)
+def compile_check(source):
+    """A function event -> bool for a check expression (may raise
+    Undetermined when called)."""
+    return CheckParser(str(source)).parse()
+
+
+def conjuncts(source):
+    """The top-level AND operands of a check, the whole check if it
+    isn't a top-level AND."""
+    source = str(source)
+    tokens, parts, depth, start = [], [], 0, 0
+    for match in CHECK_TOKEN.finditer(source):
+        text = match.group()
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and match.lastgroup == "name" and text in ("AND", "OR"):
+            tokens.append(text)
+            if text == "AND":
+                parts.append(source[start:match.start()].strip())
+                start = match.end()
+    if "OR" in tokens:
+        return [source.strip()]
+    parts.append(source[start:].strip())
+    return parts
+
+
+# Parse expressions
+
+def split_expression(expression):
+    """Split a parse expression into ("text", s) and ("token", inner)
+    parts. '<' opening a regex group ((?<name>, (?<=, (?P<name>) and
+    escaped characters are text."""
+    parts, text, index = [], [], 0
+
+    def flush():
+        if text:
+            parts.append(("text", "".join(text)))
+            text.clear()
+
+    while index < len(expression):
+        char = expression[index]
+        if char == "\\":
+            text.append(expression[index:index + 2])
+            index += 2
+            continue
+        preceding = "".join(text)
+        if char == "<" and not preceding.endswith(("(?", "(?P")):
+            end = matching_close(expression, index)
+            if end is not None:
+                flush()
+                parts.append(("token", expression[index + 1:end]))
+                index = end + 1
+                continue
+        text.append(char)
+        index += 1
+    flush()
+    return parts
+
+
+def matching_close(expression, start):
+    depth, index = 0, start
+    while index < len(expression):
+        char = expression[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == "<" and not expression[max(0, index - 3):index].endswith(("(?", "(?P")):
+            depth += 1
+        elif char == ">":
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    return None
+
+
+def is_grok_token(inner):
+    match = GROK_TOKEN.match(inner)
+    if match and match.group(1) in LIBRARY:
+        return True
+    return not DISSECT_TOKEN.match(inner)
+
+
+class ParsePattern:
+    """A compiled parse expression: mode is "grok" (unanchored search,
+    regex text) or "dissect" (whole value, literal text)."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.fields = {}
+        self.types = {}
+        self.appends = set()
+        parts = split_expression(expression)
+        self.mode = "grok" if any(kind == "token" and is_grok_token(inner)
+                                  for kind, inner in parts) else "dissect"
+        if self.mode == "grok":
+            source = self.grok_regex(parts)
+        else:
+            source = self.dissect_regex(parts)
+        self.regex = re.compile(source, re.S)
+
+    def capture(self, body, field, type_name=None):
+        if not field:
+            return f"(?:{body})"
+        group = group_name(field, self.fields)
+        if type_name in CONVERSIONS:
+            self.types[group] = CONVERSIONS[type_name]
+        return f"(?P<{group}>{body})"
+
+    def grok_regex(self, parts):
+        pieces = []
+        for kind, value in parts:
+            if kind == "text":
+                pieces.append(value)
+                continue
+            match = GROK_TOKEN.match(value)
+            if match and match.group(1) in LIBRARY:
+                body = library_resolver().regex_definition(match.group(1))
+                pieces.append(self.capture(body, match.group(2), match.group(3)))
+                continue
+            if match and PATTERN_NAME.match(match.group(1)):
+                raise KeyError(f"Unknown grok pattern: {match.group(1)}")
+            inline = INLINE_TOKEN.match(value)
+            body = self.grok_regex(split_expression(inline.group(1)))
+            pieces.append(self.capture(body, inline.group(2), inline.group(3)))
+        return "".join(pieces)
+
+    def dissect_regex(self, parts):
+        pieces = []
+        padded = False
+        for position, (kind, value) in enumerate(parts):
+            if kind == "text":
+                literal = re.escape(value)
+                pieces.append(f"(?:{literal})+" if padded else literal)
+                padded = False
+                continue
+            modifier, field, padding = DISSECT_TOKEN.match(value).groups()
+            last = position == len(parts) - 1
+            body = ".*" if last else ".*?"
+            if modifier in ("?", "*", "&") or not field:
+                pieces.append(f"(?:{body})")
+            else:
+                if modifier == "+":
+                    self.appends.add(field)
+                pieces.append(self.capture(body, field))
+            padded = bool(padding)
+        return "".join(pieces)
+
+    def matches(self, value):
+        """Whether value matches, without building the captured fields."""
+        if self.mode == "grok":
+            return self.regex.search(value) is not None
+        return self.regex.fullmatch(value) is not None
+
+    def match(self, value):
+        """{field: value} captured from value, None if it doesn't match."""
+        if not isinstance(value, str):
+            return None
+        if self.mode == "grok":
+            match = self.regex.search(value)
+        else:
+            match = self.regex.fullmatch(value)
+        if match is None:
+            return None
+        captured = {}
+        for group, text in match.groupdict().items():
+            if text is None:
+                continue
+            field = self.fields[group]
+            if group in self.types:
+                try:
+                    text = self.types[group](text)
+                except ValueError:
+                    pass
+            if field in self.appends and field in captured:
+                text = f"{captured[field]} {text}"
+            captured[field] = text
+        return captured
+
+
+@lru_cache(maxsize=4096)
+def compile_parse(expression):
+    """The ParsePattern of a parse expression, compiled once."""
+    return ParsePattern(expression)
+
+
+def parse_block_field(block):
+    """(source field, expressions) of a block's parse|, None if it has none."""
+    for key, value in block.items():
+        if key.startswith("parse|"):
+            return key[len("parse|"):], list(value or [])
+    return None
+
+
+# Map statements
+
+def apply_statement(event, statement):
+    """Apply one map statement as far as it's modelled."""
+    if not isinstance(statement, dict) or len(statement) != 1:
+        return
+    target, expression = next(iter(statement.items()))
+    expression = str(expression)
+    reference = FIELD_REFERENCE.fullmatch(expression)
+    if expression == "delete()":
+        event.delete(target)
+    elif reference:
+        try:
+            value = event.lookup(reference.group(1))
+        except Undetermined:
+            value = UNKNOWN
+        if value is not MISSING and value is not OBJECT:
+            event.assign(target, value)
+    elif HELPER_CALL.match(expression):
+        name, args = HELPER_CALL.match(expression).groups()
+        source = FIELD_REFERENCE.fullmatch(args.split(",")[0].strip())
+        try:
+            value = event.lookup(source.group(1)) if source else MISSING
+        except Undetermined:
+            value = UNKNOWN
+        if name == "rename" and source:
+            if value is not MISSING:
+                event.delete(source.group(1))
+                event.assign(target, value)
+        elif name in ("downcase", "upcase", "trim") and isinstance(value, str):
+            event.assign(target, {"downcase": value.lower, "upcase": value.upper,
+                                  "trim": value.strip}[name]())
+        else:
+            event.assign(target, UNKNOWN)
+    else:
+        event.assign(target, expression)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ("check", "parse"):
+        print("Usage: python decoder_eval.py check|parse '<expression>' '<log line>'")
+        sys.exit(1)
+
+    kind, expression, line = sys.argv[1:]
+    try:
+        if kind == "check":
+            print(compile_check(expression)(event_from_line(line)))
+        else:
+            pattern = compile_parse(expression)
+            print(f"{pattern.mode}: {pattern.regex.pattern}")
+            print(pattern.match(line))
+    except (CheckError, Undetermined, re.error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Importable entry points for the decoders-utils tools.
+#
+# The tools stay standalone scripts next to this package. Their modules
+# are only imported when first used, so importing the package (which the
+# daemon client does on every run) costs nothing:
+#
+#   import decoders_utils
+#   decoders_utils.pipeline_to_decoder.convert_file("default.yml")
+#   decoders_utils.tool("infer").main()
+
+import importlib
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Daemon request names and the scripts serving them
+TOOLS = {
+    "convert": "pipeline-to-decoder.py",
+    "flatten": "elastic-custom-fields.py",
+    "infer": "expected_types.py",
+}
+
+if str(ROOT) not in sys.path:
+    # The scripts import their sibling modules by top-level name
+    sys.path.insert(0, str(ROOT))
+
+
+def module_name(script):
+    return Path(script).stem.replace("-", "_")
+
+
+def load(name):
+    """The tool module called name (e.g. "pipeline_to_decoder"), imported
+    once. Hyphenated scripts are loaded from their file."""
+    qualified = f"{__name__}.{name}"
+    if qualified in sys.modules:
+        return sys.modules[qualified]
+    path = ROOT / f"{name}.py"
+    if not path.is_file():
+        path = ROOT / f"{name.replace('_', '-')}.py"
+    if not path.is_file():
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if "-" not in path.name:
+        module = importlib.import_module(name)
+    else:
+        spec = importlib.util.spec_from_file_location(qualified, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[qualified] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[qualified]
+            raise
+    sys.modules[qualified] = module
+    return module
+
+
+def tool(request):
+    """The module serving a daemon request ("convert", "flatten", "infer")."""
+    return load(module_name(TOOLS[request]))
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return load(name)
@@ -0,0 +1,97 @@
+# Thin client of the conversion daemon (see daemon.py).
+#
+# The tool scripts call forward() before their heavy imports. When a
+# daemon is listening, the run is handed to it and the script exits with
+# the daemon's exit code and output, streamed back as the tool writes it.
+# Otherwise (no socket, daemon busy or gone, or DECODERS_UTILS_NO_DAEMON
+# set) the script carries on as usual. The environment variables the
+# tools read (FORWARDED_ENV) are sent along and applied for the run.
+#
+# Environment:
+#   DECODERS_UTILS_SOCKET      daemon socket (default:
+#                              $XDG_RUNTIME_DIR/decoders-utils.sock or
+#                              /tmp/decoders-utils-<uid>.sock)
+#   DECODERS_UTILS_NO_DAEMON   run locally even if a daemon is listening
+
+import json
+import os
+import socket
+import sys
+
+# Read by cache_dirs.py and yaml_loader.py
+FORWARDED_ENV = ("DECODERS_UTILS_CACHE_DIR", "DECODERS_UTILS_YAML_CACHE",
+                 "XDG_CACHE_HOME", "HOME")
+
+
+def socket_path():
+    path = os.environ.get("DECODERS_UTILS_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "decoders-utils.sock")
+    return f"/tmp/decoders-utils-{os.getuid()}.sock"
+
+
+def responses(payload, path=None, timeout=None):
+    """Send one request to the daemon and yield its responses."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path or socket_path())
+        sock.sendall(json.dumps(payload).encode() + b"\n")
+        with sock.makefile("rb") as stream:
+            for line in stream:
+                yield json.loads(line)
+    raise ConnectionError("the daemon closed the connection")
+
+
+def request(payload, path=None, timeout=None):
+    """Send one request to the daemon and return its (first) response."""
+    return next(responses(payload, path, timeout))
+
+
+def forward(tool, argv=None):
+    """Run the tool through the daemon and exit, or return to run it here."""
+    if os.environ.get("DECODERS_UTILS_NO_DAEMON"):
+        return
+    path = socket_path()
+    if not os.path.exists(path):
+        return
+    payload = {"op": "run", "tool": tool, "argv": sys.argv[1:] if argv is None else argv,
+               "cwd": os.getcwd(), "env": {name: os.environ.get(name) for name in FORWARDED_ENV}}
+    started = False
+    try:
+        for response in responses(payload, path):
+            if "code" in response:
+                sys.exit(response["code"])
+            stream = {"stdout": sys.stdout, "stderr": sys.stderr}.get(response.get("stream"))
+            if stream is None:
+                # Busy, or failed before running the tool (or while running it)
+                break
+            started = True
+            stream.write(response["data"])
+            stream.flush()
+    except (OSError, ValueError):
+        pass
+    if started:
+        # Part of the output is out already, running again would repeat it
+        print("Error: the daemon stopped before the run finished", file=sys.stderr)
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ("ping", "stop"):
+        print("Usage: python -m decoders_utils.client ping|stop")
+        sys.exit(1)
+
+    try:
+        response = request({"op": "ping" if sys.argv[1] == "ping" else "shutdown"},
+                           timeout=10)
+    except (OSError, ValueError) as e:
+        print(f"Error: no daemon at {socket_path()} ({e})")
+        sys.exit(1)
+    print(json.dumps(response))
+
+
+if __name__ == "__main__":
+    main()
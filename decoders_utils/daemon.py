@@ -0,0 +1,316 @@
+# Conversion daemon: keeps the tools warm behind a local Unix socket.
+#
+# A pool of worker processes imports the tools once (PyYAML, the grok
+# library, the condition and YAML caches) and keeps the ECS index of each
+# CSV loaded, so a request only pays for its own work. Each request runs
+# one tool's CLI (convert, flatten or infer) in a worker, with the
+# caller's arguments, working directory and cache environment, streams
+# its output back in chunks as it's written and ends with the exit code.
+# At most --jobs requests run at once and --queue more wait;
+# beyond that the client is told the daemon is busy and runs the tool
+# itself. The pool is restarted when a tool's source changes.
+#
+# Protocol, one JSON object per line each way:
+#   {"op": "run", "tool": "convert", "argv": [...], "cwd": "/path", "env": {...}}
+#       -> {"stream": "stdout", "data": "..."}  (any number, stdout or stderr)
+#          {"code": 0}
+#   {"op": "ping"}      -> {"ok": true, "pid": ..., "jobs": ..., "served": ...}
+#   {"op": "shutdown"}  -> {"ok": true}
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+
+import decoders_utils
+from decoders_utils.client import FORWARDED_ENV, socket_path
+
+DEFAULT_QUEUE = 16
+# Output is sent back once this many characters are pending
+CHUNK_SIZE = 64 * 1024
+
+
+def warm_up():
+    """Worker initializer: import every tool once."""
+    for request in decoders_utils.TOOLS:
+        decoders_utils.tool(request)
+
+
+def exit_code(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+class Channel:
+    """Output of a run, sent to the request's queue as ("stdout"|"stderr",
+    text) chunks in the order it was written."""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = []
+        self.size = 0
+
+    def write(self, stream, text):
+        if self.pending and self.pending[-1][0] == stream:
+            self.pending[-1][1].append(text)
+        else:
+            self.pending.append((stream, [text]))
+        self.size += len(text)
+        if self.size >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        for stream, parts in self.pending:
+            self.channel.put((stream, "".join(parts)))
+        self.pending, self.size = [], 0
+
+
+class ChannelWriter(io.TextIOBase):
+    def __init__(self, channel, stream):
+        self.channel = channel
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.channel.write(self.stream, text)
+        return len(text)
+
+
+def apply_env(env):
+    """Set the forwarded variables as the client has them, returns the
+    previous values."""
+    saved = {name: os.environ.get(name) for name in FORWARDED_ENV}
+    for name in FORWARDED_ENV:
+        value = env.get(name)
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    return saved
+
+
+def run_tool(request, argv, cwd, env, channel):
+    """Worker: run a tool's main() as its CLI would, sending its output to
+    channel (a queue) and None once done. Returns the exit code."""
+    module = decoders_utils.tool(request)
+    # Pipeline graphs are loaded lazily per directory, don't reuse them
+    # across runs (converted blocks are memoized by content and can stay)
+    getattr(module, "_graphs", {}).clear()
+    output = Channel(channel)
+    saved_argv, saved_cwd, saved_env = sys.argv, os.getcwd(), apply_env(env)
+    code = 0
+    try:
+        os.chdir(cwd)
+        sys.argv = [decoders_utils.TOOLS[request]] + list(argv)
+        with redirect_stdout(ChannelWriter(output, "stdout")), \
+                redirect_stderr(ChannelWriter(output, "stderr")):
+            try:
+                module.main()
+            except SystemExit as e:
+                code = exit_code(e.code)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        sys.argv = saved_argv
+        os.chdir(saved_cwd)
+        apply_env(saved_env)
+        output.flush()
+        channel.put(None)
+    return code
+
+
+def source_stamp():
+    """mtimes of the tools' sources, to notice edits."""
+    stamp = []
+    for path in sorted(decoders_utils.ROOT.glob("*.py")):
+        try:
+            stamp.append((path.name, path.stat().st_mtime_ns))
+        except OSError:
+            pass
+    return stamp
+
+
+class ToolDaemon:
+    def __init__(self, jobs=None, queue=DEFAULT_QUEUE):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.slots = threading.BoundedSemaphore(self.jobs + queue)
+        self.lock = threading.Lock()
+        self.served = 0
+        self.stamp = None
+        self.pool = None
+        # Queues the workers stream output through, one per run
+        self.manager = multiprocessing.Manager()
+        self.restart_pool()
+
+    def restart_pool(self):
+        old = self.pool
+        self.stamp = source_stamp()
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=warm_up)
+        if old is not None:
+            # Requests already running finish on the old workers
+            old.shutdown(wait=False)
+
+    def current_pool(self):
+        with self.lock:
+            if source_stamp() != self.stamp:
+                print("[INFO] Tool sources changed, restarting the workers", file=sys.stderr)
+                self.restart_pool()
+            return self.pool
+
+    def run(self, request):
+        """Yield the responses to a run request."""
+        tool, argv, cwd = request.get("tool"), request.get("argv", []), request.get("cwd")
+        env = request.get("env") or {}
+        if tool not in decoders_utils.TOOLS:
+            yield {"error": f"unknown tool '{tool}'"}
+            return
+        if not isinstance(argv, list) or not cwd or not isinstance(env, dict):
+            yield {"error": "argv (a list), cwd and env (an object) are required"}
+            return
+        if not self.slots.acquire(blocking=False):
+            yield {"busy": True}
+            return
+        try:
+            channel = self.manager.Queue()
+            future = self.current_pool().submit(run_tool, tool, argv, cwd, env, channel)
+            while True:
+                try:
+                    chunk = channel.get(timeout=0.5)
+                except queue.Empty:
+                    if future.done() and channel.empty():
+                        # The worker died before saying it was done
+                        break
+                    continue
+                if chunk is None:
+                    break
+                yield {"stream": chunk[0], "data": chunk[1]}
+            try:
+                code = future.result()
+            except BrokenProcessPool:
+                with self.lock:
+                    self.restart_pool()
+                yield {"error": "worker process died"}
+                return
+            self.served += 1
+            yield {"code": code}
+        finally:
+            self.slots.release()
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.manager.shutdown()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        tools = self.server.tools
+        for line in self.rfile:
+            response = {"error": "invalid request"}
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+            except (ValueError, AttributeError):
+                op = None
+            if op == "run":
+                for response in tools.run(request):
+                    self.send(response)
+                continue
+            if op == "ping":
+                response = {"ok": True, "pid": os.getpid(), "jobs": tools.jobs,
+                            "served": tools.served}
+            elif op == "shutdown":
+                response = {"ok": True}
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif op is not None:
+                response = {"error": f"unknown op '{op}'"}
+            self.send(response)
+
+    def send(self, response):
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+        self.wfile.flush()
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, tools):
+        self.tools = tools
+        super().__init__(path, RequestHandler)
+
+
+def claim_socket(path):
+    """Remove a stale socket file, fail if a daemon already answers there."""
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f"a daemon is already listening on {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve pipeline-to-decoder.py (convert), elastic-custom-fields.py "
+                    "(flatten) and expected_types.py (infer) runs from warm workers"
+    )
+    parser.add_argument("-s", "--socket", default=socket_path(),
+                        help=f"Unix socket to listen on (default: {socket_path()})")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Requests run at once (default: number of cores)")
+    parser.add_argument("-q", "--queue", type=int, default=DEFAULT_QUEUE,
+                        help="Requests waiting beyond those before clients run locally "
+                             f"(default: {DEFAULT_QUEUE})")
+    args = parser.parse_args()
+
+    try:
+        claim_socket(args.socket)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    tools = ToolDaemon(args.jobs, args.queue)
+    # Only this user may run tools through the socket
+    old_umask = os.umask(0o077)
+    try:
+        server = DaemonServer(args.socket, tools)
+    finally:
+        os.umask(old_umask)
+
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"[INFO] Listening on {args.socket} with {tools.jobs} worker(s)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        tools.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,48 @@
 # Prints a list of custom fields
 # out of an elastic pipeline's fields.yml file
 # in csv format
+#
+# Bulk mode walks every fields/*.yml of a packages tree into a SQLite
+# index of field -> type -> package, re-parsing only changed files. One
+# index can hold several trees, each file is kept under the tree it was
+# indexed from.
 
+if __name__ == "__main__":
+    # Hand the run to the conversion daemon when one is listening
+    # (decoders_utils/daemon.py), before paying for the imports below
+    from decoders_utils.client import forward
+    forward("flatten")
+
+import argparse
+import hashlib
+import os
+import sqlite3
 import sys
-import yaml
+from pathlib import Path
+
+from yaml_loader import SafeLoader, load_yaml
+
+DEFAULT_INDEX = "fields-index.sqlite"
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    package TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    package TEXT NOT NULL,
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS fields_name ON fields(name);
+CREATE INDEX IF NOT EXISTS fields_path ON fields(path);
+CREATE INDEX IF NOT EXISTS files_root ON files(root);
+"""
 
 
 #def flatten(fields, prefix=""):
@@ -19,28 +58,159 @@ import yaml
 #    return result
 
 def flatten(fields, prefix=""):
+    # Iterative walk writing into a single dict, deep group trees
+    # don't copy their children at every level
     result = {}
-    for field in fields:
-        if not isinstance(field, dict):  # safety check
-            continue
-        name = f"{prefix}.{field.get('name')}" if prefix else field.get("name")
-        ftype = field.get("type")
-        if ftype == "group" and "fields" in field:
-            result.update(flatten(field["fields"], name))
-        elif ftype:
-            result[name] = ftype
+    stack = [(iter(fields or []), prefix)]
+    while stack:
+        items, prefix = stack[-1]
+        for field in items:
+            if not isinstance(field, dict):  # safety check
+                continue
+            name = f"{prefix}.{field.get('name')}" if prefix else field.get("name")
+            ftype = field.get("type")
+            if ftype == "group" and "fields" in field:
+                stack.append((iter(field["fields"] or []), name))
+                break
+            elif ftype:
+                result[name] = ftype
+        else:
+            stack.pop()
     return result
 
+
+def find_fields_files(packages_dir):
+    """Yield (package, path) for every fields/*.yml in a packages tree."""
+    root = Path(packages_dir)
+    for path in sorted(root.rglob("fields/*.yml")):
+        package = path.relative_to(root).parts[0]
+        yield package, path
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def open_index(index_path):
+    connection = sqlite3.connect(index_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(files)")]
+    if columns and "root" not in columns:
+        # Built before files were kept per tree, start over
+        connection.executescript("DROP TABLE IF EXISTS fields; DROP TABLE files;")
+    connection.executescript(INDEX_SCHEMA)
+    return connection
+
+
+def update_index(connection, packages_dir):
+    """Bring the index in line with the packages tree, files indexed from
+    other trees are left alone.
+
+    Files are skipped when their mtime and size are unchanged, or when
+    their content hash is. Returns (updated, unchanged, removed) counts.
+    """
+    root = Path(packages_dir).resolve()
+    known = {row[0]: row[1:] for row in connection.execute(
+        "SELECT path, mtime_ns, size, sha256 FROM files WHERE root = ?", (str(root),))}
+    updated = unchanged = 0
+    seen = set()
+
+    with connection:
+        for package, path in find_fields_files(root):
+            key = str(path)
+            seen.add(key)
+            stat = path.stat()
+            previous = known.get(key)
+            if previous and previous[:2] == (stat.st_mtime_ns, stat.st_size):
+                unchanged += 1
+                continue
+            sha256 = file_digest(path)
+            if previous and previous[2] == sha256:
+                connection.execute(
+                    "UPDATE files SET mtime_ns = ?, size = ? WHERE path = ?",
+                    (stat.st_mtime_ns, stat.st_size, key))
+                unchanged += 1
+                continue
+
+            try:
+                flattened = flatten(load_yaml(path, loader=SafeLoader))
+            except Exception as e:
+                print(f"Error parsing YAML {path}: {e}", file=sys.stderr)
+                continue
+
+            connection.execute("DELETE FROM fields WHERE path = ?", (key,))
+            connection.execute(
+                "INSERT OR REPLACE INTO files (path, root, package, mtime_ns, size, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, str(root), package, stat.st_mtime_ns, stat.st_size, sha256))
+            connection.executemany(
+                "INSERT INTO fields (name, type, package, path) VALUES (?, ?, ?, ?)",
+                [(name, ftype, package, key) for name, ftype in flattened.items()])
+            updated += 1
+
+        removed = [path for path in known if path not in seen]
+        connection.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+
+    return updated, unchanged, len(removed)
+
+
+def query_index(connection, pattern):
+    """Look up fields by name, shell-style wildcards (*, ?) are allowed."""
+    if any(c in pattern for c in "*?["):
+        sql = "SELECT DISTINCT name, type, package FROM fields WHERE name GLOB ? ORDER BY name, package"
+    else:
+        sql = "SELECT DISTINCT name, type, package FROM fields WHERE name = ? ORDER BY package"
+    return connection.execute(sql, (pattern,)).fetchall()
+
+
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(
+        description="Print the custom fields of an elastic fields.yml file in csv format"
+    )
+    parser.add_argument("yaml_file", nargs="?", help="fields.yml file")
+    parser.add_argument(
+        "-b", "--bulk", metavar="PACKAGES_DIR",
+        help="Index every fields/*.yml under a packages tree"
+    )
+    parser.add_argument(
+        "-i", "--index", default=DEFAULT_INDEX,
+        help=f"SQLite index used by --bulk and --query (default: {DEFAULT_INDEX})"
+    )
+    parser.add_argument(
+        "-q", "--query", metavar="FIELD",
+        help="Look up a field in the index, wildcards allowed (e.g. 'cisco.*')"
+    )
+    args = parser.parse_args()
+
+    if not (args.yaml_file or args.bulk or args.query):
         print("Usage: python elastic-custom-fields.py <yaml_file>")
         sys.exit(1)
 
-    file_path = sys.argv[1]
+    if args.bulk or args.query:
+        if args.query and not args.bulk and not os.path.exists(args.index):
+            print(f"Error: index '{args.index}' not found, build it with --bulk first.")
+            sys.exit(1)
+        connection = open_index(args.index)
+        try:
+            if args.bulk:
+                updated, unchanged, removed = update_index(connection, args.bulk)
+                print(f"Indexed {args.bulk}: {updated} updated, {unchanged} unchanged, "
+                      f"{removed} removed", file=sys.stderr)
+            if args.query:
+                for name, ftype, package in query_index(connection, args.query):
+                    print(f"{name},{ftype},{package}")
+        finally:
+            connection.close()
+        return
+
+    file_path = args.yaml_file
 
     try:
-        with open(file_path, "r") as f:
-            yaml_data = yaml.safe_load(f)
+        yaml_data = load_yaml(file_path, loader=SafeLoader)
         flattened = flatten(yaml_data)
         for key in flattened:
             print(f"{key},{flattened.get(key, None)}")
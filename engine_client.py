@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+
+# Client for the engine's local API socket.
+#
+# Talks HTTP/JSON over the engine's Unix socket through one reused
+# connection instead of starting an engine-* process per step. The
+# integration up/down/reload flows of handle-integration.sh and the
+# decoder update of update-decoder.sh run as batches: a failed step rolls
+# back the steps already applied, and errors come back as EngineError
+# objects instead of matched strings. What an integration loads (KVDBs,
+# decoders, rules) is read from its manifest.yml, like engine-integration
+# does.
+#
+# Environment:
+#   ENGINE_API_SOCKET   API socket path (default: /run/wazuh-server/engine-api.socket)
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+from yaml_loader import SafeLoader, load_yaml_bytes
+
+DEFAULT_SOCKET = "/run/wazuh-server/engine-api.socket"
+DEFAULT_NAMESPACE = "wazuh"
+DEFAULT_POLICY = "policy/wazuh/0"
+
+# API endpoints, one place to adjust if the engine moves them
+ENDPOINTS = {
+    "catalog_get": "/catalog/resource/get",
+    "catalog_post": "/catalog/resource/post",
+    "catalog_put": "/catalog/resource/put",
+    "catalog_delete": "/catalog/resource/delete",
+    "policy_asset_post": "/policy/asset/post",
+    "policy_asset_delete": "/policy/asset/delete",
+    "kvdb_post": "/kvdb/manager/post",
+    "kvdb_delete": "/kvdb/manager/delete",
+}
+# Calls that can be sent twice without changing the outcome
+IDEMPOTENT = {"catalog_get"}
+
+# Catalog asset lists of an integration manifest, in load order, and the
+# ruleset directory their files live in
+MANIFEST_ASSETS = (("decoders", "decoder"), ("rules", "rule"))
+
+
+class EngineError(Exception):
+    """An API call the engine rejected, or a failed transport."""
+
+    def __init__(self, endpoint, message, payload=None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.message = message
+        self.payload = payload
+
+    @property
+    def already_exists(self):
+        text = self.message.lower()
+        return "already exists" in text or "duplicate" in text
+
+    @property
+    def not_found(self):
+        text = self.message.lower()
+        return "not found" in text or "does not exist" in text or "doesn't exist" in text
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class EngineClient:
+    """One keep-alive connection to the engine API, reopened if it drops."""
+
+    def __init__(self, socket_path=None, timeout=30):
+        self.socket_path = socket_path or os.environ.get("ENGINE_API_SOCKET", DEFAULT_SOCKET)
+        self.timeout = timeout
+        self.connection = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def call(self, endpoint, payload):
+        """POST a JSON payload, returns the response body or raises EngineError."""
+        path = ENDPOINTS.get(endpoint, endpoint)
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = UnixHTTPConnection(self.socket_path, self.timeout)
+            sent = False
+            try:
+                self.connection.request("POST", path, body, headers)
+                sent = True
+                response = self.connection.getresponse()
+                raw = response.read()
+                break
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                self.close()
+                raise EngineError(path, f"can't reach {self.socket_path}: {e}", payload)
+            except (http.client.HTTPException, ConnectionError) as e:
+                # A keep-alive connection the engine closed, retry once on a
+                # new one. Once the request went out the engine may have
+                # applied it, so only calls that are safe twice are retried.
+                self.close()
+                if attempt == 2 or (sent and endpoint not in IDEMPOTENT):
+                    raise EngineError(path, f"connection failed: {e}", payload)
+            except OSError as e:
+                self.close()
+                raise EngineError(path, f"can't reach {self.socket_path}: {e}", payload)
+
+        try:
+            data = json.loads(raw) if raw else {}
+        except ValueError:
+            raise EngineError(path, f"invalid response ({response.status}): {raw[:200]!r}", payload)
+        if response.status >= 400 or data.get("status", "OK") != "OK":
+            message = data.get("error") or response.reason or f"HTTP {response.status}"
+            raise EngineError(path, message, payload)
+        return data
+
+    # Catalog
+
+    def get_asset(self, name, namespace=DEFAULT_NAMESPACE):
+        return self.call("catalog_get", {"name": name, "format": "yaml", "namespaceid": namespace})
+
+    def add_asset(self, asset_type, content, namespace=DEFAULT_NAMESPACE):
+        return self.call("catalog_post", {
+            "type": asset_type, "format": "yaml", "content": content, "namespaceid": namespace})
+
+    def update_asset(self, name, content, namespace=DEFAULT_NAMESPACE):
+        return self.call("catalog_put", {
+            "name": name, "format": "yaml", "content": content, "namespaceid": namespace})
+
+    def delete_asset(self, name, namespace=DEFAULT_NAMESPACE):
+        return self.call("catalog_delete", {"name": name, "namespaceid": namespace})
+
+    # KVDBs
+
+    def create_kvdb(self, name, path):
+        return self.call("kvdb_post", {"name": name, "path": str(path)})
+
+    def delete_kvdb(self, name):
+        return self.call("kvdb_delete", {"name": name})
+
+    # Policy
+
+    def add_policy_asset(self, asset, namespace=DEFAULT_NAMESPACE, policy=DEFAULT_POLICY):
+        return self.call("policy_asset_post", {
+            "policy": policy, "asset": asset, "namespace": namespace})
+
+    def remove_policy_asset(self, asset, namespace=DEFAULT_NAMESPACE, policy=DEFAULT_POLICY):
+        return self.call("policy_asset_delete", {
+            "policy": policy, "asset": asset, "namespace": namespace})
+
+
+class Batch:
+    """Steps applied in order, undone in reverse if one fails."""
+
+    def __init__(self):
+        self.steps = []
+
+    def add(self, description, do, undo=None):
+        self.steps.append((description, do, undo))
+
+    def run(self):
+        """Returns a report: {"ok", "steps": [...], "error", "rolled_back"}."""
+        report = {"ok": True, "steps": [], "error": None, "rolled_back": []}
+        done = []
+        for description, do, undo in self.steps:
+            try:
+                do()
+            except EngineError as e:
+                report["ok"] = False
+                report["error"] = {"step": description, "endpoint": e.endpoint,
+                                   "message": e.message, "already_exists": e.already_exists}
+                report["steps"].append({"step": description, "status": "failed"})
+                for undo_description, undo_step in reversed(done):
+                    try:
+                        undo_step()
+                        report["rolled_back"].append(undo_description)
+                    except EngineError:
+                        report["rolled_back"].append(f"{undo_description} (failed)")
+                return report
+            report["steps"].append({"step": description, "status": "ok"})
+            if undo is not None:
+                done.append((description, undo))
+        return report
+
+
+def read_assets(directory):
+    """(file, yaml text) of every asset definition in a directory, sorted."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return [(path, path.read_text(encoding="utf-8"))
+            for path in sorted(directory.rglob("*.yml"))]
+
+
+def asset_name(content):
+    for line in content.splitlines():
+        if line.startswith("name:"):
+            return line.split(":", 1)[1].strip().strip("'\"")
+    raise ValueError("asset has no top-level name")
+
+
+def parents_first(assets):
+    """Order (path, content) decoders so each comes after the parents it
+    ships with, the catalog rejects a decoder whose parent isn't loaded."""
+    by_name = {asset_name(content): (path, content) for path, content in assets}
+    ordered, seen = [], set()
+
+    def visit(name, trail):
+        if name in seen or name not in by_name:
+            return
+        if name in trail:
+            raise ValueError(f"Decoder parent cycle: {' -> '.join(trail + [name])}")
+        path, content = by_name[name]
+        definition = load_yaml_bytes(content.encode(), loader=SafeLoader) or {}
+        for parent in definition.get("parents") or []:
+            visit(parent, trail + [name])
+        seen.add(name)
+        ordered.append((path, content))
+
+    for name in by_name:
+        visit(name, [])
+    return ordered
+
+
+class IntegrationManager:
+    """up/down/reload of one integration over a single client connection."""
+
+    def __init__(self, client, ruleset_dir, namespace=DEFAULT_NAMESPACE, policy=DEFAULT_POLICY,
+                 test_config=False):
+        self.client = client
+        self.ruleset_dir = Path(ruleset_dir)
+        self.namespace = namespace
+        self.policy = policy
+        # up also adds the engine-test configuration, as the last step
+        self.test_config = test_config
+
+    def find_assets(self, asset_type, name, wanted, manifest):
+        """(path, content) of the wanted assets, looked up in the
+        integration's directory first and then in the whole ruleset."""
+        found = {}
+        for directory in (self.ruleset_dir / f"{asset_type}s" / name,
+                          self.ruleset_dir / f"{asset_type}s"):
+            missing = set(wanted) - set(found)
+            if not missing:
+                break
+            for path, content in read_assets(directory):
+                try:
+                    asset = asset_name(content)
+                except ValueError:
+                    continue
+                if asset in missing and asset not in found:
+                    found[asset] = (path, content)
+        missing = [asset for asset in wanted if asset not in found]
+        if missing:
+            raise FileNotFoundError(f"{', '.join(missing)} listed in {manifest} not found "
+                                    f"under {self.ruleset_dir / f'{asset_type}s'}")
+        return [found[asset] for asset in wanted]
+
+    def integration_assets(self, name):
+        """(type, asset name, path, content) of what manifest.yml lists:
+        KVDBs, decoders (parents first), rules, then the manifest itself.
+        A KVDB's content is None, the engine reads its file."""
+        integration_dir = self.ruleset_dir / "integrations" / name
+        manifest = integration_dir / "manifest.yml"
+        if not manifest.exists():
+            raise FileNotFoundError(f"Integration manifest not found: {manifest}")
+        content = manifest.read_text(encoding="utf-8")
+        definition = load_yaml_bytes(content.encode(), loader=SafeLoader) or {}
+        if not isinstance(definition, dict):
+            raise ValueError(f"{manifest}: not a mapping")
+
+        assets = []
+        for kvdb in definition.get("kvdbs") or []:
+            path = integration_dir / "kvdbs" / f"{kvdb}.json"
+            if not path.exists():
+                raise FileNotFoundError(f"KVDB {kvdb} listed in {manifest} not found: {path}")
+            assets.append(("kvdb", kvdb, path, None))
+        for key, asset_type in MANIFEST_ASSETS:
+            found = self.find_assets(asset_type, name, definition.get(key) or [], manifest)
+            if asset_type == "decoder":
+                found = parents_first(found)
+            assets.extend((asset_type, asset_name(text), path, text) for path, text in found)
+        assets.append(("integration", asset_name(content), manifest, content))
+        return assets
+
+    def up_batch(self, name):
+        batch = Batch()
+        for asset_type, asset, path, content in self.integration_assets(name):
+            if asset_type == "kvdb":
+                batch.add(f"create kvdb {asset}",
+                          lambda a=asset, p=path: self.client.create_kvdb(a, p),
+                          lambda a=asset: self.client.delete_kvdb(a))
+                continue
+            batch.add(f"add {asset}",
+                      lambda t=asset_type, c=content: self.client.add_asset(t, c, self.namespace),
+                      lambda a=asset: self.client.delete_asset(a, self.namespace))
+        integration = f"integration/{name}/0"
+        batch.add(f"add {integration} to {self.policy}",
+                  lambda: self.client.add_policy_asset(integration, self.namespace, self.policy),
+                  lambda: self.client.remove_policy_asset(integration, self.namespace, self.policy))
+        if self.test_config:
+            batch.add("add test configuration",
+                      lambda: engine_test_step(add_test_configuration(name)),
+                      lambda: engine_test_step(delete_test_configuration(name)))
+        return batch
+
+    def up(self, name):
+        return self.up_batch(name).run()
+
+    def down(self, name):
+        """Remove everything, tolerating the parts that are already gone."""
+        report = {"ok": True, "steps": [], "error": None, "rolled_back": []}
+        integration = f"integration/{name}/0"
+        steps = [(f"remove {integration} from {self.policy}",
+                  lambda: self.client.remove_policy_asset(integration, self.namespace, self.policy))]
+        for asset_type, asset, _, _ in reversed(self.integration_assets(name)):
+            if asset_type == "kvdb":
+                steps.append((f"delete kvdb {asset}",
+                              lambda a=asset: self.client.delete_kvdb(a)))
+            else:
+                steps.append((f"delete {asset}",
+                              lambda a=asset: self.client.delete_asset(a, self.namespace)))
+        for description, step in steps:
+            try:
+                step()
+                report["steps"].append({"step": description, "status": "ok"})
+            except EngineError as e:
+                if e.not_found:
+                    report["steps"].append({"step": description, "status": "absent"})
+                    continue
+                report["ok"] = False
+                report["steps"].append({"step": description, "status": "failed"})
+                report["error"] = report["error"] or {
+                    "step": description, "endpoint": e.endpoint, "message": e.message}
+        return report
+
+    def reload(self, name):
+        down = self.down(name)
+        up = self.up(name)
+        up["steps"] = down["steps"] + up["steps"]
+        if not down["ok"] and up["ok"]:
+            up["error"] = down["error"]
+        return up
+
+    def update_decoder(self, name, directory=None, file_name=None):
+        path = self.ruleset_dir / "decoders" / (directory or name) / (file_name or f"{name}.yml")
+        content = path.read_text(encoding="utf-8")
+        batch = Batch()
+        batch.add(f"update decoder/{name}/0",
+                  lambda: self.client.update_asset(f"decoder/{name}/0", content, self.namespace))
+        return batch.run()
+
+
+def run_engine_test(*args):
+    """engine-test keeps its configuration locally, outside the API."""
+    try:
+        result = subprocess.run(["engine-test", *args], capture_output=True, text=True)
+    except OSError as e:
+        return False, str(e)
+    return result.returncode == 0, (result.stderr or result.stdout).strip()
+
+
+def add_test_configuration(name):
+    return run_engine_test("add", "-i", name, "-f", "single-line", "-c", "file",
+                           "-m", "syslog", "--log-file-path", "")
+
+
+def delete_test_configuration(name):
+    return run_engine_test("delete", name)
+
+
+def engine_test_step(result):
+    """Batch step over an engine-test (ok, message) result."""
+    ok, message = result
+    if not ok:
+        raise EngineError("engine-test", message)
+
+
+def print_report(report, as_json=False):
+    if as_json:
+        print(json.dumps(report, indent=2))
+        return
+    for step in report["steps"]:
+        print(f"[{step['status'].upper()}] {step['step']}", file=sys.stderr)
+    if report["error"]:
+        print(f"[ERROR] {report['error']['step']}: {report['error']['message']}", file=sys.stderr)
+    for step in report["rolled_back"]:
+        print(f"[ROLLBACK] {step}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage integrations and decoders through the engine API socket"
+    )
+    parser.add_argument("action", choices=["up", "down", "reload", "update-decoder"])
+    parser.add_argument("name", help="Integration or decoder name")
+    parser.add_argument("-n", "--namespace", default=DEFAULT_NAMESPACE,
+                        help=f"Namespace (default: {DEFAULT_NAMESPACE})")
+    parser.add_argument("-r", "--ruleset", default="ruleset",
+                        help="Ruleset directory (default: ./ruleset)")
+    parser.add_argument("-p", "--policy", default=DEFAULT_POLICY,
+                        help=f"Policy (default: {DEFAULT_POLICY})")
+    parser.add_argument("-s", "--socket", help=f"API socket (default: {DEFAULT_SOCKET})")
+    parser.add_argument("-d", "--decoder-dir", help="update-decoder: decoder directory")
+    parser.add_argument("-f", "--decoder-file", help="update-decoder: decoder file")
+    parser.add_argument("--no-test-config", action="store_true",
+                        help="Don't add or remove the engine-test configuration")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if args.action in ("down", "reload") and not args.no_test_config:
+        # A missing test configuration is fine, like in handle-integration.sh
+        delete_test_configuration(args.name)
+
+    with EngineClient(args.socket) as client:
+        manager = IntegrationManager(client, args.ruleset, args.namespace, args.policy,
+                                     not args.no_test_config)
+        try:
+            if args.action == "up":
+                report = manager.up(args.name)
+            elif args.action == "down":
+                report = manager.down(args.name)
+            elif args.action == "reload":
+                report = manager.reload(args.name)
+            else:
+                report = manager.update_decoder(args.name, args.decoder_dir, args.decoder_file)
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+
+    print_report(report, args.json)
+    if not args.json and report["ok"]:
+        print(f"[SUCCESS] {args.action} {args.name} completed", file=sys.stderr)
+    elif not args.json and args.action == "up" and report["error"].get("already_exists"):
+        print("[INFO] Use reload to replace the integration or down to remove it first",
+              file=sys.stderr)
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
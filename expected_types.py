@@ -1,8 +1,30 @@
+if __name__ == "__main__":
+    # Hand the run to the conversion daemon when one is listening
+    # (decoders_utils/daemon.py), before paying for the imports below
+    from decoders_utils.client import forward
+    forward("infer")
+
+import argparse
+import hashlib
 import json
+import os
+import pickle
 import sys
 import csv
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import cache_dirs
+from json_stream import iter_file_documents
+
+# Default prefixes skipped along with their whole subtree
+SKIPPED_PREFIXES = ["agent", "@timestamp", "wazuh"]
+
+# Bump when the cached ECS index representation changes
+ECS_CACHE_VERSION = 1
+
 # Map Python types to OpenSearch data types
 TYPE_MAP = {
     "str": "keyword",
@@ -41,43 +63,357 @@ def load_ecs_fields(csv_path):
     return ecs_fields
 
 
-def describe_types(obj, ecs_fields, path=""):
+class EcsIndex:
+    """Prefix tree over ECS field names and skipped prefixes.
+
+    Nodes are nested dicts keyed by path segment, the "" key holds the
+    node flags. Walking the tree alongside an event turns every lookup
+    into a single dict access, and an ECS field or skipped prefix drops
+    its whole subtree at once.
+    """
+
+    ECS = 1
+    SKIP = 2
+    ECS_OBJECT = 4
+
+    def __init__(self, fields=(), skip_prefixes=()):
+        self.root = {}
+        for field in fields:
+            self.add(field, self.ECS)
+        for prefix in skip_prefixes:
+            self.add(prefix, self.SKIP)
+
+    def add(self, path, flag):
+        node = self.root
+        parts = path.split(".")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if flag == self.ECS:
+                node[""] = node.get("", 0) | self.ECS_OBJECT
+        node = node.setdefault(parts[-1], {})
+        node[""] = node.get("", 0) | flag
+
+    def child(self, node, key):
+        """Node for key under node, None once outside the tree."""
+        if node is None:
+            return None
+        if "." in key:
+            for part in key.split("."):
+                node = node.get(part)
+                if node is None:
+                    return None
+            return node
+        return node.get(key)
+
+    @staticmethod
+    def skipped(node):
+        """ECS fields and skipped prefixes are dropped with their subtree."""
+        return node is not None and node.get("", 0) & (EcsIndex.ECS | EcsIndex.SKIP) != 0
+
+    @staticmethod
+    def is_ecs_object(node):
+        """Intermediate ECS node (e.g. "source"): not printed, but its
+        children may still hold custom fields."""
+        return node is not None and node.get("", 0) & EcsIndex.ECS_OBJECT != 0
+
+    def __contains__(self, path):
+        return self.skipped(self.child(self.root, path))
+
+
+# ECS indexes already loaded by this process (a daemon worker serves many
+# runs), by CSV path, stat and skipped prefixes
+_loaded_indexes = {}
+
+
+def ecs_cache_path(csv_path):
+    name = hashlib.sha256(str(Path(csv_path).resolve()).encode()).hexdigest()
+    return cache_dirs.cache_dir("ecs") / f"{name}.pickle"
+
+
+def load_ecs_index(csv_path, skip_prefixes=SKIPPED_PREFIXES, use_cache=True):
+    """Load the ECS reference as an EcsIndex, compiled once and cached.
+
+    The cache is reused while the CSV mtime and size are unchanged, or
+    while its content hash is. Within a process, the index itself is
+    reused while the CSV stat is unchanged.
+    """
+    stat = os.stat(csv_path)
+    key = (str(Path(csv_path).resolve()), stat.st_mtime_ns, stat.st_size, tuple(skip_prefixes))
+    if use_cache and key in _loaded_indexes:
+        return _loaded_indexes[key]
+    cache_path = ecs_cache_path(csv_path)
+    cached = None
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get("version") != ECS_CACHE_VERSION:
+                cached = None
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            cached = None
+
+    if cached and (cached["mtime_ns"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+        root = cached["root"]
+    else:
+        with open(csv_path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        if cached and cached["sha256"] == sha256:
+            root = cached["root"]
+        else:
+            root = EcsIndex(load_ecs_fields(csv_path)).root
+        if use_cache:
+            write_ecs_cache(cache_path, {
+                "version": ECS_CACHE_VERSION,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": sha256,
+                "root": root,
+            })
+
+    index = EcsIndex()
+    index.root = root
+    for prefix in skip_prefixes:
+        index.add(prefix, EcsIndex.SKIP)
+    if use_cache:
+        _loaded_indexes[key] = index
+    return index
+
+
+def write_ecs_cache(cache_path, data):
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pickle.PickleError):
+        pass
+
+
+def describe_types(obj, ecs_index, path="", node=None):
     """Recursively print fields in YAML-style OpenSearch mapping format, skipping ECS fields."""
+    if node is None and not path:
+        node = ecs_index.root
     if isinstance(obj, dict):
         for key, value in obj.items():
-            if key in ["agent", "@timestamp", "wazuh"]:
-                continue  # Skip known non-relevant fields
+            child = ecs_index.child(node, key)
+            if ecs_index.skipped(child):
+                continue  # Skip ECS fields and known non-relevant prefixes
             full_path = f"{path}.{key}" if path else key
-            if full_path in ecs_fields:
-                continue  # Skip ECS field
-            os_type = to_opensearch_type(value)
-            print(f"- field: {full_path}")
-            print(f"  type: {os_type}")
-            print(f"  description: |")
-            print(f"    <COPILOT, REPLACE THIS WITH A 5 WORD+ DESCRIPTION OF THE FIELD NAME ENDING WITH A DOT.>\n")
-            describe_types(value, ecs_fields, full_path)
+            if not ecs_index.is_ecs_object(child):
+                os_type = to_opensearch_type(value)
+                print(f"- field: {full_path}")
+                print(f"  type: {os_type}")
+                print(f"  description: |")
+                print(f"    <COPILOT, REPLACE THIS WITH A 5 WORD+ DESCRIPTION OF THE FIELD NAME ENDING WITH A DOT.>\n")
+            describe_types(value, ecs_index, full_path, child)
     elif isinstance(obj, list):
         # Assume all elements in the list share the same structure
         if obj:
             first = obj[0]
-            describe_types(first, ecs_fields, path)
+            describe_types(first, ecs_index, path, node)
 
 
-def main():
-    if len(sys.argv) < 3:
-        print(f"Usage: {Path(sys.argv[0]).name} <json_file> <ecs_csv>")
-        sys.exit(1)
+class FieldStats:
+    __slots__ = ("types", "count", "sources")
 
-    json_path = Path(sys.argv[1])
-    ecs_csv_path = Path(sys.argv[2])
+    def __init__(self):
+        self.types = Counter()
+        self.count = 0
+        # type -> files it was seen in, only tracked for named sources
+        self.sources = {}
 
-    if not json_path.exists():
-        print(f"Error: JSON file '{json_path}' not found.")
-        sys.exit(1)
+    def add(self, os_type, source=None):
+        self.types[os_type] += 1
+        self.count += 1
+        if source is not None:
+            self.sources.setdefault(os_type, set()).add(source)
+
+    def merge(self, other):
+        self.types.update(other.types)
+        self.count += other.count
+        for os_type, files in other.sources.items():
+            self.sources.setdefault(os_type, set()).update(files)
+
+    def type(self):
+        """Most common type, ignoring nulls unless nothing else was seen."""
+        for os_type, _ in self.types.most_common():
+            if os_type != "null":
+                return os_type
+        return "null"
+
+    def conflicts(self):
+        return len([t for t in self.types if t != "null"]) > 1
+
+
+class SchemaSummary:
+    """Per-field type summary merged across events.
+
+    Memory is bounded by the number of distinct fields, not of events.
+    """
+
+    def __init__(self, ecs_index=None, source=None):
+        if ecs_index is None:
+            ecs_index = EcsIndex(skip_prefixes=SKIPPED_PREFIXES)
+        self.ecs_index = ecs_index
+        self.source = source
+        self.fields = {}
+        self.documents = 0
+
+    def add_document(self, document):
+        self.documents += 1
+        self.add_value(document, "", self.ecs_index.root)
+
+    def add_value(self, obj, path, node):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                child = self.ecs_index.child(node, key)
+                if self.ecs_index.skipped(child):
+                    continue
+                full_path = f"{path}.{key}" if path else key
+                if not self.ecs_index.is_ecs_object(child):
+                    stats = self.fields.get(full_path)
+                    if stats is None:
+                        stats = self.fields[full_path] = FieldStats()
+                    stats.add(to_opensearch_type(value), self.source)
+                self.add_value(value, full_path, child)
+        elif isinstance(obj, list):
+            # Every element counts, later ones may carry extra fields
+            for item in obj:
+                self.add_value(item, path, node)
+
+    def merge(self, other):
+        """Fold another summary into this one. Merging is associative, so
+        partial summaries can be combined in any grouping."""
+        self.documents += other.documents
+        for name, stats in other.fields.items():
+            if name in self.fields:
+                self.fields[name].merge(stats)
+            else:
+                self.fields[name] = stats
+
+    def describe(self):
+        """Print the summary in the same YAML-style format as describe_types."""
+        for name, stats in self.fields.items():
+            print(f"- field: {name}")
+            print(f"  type: {stats.type()}")
+            print(f"  # occurrences: {stats.count} in {self.documents} events")
+            if stats.conflicts():
+                seen = []
+                for os_type, n in stats.types.most_common():
+                    files = stats.sources.get(os_type)
+                    if files:
+                        seen.append(f"{os_type} ({n}) from {', '.join(sorted(files))}")
+                    else:
+                        seen.append(f"{os_type} ({n})")
+                print(f"  # conflict: {'; '.join(seen)}")
+            print(f"  description: |")
+            print(f"    <COPILOT, REPLACE THIS WITH A 5 WORD+ DESCRIPTION OF THE FIELD NAME ENDING WITH A DOT.>\n")
+
+
+def summarize_file(json_path, ecs_index, source=None):
+    """Stream every event of a JSON file into a SchemaSummary."""
+    summary = SchemaSummary(ecs_index, source)
+    for document in iter_file_documents(json_path):
+        summary.add_document(document)
+    return summary
+
+
+# ECS index of a summarize_files worker, set once by init_worker
+_worker_index = None
+
+
+def init_worker(ecs_index):
+    global _worker_index
+    _worker_index = ecs_index
+
+
+def summarize_worker(json_path):
+    summary = summarize_file(json_path, _worker_index, str(json_path))
+    # The ECS index is the same for every file, don't ship it back
+    summary.ecs_index = None
+    return summary
+
+
+def summarize_files(json_paths, ecs_index, jobs=None):
+    """Map: summarize each file on a worker pool. Reduce: merge the partial
+    summaries in input order, so the report is deterministic.
+
+    The ECS index goes to each worker once, not with every file."""
+    merged = SchemaSummary(ecs_index)
+    if not json_paths:
+        return merged
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(jobs, len(json_paths)),
+                             initializer=init_worker, initargs=(ecs_index,)) as executor:
+        for partial in executor.map(summarize_worker, json_paths):
+            merged.merge(partial)
+    return merged
+
+
+def expand_json_inputs(inputs):
+    """Resolve files and directories (searched for *-expected.json)."""
+    files = []
+    for item in inputs:
+        if item.is_dir():
+            files.extend(sorted(item.rglob("*-expected.json")))
+        else:
+            files.append(item)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the OpenSearch types of the non-ECS fields of expected events"
+    )
+    parser.add_argument(
+        "json_files", type=Path, nargs="+",
+        help="Expected events JSON file(s), or directories searched for *-expected.json"
+    )
+    parser.add_argument("ecs_csv", type=Path, help="ECS fields CSV file")
+    parser.add_argument(
+        "-a", "--all", action="store_true",
+        help="Stream every event (arrays, expected files, NDJSON or concatenated "
+             "documents) and merge their types instead of reading only the first one"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="Worker processes when several files are given (default: number of cores)"
+    )
+    parser.add_argument(
+        "-s", "--skip-prefix", action="append", dest="skip_prefixes", metavar="PREFIX",
+        help="Field prefix skipped with its whole subtree, can be repeated "
+             f"(default: {', '.join(SKIPPED_PREFIXES)})"
+    )
+    parser.add_argument(
+        "--no-ecs-cache", action="store_true",
+        help="Rebuild the ECS index from the CSV instead of using the cached one"
+    )
+    args = parser.parse_args()
+
+    ecs_csv_path = args.ecs_csv
+    for json_path in args.json_files:
+        if not json_path.exists():
+            print(f"Error: JSON file '{json_path}' not found.")
+            sys.exit(1)
     if not ecs_csv_path.exists():
         print(f"Error: ECS CSV file '{ecs_csv_path}' not found.")
         sys.exit(1)
 
+    skip_prefixes = SKIPPED_PREFIXES if args.skip_prefixes is None else args.skip_prefixes
+    ecs_index = load_ecs_index(ecs_csv_path, skip_prefixes, not args.no_ecs_cache)
+
+    json_path = args.json_files[0]
+    if len(args.json_files) > 1 or json_path.is_dir():
+        # Multi-file mode always reads every event
+        json_paths = expand_json_inputs(args.json_files)
+        summarize_files(json_paths, ecs_index, args.jobs).describe()
+        return
+
+    if args.all:
+        summarize_file(json_path, ecs_index).describe()
+        return
+
     with open(json_path, "r") as f:
         data = json.load(f)
 
@@ -85,8 +421,7 @@ def main():
     if isinstance(data, list) and data:
         data = data[0]
 
-    ecs_fields = load_ecs_fields(ecs_csv_path)
-    describe_types(data, ecs_fields)
+    describe_types(data, ecs_index)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+
+# Grok pattern library and %{NAME} reference resolver.
+#
+# The standard Elastic grok patterns are indexed once per process. A
+# PatternResolver combines them with a pipeline's pattern_definitions,
+# resolves references recursively (memoized, with cycle detection) and
+# translates grok patterns into decoder parse expressions or Python
+# regular expressions.
+
+import re
+import sys
+
+# %{NAME}, %{NAME:field} or %{NAME:field:type}
+REFERENCE = re.compile(r"%\{(\w+)((?::[^:}]+){0,2})\}")
+
+# Standard grok patterns (legacy set), written for Python's re module
+STANDARD_PATTERNS = r"""
+USERNAME [a-zA-Z0-9._-]+
+USER %{USERNAME}
+EMAILLOCALPART [a-zA-Z0-9!#$%&'*+\-/=?^_`{|}~]{1,64}(?:\.[a-zA-Z0-9!#$%&'*+\-/=?^_`{|}~]{1,62}){0,63}
+EMAILADDRESS %{EMAILLOCALPART}@%{HOSTNAME}
+INT (?:[+-]?(?:[0-9]+))
+BASE10NUM (?<![0-9.+-])(?>[+-]?(?:(?:[0-9]+(?:\.[0-9]+)?)|(?:\.[0-9]+)))
+NUMBER (?:%{BASE10NUM})
+BASE16NUM (?<![0-9A-Fa-f])(?:[+-]?(?:0x)?(?:[0-9A-Fa-f]+))
+BASE16FLOAT \b(?<![0-9A-Fa-f.])(?:[+-]?(?:0x)?(?:(?:[0-9A-Fa-f]+(?:\.[0-9A-Fa-f]*)?)|(?:\.[0-9A-Fa-f]+)))\b
+POSINT \b(?:[1-9][0-9]*)\b
+NONNEGINT \b(?:[0-9]+)\b
+WORD \b\w+\b
+NOTSPACE \S+
+SPACE \s*
+DATA .*?
+GREEDYDATA .*
+QUOTEDSTRING (?>(?<!\\)(?>"(?>\\.|[^\\"]+)+"|""|(?>'(?>\\.|[^\\']+)+')|''|(?>`(?>\\.|[^\\`]+)+`)|``))
+UUID [A-Fa-f0-9]{8}-(?:[A-Fa-f0-9]{4}-){3}[A-Fa-f0-9]{12}
+URN urn:[0-9A-Za-z][0-9A-Za-z-]{0,31}:(?:%[0-9a-fA-F]{2}|[0-9A-Za-z()+,.:=@;$_!*'/?#-])+
+MAC (?:%{CISCOMAC}|%{WINDOWSMAC}|%{COMMONMAC})
+CISCOMAC (?:(?:[A-Fa-f0-9]{4}\.){2}[A-Fa-f0-9]{4})
+WINDOWSMAC (?:(?:[A-Fa-f0-9]{2}-){5}[A-Fa-f0-9]{2})
+COMMONMAC (?:(?:[A-Fa-f0-9]{2}:){5}[A-Fa-f0-9]{2})
+IPV6 ((([0-9A-Fa-f]{1,4}:){7}([0-9A-Fa-f]{1,4}|:))|(([0-9A-Fa-f]{1,4}:){6}(:[0-9A-Fa-f]{1,4}|((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3})|:))|(([0-9A-Fa-f]{1,4}:){5}(((:[0-9A-Fa-f]{1,4}){1,2})|:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3})|:))|(([0-9A-Fa-f]{1,4}:){4}(((:[0-9A-Fa-f]{1,4}){1,3})|((:[0-9A-Fa-f]{1,4})?:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}))|:))|(([0-9A-Fa-f]{1,4}:){3}(((:[0-9A-Fa-f]{1,4}){1,4})|((:[0-9A-Fa-f]{1,4}){0,2}:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}))|:))|(([0-9A-Fa-f]{1,4}:){2}(((:[0-9A-Fa-f]{1,4}){1,5})|((:[0-9A-Fa-f]{1,4}){0,3}:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}))|:))|(([0-9A-Fa-f]{1,4}:){1}(((:[0-9A-Fa-f]{1,4}){1,6})|((:[0-9A-Fa-f]{1,4}){0,4}:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}))|:))|(:(((:[0-9A-Fa-f]{1,4}){1,7})|((:[0-9A-Fa-f]{1,4}){0,5}:((25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)(\.(25[0-5]|2[0-4]\d|1\d\d|[1-9]?\d)){3}))|:)))(%.+)?
+IPV4 (?<![0-9])(?:(?:[0-1]?[0-9]{1,2}|2[0-4][0-9]|25[0-5])[.](?:[0-1]?[0-9]{1,2}|2[0-4][0-9]|25[0-5])[.](?:[0-1]?[0-9]{1,2}|2[0-4][0-9]|25[0-5])[.](?:[0-1]?[0-9]{1,2}|2[0-4][0-9]|25[0-5]))(?![0-9])
+IP (?:%{IPV6}|%{IPV4})
+HOSTNAME \b(?:[0-9A-Za-z][0-9A-Za-z-]{0,62})(?:\.(?:[0-9A-Za-z][0-9A-Za-z-]{0,62}))*(?:\.?|\b)
+IPORHOST (?:%{IP}|%{HOSTNAME})
+HOSTPORT %{IPORHOST}:%{POSINT}
+PATH (?:%{UNIXPATH}|%{WINPATH})
+UNIXPATH (?:/[\w_%!$@:.,+~-]*)+
+TTY (?:/dev/(?:pts|tty(?:[pq])?)(?:\w+)?/?(?:[0-9]+))
+WINPATH (?>[A-Za-z]+:|\\)(?:\\[^\\?*]*)+
+URIPROTO [A-Za-z](?:[A-Za-z0-9+\-.]+)+
+URIHOST %{IPORHOST}(?::%{POSINT})?
+URIPATH (?:/[A-Za-z0-9$.+!*'(){},~:;=@#%&_\-]*)+
+URIQUERY [A-Za-z0-9$.+!*'|(){},~@#%&/=:;_?\-\[\]<>]*
+URIPARAM \?%{URIQUERY}
+URIPATHPARAM %{URIPATH}(?:\?%{URIQUERY})?
+URI %{URIPROTO}://(?:%{USER}(?::[^@]*)?@)?(?:%{URIHOST})?(?:%{URIPATH}(?:\?%{URIQUERY})?)?
+MONTH \b(?:[Jj]an(?:uary|uar)?|[Ff]eb(?:ruary|ruar)?|[Mm](?:a|ä)?r(?:ch|z)?|[Aa]pr(?:il)?|[Mm]a(?:y|i)?|[Jj]un(?:e|i)?|[Jj]ul(?:y|i)?|[Aa]ug(?:ust)?|[Ss]ep(?:tember)?|[Oo](?:c|k)?t(?:ober)?|[Nn]ov(?:ember)?|[Dd]e(?:c|z)(?:ember)?)\b
+MONTHNUM (?:0?[1-9]|1[0-2])
+MONTHNUM2 (?:0[1-9]|1[0-2])
+MONTHDAY (?:(?:0[1-9])|(?:[12][0-9])|(?:3[01])|[1-9])
+DAY (?:Mon(?:day)?|Tue(?:sday)?|Wed(?:nesday)?|Thu(?:rsday)?|Fri(?:day)?|Sat(?:urday)?|Sun(?:day)?)
+YEAR (?>\d\d){1,2}
+HOUR (?:2[0123]|[01]?[0-9])
+MINUTE (?:[0-5][0-9])
+SECOND (?:(?:[0-5]?[0-9]|60)(?:[:.,][0-9]+)?)
+TIME (?!<[0-9])%{HOUR}:%{MINUTE}(?::%{SECOND})(?![0-9])
+DATE_US %{MONTHNUM}[/-]%{MONTHDAY}[/-]%{YEAR}
+DATE_EU %{MONTHDAY}[./-]%{MONTHNUM}[./-]%{YEAR}
+ISO8601_TIMEZONE (?:Z|[+-]%{HOUR}(?::?%{MINUTE}))
+ISO8601_SECOND %{SECOND}
+TIMESTAMP_ISO8601 %{YEAR}-%{MONTHNUM}-%{MONTHDAY}[T ]%{HOUR}:?%{MINUTE}(?::?%{SECOND})?%{ISO8601_TIMEZONE}?
+DATE %{DATE_US}|%{DATE_EU}
+DATESTAMP %{DATE}[- ]%{TIME}
+TZ (?:[APMCE][SD]T|UTC)
+DATESTAMP_RFC822 %{DAY} %{MONTH} %{MONTHDAY} %{YEAR} %{TIME} %{TZ}
+DATESTAMP_RFC2822 %{DAY}, %{MONTHDAY} %{MONTH} %{YEAR} %{TIME} %{ISO8601_TIMEZONE}
+DATESTAMP_OTHER %{DAY} %{MONTH} %{MONTHDAY} %{TIME} %{TZ} %{YEAR}
+DATESTAMP_EVENTLOG %{YEAR}%{MONTHNUM2}%{MONTHDAY}%{HOUR}%{MINUTE}%{SECOND}
+SYSLOGTIMESTAMP %{MONTH} +%{MONTHDAY} %{TIME}
+PROG [\x21-\x5a\x5c\x5e-\x7e]+
+SYSLOGPROG %{PROG:program}(?:\[%{POSINT:pid}\])?
+SYSLOGHOST %{IPORHOST}
+SYSLOGFACILITY <%{NONNEGINT:facility}.%{NONNEGINT:priority}>
+HTTPDATE %{MONTHDAY}/%{MONTH}/%{YEAR}:%{TIME} %{INT}
+QS %{QUOTEDSTRING}
+SYSLOGBASE %{SYSLOGTIMESTAMP:timestamp} (?:%{SYSLOGFACILITY} )?%{SYSLOGHOST:logsource} %{SYSLOGPROG}:
+LOGLEVEL ([Aa]lert|ALERT|[Tt]race|TRACE|[Dd]ebug|DEBUG|[Nn]otice|NOTICE|[Ii]nfo?(?:rmation)?|INFO?(?:RMATION)?|[Ww]arn?(?:ing)?|WARN?(?:ING)?|[Ee]rr?(?:or)?|ERR?(?:OR)?|[Cc]rit?(?:ical)?|CRIT?(?:ICAL)?|[Ff]atal|FATAL|[Ss]evere|SEVERE|EMERG(?:ENCY)?|[Ee]merg(?:ency)?)
+"""
+
+
+class GrokCycleError(ValueError):
+    """Pattern definitions that reference themselves."""
+
+    def __init__(self, chain):
+        super().__init__(f"Grok pattern definition cycle: {' -> '.join(chain)}")
+        self.chain = chain
+
+
+def parse_patterns(text):
+    """Index a grok patterns file ("NAME definition" per line)."""
+    patterns = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, _, definition = line.partition(" ")
+        patterns[name] = definition.strip()
+    return patterns
+
+
+LIBRARY = parse_patterns(STANDARD_PATTERNS)
+
+
+def group_name(field, taken):
+    """A unique Python group name for a grok field."""
+    name = re.sub(r"\W", "_", field) or "_"
+    if name[0].isdigit():
+        name = f"_{name}"
+    base, n = name, 1
+    while name in taken:
+        n += 1
+        name = f"{base}_{n}"
+    taken[name] = field
+    return name
+
+
+class PatternResolver:
+    """Resolves %{NAME} references against custom definitions layered over
+    the standard library.
+
+    Each definition is expanded once and reused: a resolver without
+    custom definitions is shared (see library_resolver), so the standard
+    patterns are expanded once per process across a whole batch.
+    """
+
+    def __init__(self, definitions=None, library=LIBRARY):
+        self.definitions = dict(definitions or {})
+        self.library = library
+        # Without shadowed standard names, standard expansions can come
+        # from the shared resolver
+        self.shared = (library is LIBRARY
+                       and not any(name in library for name in self.definitions))
+        self.decoder_cache = {}
+        self.regex_cache = {}
+        self.translated = {}
+
+    def definition(self, name):
+        if name in self.definitions:
+            return self.definitions[name]
+        return self.library.get(name)
+
+    def dependencies(self, name):
+        """Names referenced by a definition, in order."""
+        definition = self.definition(name) or ""
+        return [match.group(1) for match in REFERENCE.finditer(definition)]
+
+    def check_cycles(self):
+        """Raise GrokCycleError if the custom definitions form a cycle."""
+        state = {}
+
+        def visit(name, trail):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise GrokCycleError(trail[trail.index(name):] + [name])
+            state[name] = "visiting"
+            for dep in self.dependencies(name):
+                if self.definition(dep) is not None:
+                    visit(dep, trail + [name])
+            state[name] = "done"
+
+        for name in self.definitions:
+            visit(name, [])
+
+    # Decoder parse expressions
+
+    def decoder_definition(self, name, trail=()):
+        """A custom definition with its references translated, recursively."""
+        if name in self.decoder_cache:
+            return self.decoder_cache[name]
+        if name in trail:
+            raise GrokCycleError(list(trail[trail.index(name):]) + [name])
+        result = self.to_decoder(self.definitions[name], trail + (name,))
+        self.decoder_cache[name] = result
+        return result
+
+    def to_decoder(self, pattern, trail=()):
+        """Translate a grok pattern into a decoder parse expression.
+
+        %{NAME:field} becomes <NAME:field>. References to custom
+        definitions are replaced by their (translated) definition, the
+        standard patterns are kept by name for the engine.
+        """
+        if not trail and pattern in self.translated:
+            return self.translated[pattern]
+
+        def replace(match):
+            name, suffix = match.group(1), match.group(2)
+            if name in self.definitions:
+                return f"<{self.decoder_definition(name, trail)}{suffix}>"
+            return f"<{name}{suffix}>"
+
+        result = REFERENCE.sub(replace, pattern)
+        if not trail:
+            self.translated[pattern] = result
+        return result
+
+    # Regular expressions
+
+    def regex_definition(self, name, trail=()):
+        """A definition fully expanded to a regex, without capture names."""
+        if name in self.regex_cache:
+            return self.regex_cache[name]
+        if self.shared and name not in self.definitions and self.definitions:
+            return library_resolver().regex_definition(name)
+        if name in trail:
+            raise GrokCycleError(list(trail[trail.index(name):]) + [name])
+        definition = self.definition(name)
+        if definition is None:
+            raise KeyError(f"Unknown grok pattern: {name}")
+        result = self.expand(definition, None, trail + (name,))
+        self.regex_cache[name] = result
+        return result
+
+    def expand(self, pattern, fields=None, trail=()):
+        """Expand every reference of pattern. With a fields dict, the
+        top-level %{NAME:field} references become named groups and fields
+        maps group names back to field names."""
+        def replace(match):
+            name, suffix = match.group(1), match.group(2)
+            body = self.regex_definition(name, trail)
+            field = suffix.split(":")[1] if suffix else None
+            if fields is not None and field:
+                return f"(?P<{group_name(field, fields)}>{body})"
+            return f"(?:{body})"
+
+        return REFERENCE.sub(replace, pattern)
+
+    def to_regex(self, pattern):
+        """(regex source, {group name: field}) for a grok pattern."""
+        fields = {}
+        return self.expand(pattern, fields), fields
+
+
+_library_resolver = None
+
+
+def library_resolver():
+    """The shared resolver over the standard patterns alone."""
+    global _library_resolver
+    if _library_resolver is None:
+        _library_resolver = PatternResolver()
+    return _library_resolver
+
+
+def resolver_for(definitions=None):
+    """A resolver for a pipeline's pattern_definitions, the shared one if
+    there are none."""
+    if not definitions:
+        return library_resolver()
+    resolver = PatternResolver(definitions)
+    resolver.check_cycles()
+    return resolver
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python grok_patterns.py <PATTERN_NAME|grok pattern>...")
+        print(f"{len(LIBRARY)} standard patterns: {' '.join(sorted(LIBRARY))}")
+        sys.exit(1)
+
+    resolver = library_resolver()
+    for item in sys.argv[1:]:
+        try:
+            if item in LIBRARY:
+                print(f"{item}: {resolver.regex_definition(item)}")
+            else:
+                print(f"{item}\n  decoder: {resolver.to_decoder(item)}")
+                print(f"  regex:   {resolver.to_regex(item)[0]}")
+        except (KeyError, GrokCycleError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,10 +16,16 @@
 #     Reload (--reload flag):
 #     1. Performs cleanup if integration exists
 #     2. Performs setup
+#
+#     When the engine API socket exists (ENGINE_API_SOCKET, default
+#     /run/wazuh-server/engine-api.socket), up/down/reload go through
+#     engine_client.py over one connection and roll back on failure.
 
 set -euo pipefail
 
 NAMESPACE=wazuh
+TOOLS_DIR=$(dirname "$(realpath "$0")")
+ENGINE_API_SOCKET=${ENGINE_API_SOCKET:-/run/wazuh-server/engine-api.socket}
 
 # Logging functions
 log_info() {
@@ -158,9 +164,9 @@ action_up() {
     
     # Check if integration already exists by trying to add it and checking the error
     log_info "Adding integration..."
-    if ! engine-integration add -n "$NAMESPACE" "$INTEGRATION_NAME" 2>/dev/null; then
+    if ! add_output=$(engine-integration add -n "$NAMESPACE" "$INTEGRATION_NAME" 2>&1); then
         # Check if it's because it already exists or because of another error
-        if engine-integration add -n "$NAMESPACE" "$INTEGRATION_NAME" 2>&1 | grep -q "already exists\|duplicate"; then
+        if grep -q "already exists\|duplicate" <<< "$add_output"; then
             log_error "Integration '$INTEGRATION_NAME' already exists in namespace '$NAMESPACE'"
             log_info "Use --reload flag to reload the integration or --remove to remove it first"
             exit 1
@@ -295,6 +301,12 @@ action_generate_docs() {
 parse_args "${@}"
 navigate_to_repo_root
 
+# Talk to the engine API directly when it's reachable
+if [[ -S "$ENGINE_API_SOCKET" ]] && [[ "$ACTION" =~ ^(up|down|reload)$ ]]; then
+    exec python3 "$TOOLS_DIR/engine_client.py" "$ACTION" "$INTEGRATION_NAME" \
+        -n "$NAMESPACE" -r "$RULESET_DIR" -s "$ENGINE_API_SOCKET"
+fi
+
 # Execute the requested action
 case "$ACTION" in
     "up")
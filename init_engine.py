@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+# Idempotent, diff-based loader for a development engine.
+#
+# Reads a declarative manifest (see init-manifest.yml) of integrations,
+# filters and policy parents, hashes every integration directory and
+# compares it with the last applied state. Only the adds, removes and
+# updates that are needed are issued, independent ones in parallel, so
+# re-initialising after a small change takes seconds.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from pathlib import Path
+
+from result_cache import digest_paths
+from yaml_loader import SafeLoader, load_yaml
+
+DEFAULT_MANIFEST = Path(__file__).resolve().parent / "init-manifest.yml"
+STATE_FILE = ".engine-init-state.json"
+DEFAULT_JOBS = 4
+
+
+class Integration:
+    def __init__(self, entry):
+        self.path = entry["path"]
+        self.namespace = entry.get("namespace", "wazuh")
+        self.directory = Path(self.path).name
+        self.asset = entry.get("asset", f"integration/{self.directory}/0")
+        self.name = self.asset.split("/")[1]
+        self.policy = entry.get("policy", True)
+        self.order = entry.get("order", 1)
+
+    @property
+    def key(self):
+        return f"{self.namespace}:{self.asset}"
+
+    def digest(self, ruleset_dir):
+        # The integration plus the decoders and rules it ships
+        return digest_paths([
+            ruleset_dir / self.path,
+            ruleset_dir / "decoders" / self.directory,
+            ruleset_dir / "rules" / self.directory,
+        ])
+
+
+class Filter:
+    def __init__(self, entry, ruleset_dir):
+        self.namespace = entry.get("namespace", "system")
+        self.file = entry["file"]
+        self.name = load_yaml(ruleset_dir / self.file, loader=SafeLoader)["name"]
+
+    @property
+    def key(self):
+        return f"{self.namespace}:{self.file}"
+
+
+class Loader:
+    """Applies a manifest against the saved state, one command at a time
+    per integration and integrations of the same order in parallel."""
+
+    def __init__(self, ruleset_dir, state_path, jobs=DEFAULT_JOBS, dry_run=False):
+        self.ruleset_dir = Path(ruleset_dir)
+        self.state_path = Path(state_path)
+        self.jobs = jobs
+        self.dry_run = dry_run
+        self.failures = []
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            self.state = {}
+        self.state.setdefault("integrations", {})
+        self.state.setdefault("filters", {})
+        self.state.setdefault("parents", [])
+
+    def save_state(self):
+        if self.dry_run:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, command, cwd=None, stdin_file=None):
+        """Run one engine command, returns True on success."""
+        print(f"+ {' '.join(command)}" + (f" < {stdin_file}" if stdin_file else ""))
+        if self.dry_run:
+            return True
+        stdin = open(self.ruleset_dir / stdin_file, "rb") if stdin_file else None
+        try:
+            result = subprocess.run(command, cwd=cwd or self.ruleset_dir, stdin=stdin,
+                                    capture_output=True, text=True)
+        except OSError as e:
+            self.failures.append((" ".join(command), str(e)))
+            return False
+        finally:
+            if stdin:
+                stdin.close()
+        if result.returncode != 0:
+            message = (result.stderr or result.stdout).strip()
+            self.failures.append((" ".join(command), message))
+            print(f"[ERROR] {' '.join(command)}: {message}", file=sys.stderr)
+            return False
+        return True
+
+    def parallel(self, func, items):
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            return list(executor.map(func, items))
+
+    # Integrations
+
+    def remove_integration(self, applied):
+        ok = True
+        if applied.get("policy"):
+            ok = self.run(["engine-policy", "asset-remove", "-n", applied["namespace"],
+                           applied["asset"]])
+        ok = self.run(["engine-integration", "delete", "-n", applied["namespace"],
+                       applied["name"]]) and ok
+        return ok
+
+    def add_integration(self, integration):
+        cwd = (self.ruleset_dir / integration.path).parent
+        return self.run(["engine-integration", "add", "-n", integration.namespace,
+                         integration.directory], cwd=cwd)
+
+    def add_to_policy(self, integration):
+        return self.run(["engine-policy", "asset-add", "-n", integration.namespace,
+                         integration.asset])
+
+    # Apply
+
+    def apply(self, manifest):
+        integrations = [Integration(entry) for entry in manifest.get("integrations", [])]
+        filters = [Filter(entry, self.ruleset_dir) for entry in manifest.get("filters", [])]
+        applied = self.state["integrations"]
+
+        digests = dict(zip(
+            [i.key for i in integrations],
+            self.parallel(lambda i: i.digest(self.ruleset_dir), integrations)))
+        wanted = {i.key: i for i in integrations}
+        removed = [key for key in applied if key not in wanted]
+        changed = [i for i in integrations
+                   if i.key in applied and applied[i.key]["digest"] != digests[i.key]]
+        added = [i for i in integrations if i.key not in applied]
+        print(f"Integrations: {len(added)} to add, {len(changed)} to update, "
+              f"{len(removed)} to remove, "
+              f"{len(integrations) - len(added) - len(changed)} unchanged")
+
+        # 1. Removals, including the old version of updated integrations
+        to_remove = [applied[key] for key in removed] + [applied[i.key] for i in changed]
+        for entry, ok in zip(to_remove, self.parallel(self.remove_integration, to_remove)):
+            if ok:
+                applied.pop(f"{entry['namespace']}:{entry['asset']}", None)
+        self.save_state()
+
+        # 2. Adds, by order, each order in parallel
+        to_add = sorted(added + changed, key=lambda i: i.order)
+        for _, group in groupby(to_add, key=lambda i: i.order):
+            group = list(group)
+            for integration, ok in zip(group, self.parallel(self.add_integration, group)):
+                if ok:
+                    applied[integration.key] = {
+                        "namespace": integration.namespace,
+                        "asset": integration.asset,
+                        "name": integration.name,
+                        "digest": digests[integration.key],
+                        "policy": False,
+                    }
+            self.save_state()
+
+        self.apply_filters(filters)
+        if not self.apply_policy(manifest):
+            return False
+
+        # 3. Policy assets for everything loaded but not in the policy yet
+        in_policy = [i for i in integrations
+                     if i.policy and i.key in applied and not applied[i.key]["policy"]]
+        for integration, ok in zip(in_policy, self.parallel(self.add_to_policy, in_policy)):
+            if ok:
+                applied[integration.key]["policy"] = True
+        self.save_state()
+        return not self.failures
+
+    def apply_filters(self, filters):
+        applied = self.state["filters"]
+        wanted = {f.key: f for f in filters}
+        for key in [k for k in applied if k not in wanted]:
+            namespace = applied[key]["namespace"]
+            if self.run(["engine-catalog", "-n", namespace, "delete", applied[key]["name"]]):
+                applied.pop(key)
+        for flt in filters:
+            digest = digest_paths([self.ruleset_dir / flt.file])
+            previous = applied.get(flt.key)
+            if previous and previous["digest"] == digest:
+                continue
+            if previous:
+                command = ["engine-catalog", "-n", flt.namespace, "update", flt.name]
+            else:
+                command = ["engine-catalog", "-n", flt.namespace, "create", "filter"]
+            if self.run(command, stdin_file=flt.file):
+                applied[flt.key] = {"namespace": flt.namespace, "name": flt.name, "digest": digest}
+        self.save_state()
+
+    def apply_policy(self, manifest):
+        policy = manifest.get("policy")
+        if not policy:
+            return True
+        if self.state.get("policy") != policy:
+            if not self.run(["engine-policy", "create", "-p", policy]):
+                return False
+            self.state["policy"] = policy
+            self.state["parents"] = []
+        for parent in manifest.get("parents", []):
+            entry = {"namespace": parent.get("namespace"), "parent": parent["parent"]}
+            if entry in self.state["parents"]:
+                continue
+            command = ["engine-policy", "parent-set"]
+            if entry["namespace"]:
+                command += ["-n", entry["namespace"]]
+            if self.run(command + [entry["parent"]]):
+                self.state["parents"].append(entry)
+        self.save_state()
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load integrations, filters and policy assets into the engine, "
+                    "applying only what changed since the last run"
+    )
+    parser.add_argument("-r", "--ruleset", required=True, help="Ruleset directory")
+    parser.add_argument("-m", "--manifest", default=str(DEFAULT_MANIFEST),
+                        help="Manifest file (default: init-manifest.yml next to this script)")
+    parser.add_argument("-s", "--state",
+                        help=f"Last applied state (default: <ruleset>/{STATE_FILE})")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"Concurrent engine commands (default: {DEFAULT_JOBS})")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="Print the commands that would run without running them")
+    parser.add_argument("--reset", action="store_true",
+                        help="Forget the saved state, e.g. after recreating the engine")
+    args = parser.parse_args()
+
+    state_path = args.state or os.path.join(args.ruleset, STATE_FILE)
+    if args.reset and os.path.exists(state_path) and not args.dry_run:
+        os.unlink(state_path)
+
+    try:
+        manifest = load_yaml(args.manifest, loader=SafeLoader)
+        loader = Loader(args.ruleset, state_path, args.jobs, args.dry_run)
+        success = loader.apply(manifest)
+    except (OSError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if loader.failures:
+        print(f"\n{len(loader.failures)} command(s) failed:")
+        for command, message in loader.failures:
+            print(f"  {command}: {message}")
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Incremental JSON document reader.
+#
+# Yields the events of a JSON file one at a time without loading the
+# whole file. Understands:
+#   - a top-level array of events
+#   - elastic expected files: {"expected": [events...]}
+#   - NDJSON and concatenated documents (e.g. combined_expected.json),
+#     each of them being any of the above or a single event
+
+import json
+import re
+
+CHUNK_SIZE = 1024 * 1024
+WHITESPACE = re.compile(r"\s*")
+EXPECTED_PREFIX = re.compile(r'\{\s*"expected"\s*:\s*\[')
+
+
+class JSONStreamReader:
+    """Pull-style reader over a text stream, refilling its buffer on demand."""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        if self.eof:
+            return False
+        chunk = self.stream.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed part before growing the buffer
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return
+
+    def peek(self):
+        """Next non-whitespace character, or '' at the end of the stream."""
+        self.skip_whitespace()
+        return self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+
+    def consume(self, char):
+        if self.peek() != char:
+            raise self.error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def startswith(self, regex, lookahead=256):
+        """Match regex at the current position, consuming it on success."""
+        self.skip_whitespace()
+        while len(self.buffer) - self.pos < lookahead and self.fill():
+            pass
+        match = regex.match(self.buffer, self.pos)
+        if match:
+            self.pos = match.end()
+        return bool(match)
+
+    def grow(self):
+        """Read at least as much as is pending, so a value too large for the
+        buffer is decoded again O(log n) times rather than once per chunk."""
+        return self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.grow():
+                    continue
+                raise
+            # A value touching the end of the buffer may continue, and so may
+            # a number ending just short of it ("1" of "1.5", "1e" of "1e5")
+            near_end = end == len(self.buffer) or (
+                len(self.buffer) - end <= 2 and isinstance(value, (int, float))
+                and not isinstance(value, bool))
+            if near_end and self.grow():
+                continue
+            self.pos = end
+            return value
+
+    def array_items(self):
+        """Yield the elements of an array whose '[' was already consumed."""
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                self.pos -= 1
+                raise self.error("Expecting ',' delimiter")
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+
+def iter_documents(stream, chunk_size=CHUNK_SIZE):
+    """Yield every event of a JSON stream, one at a time."""
+    reader = JSONStreamReader(stream, chunk_size)
+    while True:
+        char = reader.peek()
+        if not char:
+            return
+        if char == "[":
+            reader.pos += 1
+            yield from reader.array_items()
+        elif char == "{" and reader.startswith(EXPECTED_PREFIX):
+            yield from reader.array_items()
+            reader.consume("}")
+        else:
+            document = reader.value()
+            if isinstance(document, dict) and isinstance(document.get("expected"), list):
+                yield from document["expected"]
+            else:
+                yield document
+
+
+def iter_file_documents(file_path, chunk_size=CHUNK_SIZE):
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from iter_documents(f, chunk_size)
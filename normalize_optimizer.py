@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+
+# Optimisation pass over a generated normalize list.
+#
+# Every map statement, check and parse expression runs on every event, so
+# redundant ones are removed before the decoder is written:
+#   - no-op statements (handlers that returned nothing, self copies) and
+#     blocks left without effect
+#   - adjacent unconditioned map blocks, and adjacent blocks with the same
+#     check, merged into one block
+#   - dead stores: a value overwritten or deleted before anything reads it
+#   - temp fields only used to copy a value, replaced by the value
+# Works on a stream of blocks, holding one block back at most.
+
+import re
+import sys
+from collections import Counter
+
+from yaml_loader import SafeDumper, load_yaml
+
+FIELD_REFERENCE = re.compile(r"\$([A-Za-z0-9_@.\-\[\]]+)")
+# Helpers that work on the current value of their target field
+IN_PLACE_HELPERS = ("array_append", "replace", "split", "trim", "downcase", "upcase")
+# Fields the converter introduces for its own use, never present in events
+TEMP_FIELDS = ("_to_hash",)
+HELPER_CALL = re.compile(r"^(\w+)\(")
+# Helpers that only write their target field (rename also deletes its source)
+TARGET_ONLY_HELPERS = ("array_append", "as", "concat_any", "delete", "downcase", "geoip",
+                       "replace", "sha1", "split", "trim", "upcase")
+
+
+def statement_target(statement):
+    if isinstance(statement, dict) and len(statement) == 1:
+        return next(iter(statement))
+    return None
+
+
+def overlaps(a, b):
+    return a == b or a.startswith(f"{b}.") or b.startswith(f"{a}.")
+
+
+def reads(statement, field):
+    """Whether a statement may read `field` (unknown statements read all)."""
+    target = statement_target(statement)
+    if target is None:
+        return True
+    expression = str(statement[target])
+    if any(overlaps(ref, field) for ref in FIELD_REFERENCE.findall(expression)):
+        return True
+    return overlaps(target, field) and expression.startswith(IN_PLACE_HELPERS)
+
+
+def is_overwrite(statement):
+    """A store whose result doesn't depend on anything and can't fail:
+    a literal value or delete()."""
+    expression = str(next(iter(statement.values())))
+    return expression == "delete()" or ("(" not in expression and "$" not in expression)
+
+
+def count_operations(block):
+    """Per-event operations of a block: its check, parse expressions and
+    map statements."""
+    count = 1 if block.get("check") else 0
+    for key, value in block.items():
+        if key.startswith("parse|"):
+            count += len(value)
+    return count + len(block.get("map") or [])
+
+
+class OptimizationStats:
+    def __init__(self):
+        self.counts = Counter()
+        self.before = 0
+        self.after = 0
+
+    @property
+    def saved(self):
+        return self.before - self.after
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.before += other.before
+        self.after += other.after
+
+    def summary(self):
+        details = ", ".join(f"{count} {name}" for name, count in sorted(self.counts.items()))
+        return (f"{self.before} -> {self.after} operations per event "
+                f"({self.saved} saved{': ' + details if details else ''})")
+
+
+def drop_noops(statements, stats):
+    kept = []
+    for statement in statements:
+        target = statement_target(statement)
+        if statement is None or statement == {}:
+            stats.counts["no-op statements"] += 1
+            continue
+        if target is not None and str(statement[target]) == f"${target}":
+            stats.counts["no-op statements"] += 1
+            continue
+        kept.append(statement)
+    return kept
+
+
+def propagate_temp_copies(statements, stats):
+    """_tmp: $x ... f($_tmp) ... _tmp: delete() -> f($x), when x and _tmp
+    aren't written in between."""
+    statements = list(statements)
+    index = 0
+    while index < len(statements):
+        target = statement_target(statements[index])
+        expression = str(statements[index][target]) if target else ""
+        source = expression[1:] if FIELD_REFERENCE.fullmatch(expression) else None
+        if target not in TEMP_FIELDS or source is None:
+            index += 1
+            continue
+        end = None
+        for later in range(index + 1, len(statements)):
+            later_target = statement_target(statements[later])
+            if later_target is None:
+                break
+            if later_target == target:
+                if statements[later][target] == "delete()":
+                    end = later
+                break
+            references = FIELD_REFERENCE.findall(str(statements[later][later_target]))
+            if overlaps(later_target, source) or overlaps(later_target, target) or any(
+                    ref != target and overlaps(ref, target) for ref in references):
+                break
+        if end is None:
+            index += 1
+            continue
+        pattern = re.compile(rf"\${re.escape(target)}(?![\w.@\-\[\]])")
+        for between in range(index + 1, end):
+            key = statement_target(statements[between])
+            statements[between] = {key: pattern.sub(f"${source}", str(statements[between][key]))}
+        del statements[end]
+        del statements[index]
+        stats.counts["temp fields"] += 1
+    return statements
+
+
+def drop_dead_stores(statements, stats):
+    """Drop stores overwritten or deleted before anything reads them.
+
+    A store followed by a deletion of a temp field is dropped together
+    with the deletion, the field never existed before.
+    """
+    dead = set()
+    for index, statement in enumerate(statements):
+        target = statement_target(statement)
+        if target is None or statement[target] == "delete()":
+            continue
+        for later in range(index + 1, len(statements)):
+            other = statements[later]
+            other_target = statement_target(other)
+            if other_target == target and is_overwrite(other):
+                if not reads(other, target):
+                    dead.add(index)
+                    if target in TEMP_FIELDS and other[target] == "delete()":
+                        dead.add(later)
+                break
+            if reads(other, target) or (other_target and overlaps(other_target, target)):
+                break
+    if dead:
+        stats.counts["dead stores"] += len(dead)
+    return [s for i, s in enumerate(statements) if i not in dead]
+
+
+def optimize_statements(statements, stats):
+    statements = drop_noops(statements, stats)
+    statements = propagate_temp_copies(statements, stats)
+    return drop_dead_stores(statements, stats)
+
+
+def is_map_only(block):
+    return set(block) <= {"check", "map"}
+
+
+def check_fields(check):
+    return FIELD_REFERENCE.findall(str(check or ""))
+
+
+def touches(statement, fields):
+    """Whether a statement may read, write or delete any of fields.
+    Unknown statements and helpers touch everything."""
+    target = statement_target(statement)
+    if target is None:
+        return True
+    expression = str(statement[target])
+    if any(overlaps(target, f) for f in fields):
+        return True
+    if any(overlaps(ref, f) for ref in FIELD_REFERENCE.findall(expression) for f in fields):
+        return True
+    call = HELPER_CALL.match(expression)
+    if call is None:
+        return False
+    name = call.group(1)
+    return name not in TARGET_ONLY_HELPERS and not name.startswith("parse_")
+
+
+def can_merge(first, second):
+    """Whether second can run as part of first: both plain map blocks with
+    the same check (or none), and first's map doesn't touch the fields
+    the check reads."""
+    if not (is_map_only(first) and is_map_only(second)):
+        return False
+    if first.get("check") != second.get("check"):
+        return False
+    fields = check_fields(second.get("check"))
+    if not fields:
+        return True
+    return not any(touches(statement, fields) for statement in first.get("map") or [])
+
+
+def finish(block, stats):
+    """Optimise a block's statements, None if nothing is left to do."""
+    if "map" in block:
+        block = dict(block, map=optimize_statements(block["map"], stats))
+    if is_map_only(block) and not block.get("map"):
+        stats.counts["empty blocks"] += 1
+        return None
+    return block
+
+
+def optimize_blocks(blocks, stats=None):
+    """Yield the optimised blocks of a normalize list (or iterator)."""
+    stats = stats if stats is not None else OptimizationStats()
+    pending = None
+    for block in blocks:
+        stats.before += count_operations(block)
+        if pending is not None and can_merge(pending, block):
+            stats.counts["folded checks" if block.get("check") else "merged blocks"] += 1
+            pending = dict(pending, map=list(pending.get("map") or []) + list(block.get("map") or []))
+            continue
+        if pending is not None:
+            done = finish(pending, stats)
+            if done is not None:
+                stats.after += count_operations(done)
+                yield done
+        pending = block
+    if pending is not None:
+        done = finish(pending, stats)
+        if done is not None:
+            stats.after += count_operations(done)
+            yield done
+
+
+def optimize(normalize_list):
+    """(optimised list, OptimizationStats) of a normalize list."""
+    stats = OptimizationStats()
+    return list(optimize_blocks(normalize_list, stats)), stats
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python normalize_optimizer.py <decoder.yml>")
+        sys.exit(1)
+
+    import yaml
+
+    decoder = load_yaml(sys.argv[1])
+    decoder["normalize"], stats = optimize(decoder.get("normalize") or [])
+    print(yaml.dump(decoder, Dumper=SafeDumper))
+    print(stats.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+# Translates Painless `if` conditions from Elastic ingest pipelines
+# into Wazuh engine `check` expressions.
+#
+# Each condition is tokenized and parsed once into a small AST, then
+# emitted as a check string. Results are memoized by source text since
+# the same conditions repeat many times across large vendor pipelines.
+
+import re
+import sys
+from functools import lru_cache
+
+# Painless method calls and their Wazuh helper equivalents
+METHOD_HELPERS = {
+    "contains": "contains",
+    "startsWith": "starts_with",
+    "endsWith": "ends_with",
+}
+
+COMPARISON_OPERATORS = ("==", "!=", "<=", ">=", "<", ">")
+
+TOKEN_REGEX = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<op>==|!=|<=|>=|&&|\|\||\?\.|[<>!().\[\],])
+  | (?P<name>[A-Za-z_@][A-Za-z0-9_@]*)
+""", re.VERBOSE)
+
+
+class ConditionError(ValueError):
+    """Raised when a condition can't be parsed or translated."""
+
+    def __init__(self, message, source, position):
+        super().__init__(f"{message} at position {position} in condition: {source}")
+        self.source = source
+        self.position = position
+
+
+# AST nodes, kept as plain tuples: (kind, ...)
+#   ("field", path)            ("literal", text)          ("group", inner)
+#   ("compare", op, left, right)
+#   ("call", method, target, args)
+#   ("and", left, right)       ("or", left, right)       ("not", operand)
+
+
+def tokenize(source):
+    """Split a condition into (kind, text, position) tokens."""
+    tokens = []
+    position = 0
+    while position < len(source):
+        match = TOKEN_REGEX.match(source, position)
+        if not match:
+            raise ConditionError(f"Unexpected character '{source[position]}'", source, position)
+        kind = match.lastgroup
+        if kind != "ws":
+            tokens.append((kind, match.group(), position))
+        position = match.end()
+    tokens.append(("end", "", len(source)))
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser for the subset of Painless used in `if` conditions."""
+
+    def __init__(self, source):
+        self.source = source
+        self.tokens = tokenize(source)
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def advance(self):
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def expect(self, text):
+        token = self.advance()
+        if token[1] != text:
+            self.fail(token, f"Expected '{text}'")
+        return token
+
+    def fail(self, token, message=None):
+        if token[0] == "end":
+            raise ConditionError(message or "Unexpected end of condition", self.source, token[2])
+        raise ConditionError(message or f"Unexpected token '{token[1]}'", self.source, token[2])
+
+    def parse(self):
+        node = self.parse_or()
+        token = self.peek()
+        if token[0] != "end":
+            self.fail(token)
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek()[1] == "||":
+            self.advance()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek()[1] == "&&":
+            self.advance()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek()[1] == "!":
+            self.advance()
+            return ("not", self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        left = self.parse_operand()
+        if self.peek()[1] in COMPARISON_OPERATORS:
+            op = self.advance()[1]
+            right = self.parse_operand()
+            return ("compare", op, left, right)
+        return left
+
+    def parse_operand(self):
+        token = self.peek()
+        if token[1] == "(":
+            self.advance()
+            node = self.parse_or()
+            self.expect(")")
+            return ("group", node)
+        if token[0] in ("string", "number"):
+            self.advance()
+            return ("literal", token[1])
+        if token[0] == "name":
+            if token[1] in ("null", "true", "false"):
+                self.advance()
+                return ("literal", token[1])
+            return self.parse_field()
+        self.fail(token)
+
+    def parse_field(self):
+        path = [self.advance()[1]]
+        while True:
+            token = self.peek()
+            if token[1] in (".", "?."):
+                self.advance()
+                name = self.advance()
+                if name[0] != "name":
+                    self.fail(name)
+                if self.peek()[1] == "(":
+                    return self.parse_call(name, path)
+                path.append(name[1])
+            elif token[1] == "[":
+                self.advance()
+                key = self.advance()
+                if key[0] != "string":
+                    self.fail(key)
+                self.expect("]")
+                path.append(key[1][1:-1])
+            else:
+                break
+        return ("field", field_path(path))
+
+    def parse_call(self, name, path):
+        if name[1] not in METHOD_HELPERS:
+            self.fail(name, f"Unsupported method '{name[1]}'")
+        self.expect("(")
+        args = []
+        if self.peek()[1] != ")":
+            args.append(self.parse_operand())
+            while self.peek()[1] == ",":
+                self.advance()
+                args.append(self.parse_operand())
+        self.expect(")")
+        return ("call", name[1], ("field", field_path(path)), tuple(args))
+
+
+def field_path(path):
+    # Drop the `ctx` root, fields are referenced relative to the event
+    if path and path[0] == "ctx":
+        path = path[1:]
+    return ".".join(path)
+
+
+def emit(node):
+    kind = node[0]
+    if kind == "field":
+        return f"${node[1]}"
+    if kind == "literal":
+        return node[1]
+    if kind == "group":
+        return f"({emit(node[1])})"
+    if kind == "and":
+        return f"{emit(node[1])} AND {emit(node[2])}"
+    if kind == "or":
+        return f"{emit(node[1])} OR {emit(node[2])}"
+    if kind == "not":
+        operand = node[1]
+        if operand[0] in ("and", "or", "compare"):
+            return f"NOT ({emit(operand)})"
+        return f"NOT {emit(operand)}"
+    if kind == "compare":
+        op, left, right = node[1:]
+        # `field != null` / `field == null` are existence checks
+        if right == ("literal", "null") and left[0] == "field" and op in ("==", "!="):
+            check = f"exists({emit(left)})"
+            return check if op == "!=" else f"NOT {check}"
+        return f"{emit(left)} {op} {emit(right)}"
+    if kind == "call":
+        method, target, args = node[1:]
+        arguments = ", ".join(emit(arg) for arg in (target,) + args)
+        return f"{METHOD_HELPERS[method]}({arguments})"
+    raise ValueError(f"Unknown node type: {kind}")
+
+
+@lru_cache(maxsize=4096)
+def parse_condition(source):
+    """Parse a Painless condition into its AST."""
+    return Parser(source).parse()
+
+
+@lru_cache(maxsize=4096)
+def translate_condition(source):
+    """Translate a Painless condition into a Wazuh check expression."""
+    return emit(parse_condition(source))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python painless_conditions.py <condition>")
+        sys.exit(1)
+
+    try:
+        print(translate_condition(sys.argv[1]))
+    except ConditionError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
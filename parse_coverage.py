@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# Offline coverage of converted parse expressions over a log corpus.
+#
+# Collects the parse| expressions of generated decoders (or converts the
+# grok/dissect processors of ingest pipelines on the fly), compiles each
+# distinct expression to a regex once (decoder_eval.compile_parse) and
+# matches the whole corpus against all of them, optionally split across
+# worker processes. Reports per expression and per parse block how many
+# lines match, samples of the lines no expression of a block matches, and
+# the throughput, so broken conversions show up without an engine.
+#
+# Corpus lines are the raw event, so only blocks parsing one of the
+# corpus fields (-f, message and event.original by default) are scored.
+# Blocks parsing a field captured by earlier blocks are listed as not
+# measured, selectivity.py models those. Files that fail to convert are
+# reported and make the run exit with 1.
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from decoder_eval import compile_parse, parse_block_field
+from selectivity import DEFAULT_FIELDS, read_corpus
+from yaml_loader import load_yaml
+
+DEFAULT_SAMPLES = 5
+CHUNK_LINES = 2000
+
+_converter = None
+
+
+def converter():
+    """pipeline-to-decoder.py, imported once."""
+    global _converter
+    if _converter is None:
+        spec = importlib.util.spec_from_file_location(
+            "pipeline_to_decoder", Path(__file__).resolve().parent / "pipeline-to-decoder.py")
+        _converter = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(_converter)
+    return _converter
+
+
+class ParseBlock:
+    """The parse| of one decoder block: where it comes from and its
+    expressions."""
+
+    def __init__(self, source, index, field, expressions):
+        self.source = source
+        self.index = index
+        self.field = field
+        self.expressions = expressions
+
+    @property
+    def label(self):
+        return block_label(self.source, self.index, self.field)
+
+
+def block_label(source, index, field):
+    where = "decoder" if index < 0 else f"block {index}"
+    return f"{source} {where} parse|{field}"
+
+
+def parse_blocks(path):
+    """ParseBlocks of a decoder file, or of the decoder a pipeline file
+    converts to."""
+    data = load_yaml(path)
+    if not isinstance(data, dict):
+        return []
+    if "processors" in data:
+        normalize = converter().build_normalize(data["processors"])
+    else:
+        normalize = data.get("normalize") or []
+    blocks = []
+    header = parse_block_field(data)
+    if header:
+        blocks.append(ParseBlock(str(path), -1, *header))
+    for index, block in enumerate(normalize):
+        found = parse_block_field(block) if isinstance(block, dict) else None
+        if found and found[1]:
+            blocks.append(ParseBlock(str(path), index, *found))
+    return blocks
+
+
+def expand_inputs(inputs):
+    files = []
+    for item in inputs:
+        if glob.has_magic(item):
+            files.extend(p for p in sorted(glob.glob(item, recursive=True)) if os.path.isfile(p))
+        elif os.path.isdir(item):
+            for ext in ("*.yml", "*.yaml"):
+                files.extend(str(p) for p in sorted(Path(item).rglob(ext)))
+        else:
+            files.append(item)
+    return list(dict.fromkeys(files))
+
+
+def compile_all(expressions):
+    """{expression: error message} for the expressions that don't compile."""
+    errors = {}
+    for expression in expressions:
+        try:
+            compile_parse(expression)
+        except (re.error, RecursionError, KeyError) as e:
+            errors[expression] = f"{type(e).__name__}: {e}"
+    return errors
+
+
+def match_chunk(expressions, groups, lines, offset, samples):
+    """Match lines against every expression.
+
+    groups are the expression indices of each parse block. Returns
+    (matches per expression, matched lines per group, unmatched samples
+    per group as (line number, line)).
+    """
+    patterns = [compile_parse(e) for e in expressions]
+    counts = [0] * len(patterns)
+    group_counts = [0] * len(groups)
+    unmatched = [[] for _ in groups]
+    for number, line in enumerate(lines, offset):
+        hits = [pattern.matches(line) for pattern in patterns]
+        for index, hit in enumerate(hits):
+            if hit:
+                counts[index] += 1
+        for group, members in enumerate(groups):
+            if any(hits[m] for m in members):
+                group_counts[group] += 1
+            elif len(unmatched[group]) < samples:
+                unmatched[group].append((number, line))
+    return counts, group_counts, unmatched
+
+
+def chunks(lines, size):
+    for start in range(0, len(lines), size):
+        yield start, lines[start:start + size]
+
+
+def run_coverage(blocks, lines, jobs=0, samples=DEFAULT_SAMPLES, fields=DEFAULT_FIELDS):
+    """Coverage report of the parse blocks of fields over lines (see main
+    for the layout), the other blocks are listed as not measured. jobs=0
+    matches in this process."""
+    not_measured = [block for block in blocks if block.field not in fields]
+    blocks = [block for block in blocks if block.field in fields]
+    expressions = list(dict.fromkeys(e for block in blocks for e in block.expressions))
+    errors = compile_all(expressions)
+    usable = [e for e in expressions if e not in errors]
+    position = {e: i for i, e in enumerate(usable)}
+    groups = [[position[e] for e in block.expressions if e in position] for block in blocks]
+
+    counts = [0] * len(usable)
+    group_counts = [0] * len(groups)
+    unmatched = [[] for _ in groups]
+    start = time.perf_counter()
+    if jobs == 0 or len(lines) <= CHUNK_LINES:
+        results = [match_chunk(usable, groups, lines, 1, samples)]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(match_chunk, usable, groups, chunk, offset + 1, samples)
+                       for offset, chunk in chunks(lines, CHUNK_LINES)]
+            results = [future.result() for future in futures]
+    for chunk_counts, chunk_groups, chunk_unmatched in results:
+        counts = [a + b for a, b in zip(counts, chunk_counts)]
+        group_counts = [a + b for a, b in zip(group_counts, chunk_groups)]
+        for group, found in enumerate(chunk_unmatched):
+            unmatched[group].extend(found[:samples - len(unmatched[group])])
+    elapsed = time.perf_counter() - start
+
+    total = len(lines)
+    report = {
+        "lines": total,
+        "expressions": len(expressions),
+        "seconds": elapsed,
+        "lines_per_second": total / elapsed if elapsed else None,
+        "matches_per_second": total * len(usable) / elapsed if elapsed else None,
+        "blocks": [],
+        "not_measured": [{"source": block.source, "block": block.index, "field": block.field}
+                         for block in not_measured],
+        "failures": [],
+    }
+    for block, members, matched, samples_found in zip(blocks, groups, group_counts, unmatched):
+        report["blocks"].append({
+            "source": block.source,
+            "block": block.index,
+            "field": block.field,
+            "matched": matched,
+            "match_rate": matched / total if total else None,
+            "expressions": [
+                {"expression": e, "error": errors[e]} if e in errors else
+                {"expression": e, "matched": counts[position[e]],
+                 "match_rate": counts[position[e]] / total if total else None}
+                for e in block.expressions],
+            "unmatched_samples": [{"line": n, "text": text} for n, text in samples_found],
+        })
+    return report
+
+
+def print_report(report):
+    for entry in report["blocks"]:
+        label = block_label(entry["source"], entry["block"], entry["field"])
+        print(f"{label}: {entry['matched']}/{report['lines']} "
+              f"({(entry['match_rate'] or 0):.1%})")
+        for expression in entry["expressions"]:
+            if "error" in expression:
+                print(f"  [ERROR] {expression['error']}\n          {expression['expression']}")
+            else:
+                print(f"  {expression['match_rate'] or 0:>7.1%}  {expression['expression']}")
+        for sample in entry["unmatched_samples"]:
+            print(f"  unmatched line {sample['line']}: {sample['text'][:200]}")
+        print()
+    for entry in report["not_measured"]:
+        print(f"[NOT MEASURED] {block_label(entry['source'], entry['block'], entry['field'])}: "
+              "parses a field captured by earlier blocks")
+    for failure in report["failures"]:
+        print(f"[FAIL] {failure['path']}: {failure['error']}")
+    if report["not_measured"] or report["failures"]:
+        print()
+    print(f"{report['lines']} lines, {report['expressions']} expressions in "
+          f"{report['seconds']:.2f} s: {report['lines_per_second'] or 0:,.0f} lines/s, "
+          f"{report['matches_per_second'] or 0:,.0f} matches/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Match converted parse expressions against a log corpus, offline"
+    )
+    parser.add_argument("inputs", nargs="+",
+                        help="Decoder or pipeline files, directories or globs")
+    parser.add_argument("-c", "--corpus", required=True,
+                        help="Log lines to match (e.g. combined_logs.log)")
+    parser.add_argument("-f", "--field", action="append",
+                        help="Field the corpus lines stand for (repeatable, "
+                             f"default: {', '.join(DEFAULT_FIELDS)})")
+    parser.add_argument("-n", "--limit", type=int, help="Only use the first N lines")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="Worker processes (default: 0, match in this process)")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help=f"Unmatched lines shown per block (default: {DEFAULT_SAMPLES})")
+    parser.add_argument("--json", metavar="FILE", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    blocks, failures = [], []
+    for path in expand_inputs(args.inputs):
+        try:
+            blocks.extend(parse_blocks(path))
+        except (OSError, yaml.YAMLError) as e:
+            print(f"Error: {path}: {e}")
+            sys.exit(1)
+        except Exception as e:
+            # A converter bug on one pipeline, counted in the report
+            failures.append({"path": str(path), "error": f"{type(e).__name__}: {e}"})
+    if not blocks and not failures:
+        print("Error: no parse expressions found.")
+        sys.exit(1)
+    try:
+        lines = read_corpus(args.corpus, args.limit)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    report = run_coverage(blocks, lines, args.jobs, args.samples,
+                          tuple(args.field or DEFAULT_FIELDS))
+    report["failures"] = failures
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,132 @@
 #!/usr/bin/env python3
+if __name__ == "__main__":
+    # Hand the run to the conversion daemon when one is listening
+    # (decoders_utils/daemon.py), before paying for the imports below
+    from decoders_utils.client import forward
+    forward("convert")
+
+import argparse
+import copy
+import cProfile
+import glob
+import os
+import shutil
 import yaml
 import sys
 import json
+import tempfile
+import time
 import traceback
-
-
-class NoTagLoader(yaml.SafeLoader):
-    pass
-
-
-# Treat unknown tags as plain strings
-NoTagLoader.add_constructor(
-    None, lambda loader, node: loader.construct_scalar(node))
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from grok_patterns import resolver_for
+from normalize_optimizer import OptimizationStats, optimize_blocks
+from painless_conditions import translate_condition
+from pipeline_graph import PipelineCycleError, PipelineGraph, reference_name
+from yaml_loader import SafeDumper, load_yaml
+
+
+class ConversionError(Exception):
+    """Raised when a processor can't be converted into a normalize block."""
+
+    def __init__(self, message, operation=None, processor=None):
+        super().__init__(message)
+        self.operation = operation
+        self.processor = processor
+
+
+class ConversionProfile:
+    """Call count, cumulative time and emitted statements per handler
+    ("dispatch:<processor type>", "check", "parse") and per phase."""
+
+    def __init__(self):
+        self.handlers = {}
+        self.phases = {}
+        self.files = 0
+        self.output_bytes = 0
+
+    @staticmethod
+    def count_statements(result):
+        if result is None:
+            return 0
+        if isinstance(result, list):
+            return len(result)
+        if isinstance(result, dict) and any(k.startswith("parse|") for k in result):
+            return sum(len(v) for v in result.values())
+        return 1
+
+    def call(self, key, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        entry = self.handlers.setdefault(key, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += self.count_statements(result)
+        return result
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        entry = self.phases.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def merge(self, other):
+        for key, (calls, seconds, statements) in other["handlers"].items():
+            entry = self.handlers.setdefault(key, [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += statements
+        for name, (calls, seconds) in other["phases"].items():
+            entry = self.phases.setdefault(name, [0, 0.0])
+            entry[0] += calls
+            entry[1] += seconds
+        self.files += other["files"]
+        self.output_bytes += other["output_bytes"]
+
+    def to_dict(self):
+        return {
+            "handlers": self.handlers,
+            "phases": self.phases,
+            "files": self.files,
+            "output_bytes": self.output_bytes,
+        }
+
+    def report(self):
+        handlers = sorted(self.handlers.items(), key=lambda item: -item[1][1])
+        return {
+            "files": self.files,
+            "output_bytes": self.output_bytes,
+            "phases": {name: {"calls": calls, "seconds": round(seconds, 6)}
+                       for name, (calls, seconds) in self.phases.items()},
+            "handlers": [{"handler": key, "calls": calls, "seconds": round(seconds, 6),
+                          "statements": statements}
+                         for key, (calls, seconds, statements) in handlers],
+            "total_statements": sum(entry[2] for entry in self.handlers.values()),
+        }
+
+    def print_summary(self, file=None):
+        # Resolved per call: the daemon redirects stderr for each run
+        file = file or sys.stderr
+        report = self.report()
+        print("\nPhase         calls    seconds", file=file)
+        for name, phase in report["phases"].items():
+            print(f"{name:<12} {phase['calls']:>6} {phase['seconds']:>10.4f}", file=file)
+        print(f"\n{'Handler':<24} {'calls':>7} {'seconds':>10} {'statements':>11}", file=file)
+        for entry in report["handlers"]:
+            print(f"{entry['handler']:<24} {entry['calls']:>7} {entry['seconds']:>10.4f} "
+                  f"{entry['statements']:>11}", file=file)
+        print(f"\n{report['total_statements']} statements, {report['output_bytes']} bytes "
+              f"of YAML from {report['files']} file(s)", file=file)
 
 
 def handle_special_fields(processor):
@@ -25,16 +140,11 @@ def handle_parse(processor):
     operation = get_operation(processor)
     if operation == "grok":
         key = processor[operation]["field"]
-        patterns = []
-        # Replace %{PATTERN} with <PATTERN>
-        for pattern in processor[operation].get("patterns", []):
-            patterns.append(pattern.replace("%{", "<").replace("}", ">"))
-        # Substitute pattern definitions if present
-        definitions = processor[operation].get("pattern_definitions", {})
-        if definitions:
-            for def_key, def_value in definitions.items():
-                def_value = def_value.replace("%{", "<").replace("}", ">")
-                patterns = [p.replace(def_key, def_value) for p in patterns]
+        # Replace %{PATTERN} with <PATTERN>, expanding pattern definitions
+        # (recursively, each one once) in place of their references
+        resolver = resolver_for(processor[operation].get("pattern_definitions"))
+        patterns = [resolver.to_decoder(pattern)
+                    for pattern in processor[operation].get("patterns", [])]
         return {f"parse|{key}": patterns} if patterns else None
 
     if operation == "dissect":
@@ -55,23 +165,7 @@ def handle_check(processor):
         return {"check": f"exists(${key})"}
     if "if" not in processor[operation].keys():
         return None
-    conditional_block = processor[operation]["if"]
-    conditional_block = conditional_block.replace("ctx.", "").replace("ctx?.", "").replace(
-        "?", "").replace("&&", "AND").replace("||", "OR")
-    if ".contains(" in conditional_block:
-        # Handle contains logic
-        parts = conditional_block.split(".contains(")
-        field = parts[0].strip()
-        value = parts[1].rstrip(")").strip()
-        return {"check": f"contains(${field}, {value})"}
-    elif "==" in conditional_block:
-        parts = conditional_block.split("==")
-        field = parts[0].strip()
-        value = parts[1].strip()
-        return {"check": f"${field} == {value}"}
-    else:
-        return {"check": conditional_block}
-    return None
+    return {"check": translate_condition(processor[operation]["if"])}
 
 
 def get_operation(processor):
@@ -140,44 +234,54 @@ def dispatch(processor):
         raise ValueError(f"Unknown processor type: {operation}")
 
 
-def build_normalize(processors):
+def iter_normalize(processors, profile=None):
+    """Yield the normalize blocks of a pipeline, each one once complete."""
+    operation = None
+    processor = None
     try:
-        normalize_list = []
+        block = None
         map_block = []
         for index, processor in enumerate(processors):
-            handle_special_fields(processor)
-            map_item = dispatch(processor)
             operation = get_operation(processor)
-            check = handle_check(processor)
-            parse = handle_parse(processor)
-            normalize_length = len(normalize_list)
+            handle_special_fields(processor)
+            if profile is None:
+                map_item = dispatch(processor)
+                check = handle_check(processor)
+                parse = handle_parse(processor)
+            else:
+                map_item = profile.call(f"dispatch:{operation}", dispatch, processor)
+                check = profile.call("check", handle_check, processor)
+                parse = profile.call("parse", handle_parse, processor)
             if check:
-                normalize_block = {}
+                if block is not None:
+                    yield block
+                block = {}
                 map_block = []
-                normalize_block.update(check)
+                block.update(check)
                 if parse:
-                    normalize_block.update(parse)
-                    normalize_list.append(normalize_block)
+                    block.update(parse)
                     continue
-                normalize_block.update({"map": map_block})
-                normalize_list.append(normalize_block)
-            elif index == 0 or "check" in normalize_list[normalize_length - 1].keys():
-                normalize_block = {}
+                block.update({"map": map_block})
+            elif index == 0 or "check" in block.keys():
+                if block is not None:
+                    yield block
+                block = {}
                 map_block = []
-                normalize_block.update({"map": map_block})
-                normalize_list.append(normalize_block)
+                block.update({"map": map_block})
 
             if isinstance(map_item, list):
                 for i in map_item:
                     map_block.append(i)
             else:
                 map_block.append(map_item)
+        if block is not None:
+            yield block
     except Exception as e:
-        traceback.print_exc()
-        print(f"{e}\nException processing operation: {operation}")
-        print(json.dumps(processor, indent=2))
-        exit(1)
-    return normalize_list
+        raise ConversionError(str(e), operation, processor) from e
+
+
+def build_normalize(processors, profile=None):
+    return list(iter_normalize(processors, profile))
 
 
 def handle_append(processor):
@@ -390,23 +494,488 @@ def handle_user_agent(processor):
     return {key: f"{helper_function}({value})"}
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python read_pipeline.py <yaml_file>")
-        sys.exit(1)
+def load_pipeline(file_path):
+    return load_yaml(file_path)
+
+
+SUB_PIPELINE_MODES = ("keep", "inline", "link")
+
+# Converted normalize blocks of inlined pipelines, by closure digest
+_inlined_blocks = {}
+_graphs = {}
+
+
+def pipeline_graph(directory):
+    """One call graph per ingest_pipeline directory and process."""
+    directory = Path(directory).resolve()
+    if directory not in _graphs:
+        _graphs[directory] = PipelineGraph(directory)
+    return _graphs[directory]
+
 
-    file_path = sys.argv[1]
+def asset_prefix(file_path):
+    """<pkg>-<data stream>- for pipelines inside an integrations tree."""
+    parts = Path(file_path).parts
+    if "data_stream" in parts:
+        idx = parts.index("data_stream")
+        if 0 < idx < len(parts) - 2:
+            return f"{parts[idx - 1]}-{parts[idx + 1]}-"
+    return ""
 
+
+def and_checks(*checks):
+    parts = [c for c in checks if c]
+    if len(parts) < 2:
+        return parts[0] if parts else None
+    return " AND ".join(f"({c})" if " OR " in c else c for c in parts)
+
+
+class SubPipelines:
+    """Resolves the `pipeline` processors of a pipeline against the other
+    pipelines of its directory.
+
+    inline: the called pipeline's blocks replace the processor, under
+            the processor's condition. Each distinct pipeline (by content
+            and callees) is converted once per process.
+    link:   the processor is dropped and the called pipeline becomes its
+            own decoder, with the callers as parents.
+    Calls inside foreach and on_failure, and calls to pipelines that
+    aren't in the directory, are left as they are.
+    """
+
+    def __init__(self, graph, mode, prefix=""):
+        self.graph = graph
+        self.mode = mode
+        self.prefix = prefix
+
+    def asset(self, name):
+        return f"decoder/{self.prefix}{name}/0"
+
+    def local_call(self, processor):
+        body = processor.get("pipeline") if isinstance(processor, dict) else None
+        if not isinstance(body, dict) or not body.get("name"):
+            return None
+        name = reference_name(body["name"])
+        return name if self.graph.node(name) is not None else None
+
+    def inline_blocks(self, name, profile=None):
+        digest = self.graph.closure_digest(name)
+        if digest not in _inlined_blocks:
+            blocks = []
+            segment = []
+            for processor in copy.deepcopy(self.graph.node(name).processors):
+                callee = self.local_call(processor)
+                if callee is None:
+                    segment.append(processor)
+                    continue
+                blocks += build_normalize(segment, profile)
+                segment = []
+                condition = processor["pipeline"].get("if")
+                try:
+                    check = translate_condition(condition) if condition else None
+                except ValueError as e:
+                    raise ConversionError(str(e), "pipeline", processor) from e
+                for block in self.inline_blocks(callee, profile):
+                    if check:
+                        block = dict(check=and_checks(check, block.get("check")),
+                                     **{k: v for k, v in block.items() if k != "check"})
+                    blocks.append(block)
+            blocks += build_normalize(segment, profile)
+            _inlined_blocks[digest] = blocks
+        return copy.deepcopy(_inlined_blocks[digest])
+
+    def document(self, name, profile=None):
+        """(header, normalize blocks) of the decoder for pipeline `name`."""
+        self.graph.check_cycles(name)
+        for call in self.graph.unresolved(name):
+            print(f"Warning: {call.caller} calls '{call.name}', which isn't in "
+                  f"{self.graph.directory}, left as is", file=sys.stderr)
+        if self.mode == "inline":
+            return {}, iter(self.inline_blocks(name, profile))
+
+        header = {"name": self.asset(name)}
+        callers = self.graph.callers(name)
+        if callers:
+            header["parents"] = sorted({self.asset(call.caller) for call in callers})
+            conditions = {call.condition for call in callers}
+            if len(conditions) == 1 and None not in conditions:
+                condition = conditions.pop()
+                try:
+                    header["check"] = translate_condition(condition)
+                except ValueError as e:
+                    raise ConversionError(str(e), "pipeline", {"pipeline": {"if": condition}}) from e
+            elif len(conditions) > 1:
+                print(f"Warning: {name} is called under different conditions, "
+                      "add them as checks by hand", file=sys.stderr)
+            for call in callers:
+                if call.context != "processor":
+                    print(f"Warning: {call.caller} calls {name} from {call.context}, "
+                          "which a parent link doesn't express", file=sys.stderr)
+        processors = [p for p in copy.deepcopy(self.graph.node(name).processors)
+                      if self.local_call(p) is None]
+        return header, iter_normalize(processors, profile)
+
+
+def decoder_document(file_path, profile=None, sub_pipelines="keep"):
+    """(header, normalize blocks) of the decoder for a pipeline file, the
+    blocks produced lazily."""
+    if sub_pipelines == "keep":
+        if profile is None:
+            yaml_data = load_pipeline(file_path)
+        else:
+            with profile.phase("load"):
+                yaml_data = load_pipeline(file_path)
+        return {}, iter_normalize(yaml_data["processors"], profile)
+
+    graph = pipeline_graph(Path(file_path).parent)
+    name = Path(file_path).stem
+    if profile is None:
+        graph.reachable(name)
+    else:
+        with profile.phase("load"):
+            graph.reachable(name)
+    return SubPipelines(graph, sub_pipelines, asset_prefix(file_path)).document(name, profile)
+
+
+def convert_file(file_path, profile=None, sub_pipelines="keep", optimization=None):
+    """Convert a single pipeline file into a decoder document.
+
+    With optimization (an OptimizationStats), the normalize list goes
+    through the optimiser and what it saved is added to it.
+    """
+    if profile is not None:
+        profile.files += 1
+    header, blocks = decoder_document(file_path, profile, sub_pipelines)
+    if optimization is not None:
+        blocks = optimize_blocks(blocks, optimization)
+    if profile is None:
+        return dict(header, normalize=list(blocks))
+    with profile.phase("convert"):
+        return dict(header, normalize=list(blocks))
+
+
+def dump_decoder(result, profile=None):
+    """The YAML text of a whole decoder document."""
+    if profile is None:
+        return yaml.dump(result, Dumper=SafeDumper)
+    with profile.phase("dump"):
+        text = yaml.dump(result, Dumper=SafeDumper)
+    profile.output_bytes += len(text.encode())
+    return text
+
+
+def write_decoder(blocks, stream, profile=None, header=None):
+    """Write a decoder document to stream one normalize block at a time,
+    as the blocks are produced.
+
+    The text is the same as dump_decoder() gives for the whole document
+    (keys sorted, block style), so regenerated decoders diff cleanly.
+    """
+    header = header or {}
+    before = {k: v for k, v in header.items() if k < "normalize"}
+    after = {k: v for k, v in header.items() if k > "normalize"}
+    if before:
+        stream.write(yaml.dump(before, Dumper=SafeDumper))
+    blocks = iter(blocks)
+    convert_time = dump_time = 0.0
+    written = 0
+    while True:
+        start = time.perf_counter()
+        block = next(blocks, None)
+        convert_time += time.perf_counter() - start
+        if block is None:
+            break
+        start = time.perf_counter()
+        text = yaml.dump([block], Dumper=SafeDumper)
+        dump_time += time.perf_counter() - start
+        if not written:
+            stream.write("normalize:\n")
+        stream.write(text)
+        written += 1
+    if not written:
+        stream.write("normalize: []\n")
+    if after:
+        stream.write(yaml.dump(after, Dumper=SafeDumper))
+    if profile is not None:
+        profile.add_time("convert", convert_time)
+        profile.add_time("dump", dump_time)
+    return written
+
+
+def stream_file(file_path, stream, profile=None, sub_pipelines="keep", optimization=None):
+    """Convert a pipeline file, writing its decoder to stream as it goes."""
+    if profile is not None:
+        profile.files += 1
+    header, blocks = decoder_document(file_path, profile, sub_pipelines)
+    if optimization is not None:
+        blocks = optimize_blocks(blocks, optimization)
+    return write_decoder(blocks, stream, profile, header)
+
+
+# Single-file output is held in memory up to this size, then on disk
+SPOOL_BYTES = 8 * 1024 * 1024
+
+
+class CountingWriter:
+    """Text stream wrapper counting the bytes written (for the profile)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode())
+        return self.stream.write(text)
+
+
+def expand_inputs(inputs):
+    """Resolve files, directories and glob patterns into pipeline files."""
+    files = []
+    for item in inputs:
+        if glob.has_magic(item):
+            files.extend(p for p in sorted(glob.glob(item, recursive=True))
+                         if os.path.isfile(p))
+        elif os.path.isdir(item):
+            for ext in ("*.yml", "*.yaml"):
+                files.extend(str(p) for p in sorted(Path(item).rglob(ext)))
+        else:
+            files.append(item)
+    # Keep the first occurrence of each file, in order
+    return list(dict.fromkeys(files))
+
+
+def decoder_output_path(file_path, output_dir):
+    """Map a pipeline path to the decoder file it is written to.
+
+    Pipelines inside an integrations tree
+    (packages/<pkg>/data_stream/<ds>/elasticsearch/ingest_pipeline/<name>.yml)
+    are written to <output_dir>/<pkg>/<ds>/<name>.yml, anything else to
+    <output_dir>/<name>.yml.
+    """
+    path = Path(file_path)
+    parts = path.parts
+    if "data_stream" in parts:
+        idx = parts.index("data_stream")
+        if 0 < idx < len(parts) - 2:
+            return Path(output_dir, parts[idx - 1], parts[idx + 1], f"{path.stem}.yml")
+    return Path(output_dir, f"{path.stem}.yml")
+
+
+def convert_to_file(file_path, output_path, profiled=False, sub_pipelines="keep",
+                    optimized=False):
+    """Batch worker: convert one pipeline and stream its decoder to a file.
+
+    The decoder is written to a temporary file next to output_path and
+    moved into place once complete. Never raises, so a bad pipeline only
+    fails its own entry.
+    Returns (file_path, output_path, error, profile dict or None,
+    OptimizationStats or None).
+    """
+    profile = ConversionProfile() if profiled else None
+    optimization = OptimizationStats() if optimized else None
+    tmp_path = None
     try:
-        with open(file_path, "r") as f:
-            yaml_data = yaml.load(f, Loader=NoTagLoader)
-        result = {"normalize": build_normalize(yaml_data["processors"])}
-        print(yaml.dump(result))
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=Path(output_path).parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            writer = CountingWriter(f)
+            stream_file(file_path, writer, profile, sub_pipelines, optimization)
+        os.replace(tmp_path, output_path)
+        tmp_path = None
+        if profile is not None:
+            profile.output_bytes += writer.bytes
+        error = None
+    except ConversionError as e:
+        error = f"{e} (operation: {e.operation})"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return (file_path, str(output_path), error, profile.to_dict() if profile else None,
+            optimization)
+
+
+def inlined_elsewhere(file_path):
+    """Callers a pipeline is inlined into, none if it is also called from
+    a foreach or on_failure (which keep the bare reference)."""
+    graph = pipeline_graph(Path(file_path).parent)
+    callers = graph.callers(Path(file_path).stem)
+    if any(call.context != "processor" for call in callers):
+        return []
+    return sorted({call.caller for call in callers})
+
+
+def run_batch(files, output_dir, jobs=None, profile=None, sub_pipelines="keep",
+              optimized=False):
+    """Convert many pipelines over a process pool and print a summary.
+
+    With a profile, the workers' profiles are merged into it. jobs=0
+    converts in this process (needed for cProfile to see the work).
+    """
+    if sub_pipelines == "inline":
+        kept = []
+        for file_path in files:
+            callers = inlined_elsewhere(file_path)
+            if callers:
+                print(f"SKIP {file_path}: inlined into {', '.join(callers)}")
+            else:
+                kept.append(file_path)
+        files = kept
+        if not files:
+            print("Error: every pipeline is called by another one (a cycle?)")
+            return False
+
+    outputs = {}
+    for file_path in files:
+        output_path = decoder_output_path(file_path, output_dir)
+        if output_path in outputs.values():
+            # Disambiguate same-named pipelines outside an integrations tree
+            output_path = output_path.with_name(
+                f"{output_path.stem}-{len(outputs)}.yml")
+        outputs[file_path] = output_path
+
+    if jobs == 0:
+        results = (convert_to_file(f, outputs[f], profile is not None, sub_pipelines,
+                                   optimized)
+                   for f in files)
+        return report_batch(results, len(files), profile)
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(jobs, len(files))) as executor:
+        futures = [executor.submit(convert_to_file, f, outputs[f], profile is not None,
+                                   sub_pipelines, optimized)
+                   for f in files]
+        return report_batch((future.result() for future in futures), len(files), profile)
+
+
+def report_batch(results, total, profile=None):
+    failed = 0
+    optimization = None
+    for file_path, output_path, error, file_profile, file_optimization in results:
+        if profile is not None and file_profile:
+            profile.merge(file_profile)
+        if error:
+            failed += 1
+            print(f"FAIL {file_path}: {error}")
+        elif file_optimization is not None:
+            optimization = optimization or OptimizationStats()
+            optimization.merge(file_optimization)
+            print(f"OK   {file_path} -> {output_path} "
+                  f"({file_optimization.before} -> {file_optimization.after} ops/event)")
+        else:
+            print(f"OK   {file_path} -> {output_path}")
+
+    print(f"\n{total - failed} succeeded, {failed} failed, {total} total")
+    if optimization is not None:
+        print(f"Optimised: {optimization.summary()}")
+    return failed == 0
+
+
+def write_profile(profile, report_path, stats=None, stats_path=None):
+    profile.print_summary()
+    with open(report_path, "w") as f:
+        json.dump(profile.report(), f, indent=2)
+    print(f"Profile report written to {report_path}", file=sys.stderr)
+    if stats is not None:
+        stats.dump_stats(stats_path)
+        print(f"cProfile stats written to {stats_path} "
+              f"(python -m pstats {stats_path})", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert Elastic ingest pipelines into Wazuh decoders"
+    )
+    parser.add_argument(
+        "inputs", nargs="+",
+        help="Pipeline file, directory or glob (e.g. 'packages/*/data_stream/*/elasticsearch/ingest_pipeline/*.yml')"
+    )
+    parser.add_argument(
+        "-o", "--output-dir",
+        help="Write one decoder per pipeline into this directory (batch mode)"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="Number of worker processes in batch mode (default: number of cores)"
+    )
+    parser.add_argument(
+        "-s", "--sub-pipelines", choices=SUB_PIPELINE_MODES, default="keep",
+        help="Resolve `pipeline` processors against the pipelines next to each file: "
+             "inline them, or link them as separate decoders with the callers as parents "
+             "(default: keep the bare reference)"
+    )
+    parser.add_argument(
+        "-O", "--optimize", action="store_true",
+        help="Merge blocks and drop dead or redundant statements from the normalize "
+             "list, reporting the operations per event saved"
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="conversion-profile.json", metavar="REPORT",
+        help="Record time and emitted statements per handler and phase into a JSON "
+             "report (default: conversion-profile.json)"
+    )
+    parser.add_argument(
+        "--pstats", metavar="FILE",
+        help="With --profile, also write cProfile stats (batch mode then runs in-process)"
+    )
+    args = parser.parse_args()
+
+    profile = ConversionProfile() if args.profile else None
+    stats = cProfile.Profile() if args.profile and args.pstats else None
+
+    single = (len(args.inputs) == 1 and not args.output_dir
+              and not glob.has_magic(args.inputs[0])
+              and not os.path.isdir(args.inputs[0]))
+    if not single:
+        files = expand_inputs(args.inputs)
+        if not files:
+            print("Error: no pipeline files found.")
+            sys.exit(1)
+        jobs = 0 if stats is not None else args.jobs
+        if stats is not None:
+            stats.enable()
+        success = run_batch(files, args.output_dir or "decoders", jobs, profile,
+                            args.sub_pipelines, args.optimize)
+        if stats is not None:
+            stats.disable()
+        if profile is not None:
+            write_profile(profile, args.profile, stats, args.pstats)
+        sys.exit(0 if success else 1)
+
+    file_path = args.inputs[0]
+
+    try:
+        if stats is not None:
+            stats.enable()
+        optimization = OptimizationStats() if args.optimize else None
+        # Spooled like convert_to_file's temp file, so a conversion that
+        # fails partway prints no partial decoder
+        with tempfile.SpooledTemporaryFile(SPOOL_BYTES, mode="w+") as spool:
+            writer = CountingWriter(spool)
+            stream_file(file_path, writer, profile, args.sub_pipelines, optimization)
+            spool.seek(0)
+            shutil.copyfileobj(spool, sys.stdout)
+        print()
+        if optimization is not None:
+            print(f"Optimised: {optimization.summary()}", file=sys.stderr)
+        if stats is not None:
+            stats.disable()
+        if profile is not None:
+            profile.output_bytes += writer.bytes
+            write_profile(profile, args.profile, stats, args.pstats)
 
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
     except yaml.YAMLError as e:
         print(f"Error parsing YAML: {e}")
+    except PipelineCycleError as e:
+        print(f"Error: {e}")
+        exit(1)
+    except ConversionError as e:
+        traceback.print_exception(e.__cause__)
+        print(f"{e}\nException processing operation: {e.operation}")
+        print(json.dumps(e.processor, indent=2))
+        exit(1)
 
 
 if __name__ == "__main__":
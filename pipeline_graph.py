@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+# Call graph of the ingest pipelines of a directory.
+#
+# Follows `pipeline` processors, including the ones nested in `foreach`
+# and `on_failure`, to the sibling pipeline files they name (either
+# '{{ IngestPipeline "name" }}' or a plain name). Each pipeline is loaded
+# once; cycles are reported with the chain of calls, and every pipeline
+# gets a digest covering its content and everything it calls, which is
+# what converted results are memoized on.
+
+import hashlib
+import re
+import sys
+from pathlib import Path
+
+from yaml_loader import load_yaml
+
+INGEST_PIPELINE_REF = re.compile(r"""^\{\{\s*IngestPipeline\s+["']([^"']+)["']\s*\}\}$""")
+PIPELINE_EXTENSIONS = (".yml", ".yaml")
+
+
+class PipelineCycleError(ValueError):
+    """Pipelines that call themselves, directly or not."""
+
+    def __init__(self, chain):
+        super().__init__(f"Pipeline call cycle: {' -> '.join(chain)}")
+        self.chain = chain
+
+
+def reference_name(name):
+    """The pipeline name a `pipeline` processor refers to."""
+    name = str(name).strip()
+    match = INGEST_PIPELINE_REF.match(name)
+    return match.group(1) if match else name
+
+
+def iter_processors(processors, context="processor"):
+    """Yield (processor, context) for every processor, descending into
+    foreach and on_failure. context is the innermost one of
+    "processor", "foreach" or "on_failure"."""
+    for processor in processors or []:
+        if not isinstance(processor, dict) or not processor:
+            continue
+        yield processor, context
+        operation, body = next(iter(processor.items()))
+        if not isinstance(body, dict):
+            continue
+        if operation == "foreach" and isinstance(body.get("processor"), dict):
+            yield from iter_processors([body["processor"]], "foreach")
+        if body.get("on_failure"):
+            yield from iter_processors(body["on_failure"], "on_failure")
+
+
+class Call:
+    """One `pipeline` processor: what it calls and where it sits."""
+
+    def __init__(self, caller, name, context, condition=None):
+        self.caller = caller
+        self.name = name
+        self.context = context
+        self.condition = condition
+
+    def __repr__(self):
+        return f"Call({self.caller} -> {self.name}, {self.context})"
+
+
+class PipelineNode:
+    def __init__(self, name, path, data, digest):
+        self.name = name
+        self.path = path
+        self.data = data if isinstance(data, dict) else {}
+        self.digest = digest
+        self.calls = []
+        processors = self.data.get("processors") or []
+        for processor, context in iter_processors(processors):
+            self.add_call(processor, context)
+        for processor, _ in iter_processors(self.data.get("on_failure") or [], "on_failure"):
+            self.add_call(processor, "on_failure")
+
+    def add_call(self, processor, context):
+        body = processor.get("pipeline")
+        if isinstance(body, dict) and body.get("name"):
+            self.calls.append(Call(self.name, reference_name(body["name"]), context,
+                                   body.get("if")))
+
+    @property
+    def processors(self):
+        return self.data.get("processors") or []
+
+
+class PipelineGraph:
+    """Pipelines of one directory, loaded on demand."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.nodes = {}
+        self.closure_digests = {}
+
+    def path_of(self, name):
+        for ext in PIPELINE_EXTENSIONS:
+            path = self.directory / f"{name}{ext}"
+            if path.is_file():
+                return path
+        return None
+
+    def node(self, name):
+        """The pipeline called `name`, None if there's no such file here."""
+        if name not in self.nodes:
+            path = self.path_of(name)
+            if path is None:
+                self.nodes[name] = None
+            else:
+                with open(path, "rb") as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+                self.nodes[name] = PipelineNode(name, path, load_yaml(path), digest)
+        return self.nodes[name]
+
+    def load_all(self):
+        for ext in PIPELINE_EXTENSIONS:
+            for path in sorted(self.directory.glob(f"*{ext}")):
+                self.node(path.stem)
+        return [node for node in self.nodes.values() if node is not None]
+
+    def resolvable(self, call):
+        return self.node(call.name) is not None
+
+    def unresolved(self, name):
+        """Calls reachable from `name` that don't match a pipeline file."""
+        return [call for node in self.reachable(name) for call in node.calls
+                if not self.resolvable(call)]
+
+    def reachable(self, name):
+        """Nodes reachable from `name`, itself included, callees first."""
+        self.check_cycles(name)
+        order, seen = [], set()
+
+        def visit(current):
+            if current in seen:
+                return
+            seen.add(current)
+            node = self.node(current)
+            if node is None:
+                return
+            for call in node.calls:
+                visit(call.name)
+            order.append(node)
+
+        visit(name)
+        return order
+
+    def callers(self, name):
+        """Calls to `name` from any pipeline of the directory."""
+        return [call for node in self.load_all() for call in node.calls if call.name == name]
+
+    def roots(self):
+        """Pipelines no other pipeline of the directory calls."""
+        called = {call.name for node in self.load_all() for call in node.calls}
+        return [node for node in self.load_all() if node.name not in called]
+
+    def check_cycles(self, name):
+        """Raise PipelineCycleError if anything reachable from name loops."""
+        state = {}
+
+        def visit(current, trail):
+            if state.get(current) == "done":
+                return
+            if state.get(current) == "visiting":
+                raise PipelineCycleError(trail[trail.index(current):] + [current])
+            state[current] = "visiting"
+            node = self.node(current)
+            for call in node.calls if node else []:
+                visit(call.name, trail + [current])
+            state[current] = "done"
+
+        visit(name, [])
+
+    def closure_digest(self, name):
+        """Digest of a pipeline and of every pipeline it calls."""
+        if name not in self.closure_digests:
+            self.check_cycles(name)
+            node = self.node(name)
+            digest = hashlib.sha256()
+            if node is None:
+                digest.update(f"missing:{name}".encode())
+            else:
+                digest.update(node.digest.encode())
+                for call in node.calls:
+                    digest.update(f"\0{call.name}:{self.closure_digest(call.name)}".encode())
+            self.closure_digests[name] = digest.hexdigest()
+        return self.closure_digests[name]
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python pipeline_graph.py <ingest_pipeline directory or pipeline file>")
+        sys.exit(1)
+
+    path = Path(sys.argv[1])
+    graph = PipelineGraph(path if path.is_dir() else path.parent)
+    if path.is_file():
+        names = [path.stem]
+    else:
+        # Pipelines that are only reachable through a cycle have no root
+        names = [node.name for node in graph.roots() or graph.load_all()]
+    try:
+        for name in names:
+            for node in graph.reachable(name):
+                for call in node.calls:
+                    status = "" if graph.resolvable(call) else "  (unresolved)"
+                    condition = f"  if {call.condition}" if call.condition else ""
+                    print(f"{node.name} -> {call.name} [{call.context}]{condition}{status}")
+    except PipelineCycleError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
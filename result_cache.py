@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+# Content-addressed cache of engine outputs for decoder test runs.
+#
+# Entries are keyed on hash(decoder asset files + integration config +
+# input line), so an event is only re-run when something that can change
+# its output changed. The cache is a SQLite file bounded in size, least
+# recently used entries are evicted first.
+#
+# The key covers the integration's decoders, the parent decoders they
+# name from other directories, wazuh-core (which every event goes
+# through first) and the state init_engine.py last applied. Assets
+# changed on the engine by any other means (engine-catalog by hand, a
+# recreated engine) aren't seen: run with --invalidate after those.
+
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+import cache_dirs
+from yaml_loader import SafeLoader, load_yaml
+
+CORE_INTEGRATION = "wazuh-core"
+ENGINE_STATE_FILE = ".engine-init-state.json"
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    integration TEXT NOT NULL,
+    output TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used);
+CREATE INDEX IF NOT EXISTS results_integration ON results(integration);
+"""
+
+
+def default_cache_path():
+    return cache_dirs.cache_dir("results") / "results.sqlite"
+
+
+def digest_paths(paths):
+    """Hash the content of files and directory trees, in a stable order.
+
+    Paths are hashed relative to each root's parent, so the digest doesn't
+    depend on the working directory.
+    """
+    digest = hashlib.sha256()
+    for root in sorted(Path(p) for p in paths):
+        if root.is_file():
+            files = [root]
+        elif root.is_dir():
+            files = sorted(p for p in root.rglob("*") if p.is_file())
+        else:
+            # A missing path still changes the digest if it appears later
+            digest.update(f"missing:{root.name}\0".encode())
+            continue
+        for path in files:
+            digest.update(f"{path.relative_to(root.parent).as_posix()}\0".encode())
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def decoder_definitions(paths):
+    """(path, definition) of every decoder file under paths."""
+    for root in paths:
+        files = [root] if root.is_file() else sorted(root.rglob("*.yml")) if root.is_dir() else []
+        for path in files:
+            try:
+                definition = load_yaml(path, loader=SafeLoader)
+            except (OSError, ValueError, yaml.YAMLError):
+                definition = None
+            if isinstance(definition, dict):
+                yield path, definition
+
+
+def parent_decoder_paths(decoders_root, own_dirs):
+    """Decoder files outside own_dirs that the decoders in own_dirs name as
+    parents, followed up the hierarchy."""
+    wanted = set()
+    for _, definition in decoder_definitions(own_dirs):
+        wanted.update(definition.get("parents") or [])
+    if not wanted:
+        return []
+    by_name = {}
+    for path, definition in decoder_definitions([decoders_root]):
+        if isinstance(definition.get("name"), str):
+            by_name.setdefault(definition["name"], (path, definition))
+    found, seen = [], set()
+    while wanted:
+        name = wanted.pop()
+        if name in seen or name not in by_name:
+            continue
+        seen.add(name)
+        path, definition = by_name[name]
+        if not any(path.is_relative_to(d) for d in own_dirs):
+            found.append(path)
+        wanted.update(definition.get("parents") or [])
+    return sorted(found)
+
+
+def integration_asset_paths(integrations_dir, integration_name):
+    """Files an integration's test outputs depend on: its decoders and their
+    parents, wazuh-core, the engine state applied by init_engine.py, and
+    its integration directory (manifest and test configuration), without
+    the test inputs and expected outputs themselves."""
+    integration_dir = Path(integrations_dir, integration_name)
+    ruleset_dir = Path(integrations_dir).parent
+    decoders_root = ruleset_dir / "decoders"
+    own_dirs = [decoders_root / integration_name]
+    paths = list(own_dirs)
+    if integration_name != CORE_INTEGRATION:
+        own_dirs.append(decoders_root / CORE_INTEGRATION)
+        paths += [decoders_root / CORE_INTEGRATION, Path(integrations_dir, CORE_INTEGRATION)]
+    paths += parent_decoder_paths(decoders_root, own_dirs)
+    paths.append(ruleset_dir / ENGINE_STATE_FILE)
+    if integration_dir.is_dir():
+        for path in sorted(integration_dir.iterdir()):
+            if path.name != "test":
+                paths.append(path)
+    paths.append(integration_dir / "test" / "engine-test.conf")
+    return paths
+
+
+class ResultCache:
+    """SQLite-backed output cache with size-bounded LRU eviction."""
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path or default_cache_path())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def key(assets_digest, line):
+        return hashlib.sha256(f"{assets_digest}\0{line}".encode()).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: output} for the cached keys, marking them as used."""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, output FROM results WHERE key IN ({placeholders})", batch)
+            for key, output in rows:
+                found[key] = json.loads(output)
+        if found:
+            now = time.time()
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE results SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found])
+        return found
+
+    def put_many(self, integration, items):
+        """Store (key, output) pairs, then evict down to the size bound."""
+        now = time.time()
+        rows = []
+        for key, output in items:
+            text = json.dumps(output, ensure_ascii=False)
+            rows.append((key, integration, text, len(text.encode()), now))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results (key, integration, output, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        with self.connection:
+            rows = self.connection.execute(
+                "SELECT key, size FROM results ORDER BY last_used").fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                doomed.append((key,))
+                total -= size
+            self.connection.executemany("DELETE FROM results WHERE key = ?", doomed)
+            evicted = len(doomed)
+        return evicted
+
+    def size(self):
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def invalidate(self, integration=None):
+        """Remove the entries of one integration, or every entry."""
+        with self.connection:
+            if integration is None:
+                cursor = self.connection.execute("DELETE FROM results")
+            else:
+                cursor = self.connection.execute(
+                    "DELETE FROM results WHERE integration = ?", (integration,))
+        return cursor.rowcount
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stats", "clear"):
+        print("Usage: python result_cache.py stats|clear [integration_name]")
+        sys.exit(1)
+
+    with ResultCache() as cache:
+        if sys.argv[1] == "clear":
+            integration = sys.argv[2] if len(sys.argv) > 2 else None
+            print(f"Removed {cache.invalidate(integration)} cached results")
+        else:
+            count = cache.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            print(f"{cache.path}: {count} results, {cache.size() / 1024:.1f} KiB "
+                  f"(limit {cache.max_bytes / 1024 / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
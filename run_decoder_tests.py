@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+# Runs the decoder tests of an integration without a human at the keyboard.
+#
+# Every line of each *_input.txt is streamed through a persistent
+# engine-test session (or a small pool of them) instead of starting one
+# process per line. Outputs are matched to their input line through the
+# echoed event.original (by position when engine-test doesn't echo it),
+# and a session that printed more or fewer events than it was fed is
+# failed as a whole. Each output event is compared with the matching
+# entry of *_expected.json and a pass/fail/diff summary is printed with
+# per-event latency. Outputs are cached by content (see result_cache.py),
+# so only events whose decoder, configuration or input changed are re-run.
+
+import argparse
+import codecs
+import difflib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from json_stream import JSONStreamReader
+from result_cache import (DEFAULT_MAX_BYTES, ResultCache, digest_paths,
+                          integration_asset_paths)
+
+DEFAULT_INTEGRATIONS_DIR = "../intelligence-data/ruleset/integrations"
+DEFAULT_ENGINE_TEST = "engine-test"
+
+
+class PipeReader:
+    """Text view of a pipe that returns whatever is available instead of
+    blocking until a full chunk is read, so events are seen as they arrive."""
+
+    def __init__(self, pipe):
+        self.fd = pipe.fileno()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def read(self, size):
+        data = os.read(self.fd, size)
+        return self.decoder.decode(data, final=not data)
+
+
+def iter_output_events(stream):
+    """Yield (event, arrival_time) for every JSON document engine-test prints,
+    skipping any non-JSON lines around them."""
+    reader = JSONStreamReader(stream, chunk_size=64 * 1024)
+    while True:
+        char = reader.peek()
+        if not char:
+            return
+        if char not in "{[":
+            # Not an event, drop the rest of the line
+            while True:
+                newline = reader.buffer.find("\n", reader.pos)
+                if newline != -1:
+                    reader.pos = newline + 1
+                    break
+                reader.pos = len(reader.buffer)
+                if not reader.fill():
+                    break
+            continue
+        try:
+            event = reader.value()
+        except json.JSONDecodeError:
+            reader.pos += 1
+            continue
+        yield event, time.perf_counter()
+
+
+def echoed_original(event):
+    original = event.get("event", {}).get("original") if isinstance(event, dict) else None
+    if original is None and isinstance(event, dict):
+        original = event.get("event.original")
+    return original if isinstance(original, str) else None
+
+
+def match_outputs(lines, outputs):
+    """Pair each line with its (output, latency), or None when they can't
+    be paired: a count mismatch or an echoed original that isn't an input."""
+    if len(outputs) != len(lines):
+        return None
+    originals = [echoed_original(event) for event, _ in outputs]
+    if any(original is None for original in originals):
+        # Nothing to match on, engine-test answers in input order
+        return outputs
+    pending = {}
+    for output, original in zip(outputs, originals):
+        pending.setdefault(original, []).append(output)
+    matched = []
+    for line in lines:
+        candidates = pending.get(line)
+        if not candidates:
+            return None
+        matched.append(candidates.pop(0))
+    return matched
+
+
+def engine_test_command(engine_test, config, integration_name):
+    return [engine_test, "-c", str(config), "run", integration_name]
+
+
+def run_session(lines, command):
+    """Stream lines through a single engine-test process.
+
+    Returns one (output, latency_seconds) per line. When the outputs
+    can't be matched to the lines every output is None: a dropped or
+    extra event would otherwise shift the outputs of every later line.
+    """
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def feed():
+        try:
+            for line in lines:
+                process.stdin.write(line.encode("utf-8") + b"\n")
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    stderr = []
+    writer = threading.Thread(target=feed, daemon=True)
+    err_reader = threading.Thread(
+        target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    start = time.perf_counter()
+    writer.start()
+    err_reader.start()
+
+    results = []
+    previous = start
+    for event, arrival in iter_output_events(PipeReader(process.stdout)):
+        results.append((event, arrival - previous))
+        previous = arrival
+
+    writer.join()
+    err_reader.join()
+    returncode = process.wait()
+    if returncode != 0 and not results and lines:
+        message = b"".join(stderr).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"engine-test exited with {returncode}: {message}")
+    matched = match_outputs(lines, results)
+    if matched is None:
+        print(f"  [ERROR] engine-test printed {len(results)} event(s) for {len(lines)} "
+              "line(s) that can't be matched to them, failing the session")
+        return [(None, 0.0)] * len(lines)
+    return matched
+
+
+def run_cached_lines(lines, command, jobs, cache, integration_name, assets_digest):
+    """Serve cached outputs and only run the lines that missed.
+
+    Returns one (output, latency_seconds, cached) per line.
+    """
+    keys = [ResultCache.key(assets_digest, line) for line in lines]
+    hits = cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in hits]
+    fresh = run_lines([lines[i] for i in missing], command, jobs) if missing else []
+
+    results = [(hits.get(key), 0.0, True) for key in keys]
+    for i, (output, latency) in zip(missing, fresh):
+        results[i] = (output, latency, False)
+    if all(output is not None for output, _ in fresh):
+        # A failed session leaves every output of the run unstored
+        cache.put_many(integration_name, [
+            (keys[i], output) for i, (output, _) in zip(missing, fresh)])
+    return results
+
+
+def run_lines(lines, command, jobs=1):
+    """Run lines over up to `jobs` concurrent sessions, results in input order."""
+    if jobs <= 1 or len(lines) <= 1:
+        return run_session(lines, command)
+    jobs = min(jobs, len(lines))
+    size = -(-len(lines) // jobs)
+    chunks = [lines[i:i + size] for i in range(0, len(lines), size)]
+    with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+        results = []
+        for chunk_results in executor.map(lambda chunk: run_session(chunk, command), chunks):
+            results.extend(chunk_results)
+    return results
+
+
+def drop_fields(event, ignored):
+    """Copy of event without the ignored dotted fields."""
+    if not ignored or not isinstance(event, dict):
+        return event
+    event = json.loads(json.dumps(event))
+    for field in ignored:
+        node = event
+        parts = field.split(".")
+        for part in parts[:-1]:
+            node = node.get(part) if isinstance(node, dict) else None
+        if isinstance(node, dict):
+            node.pop(parts[-1], None)
+    return event
+
+
+def diff_events(expected, actual):
+    expected_text = json.dumps(expected, indent=2, sort_keys=True, ensure_ascii=False).splitlines()
+    actual_text = json.dumps(actual, indent=2, sort_keys=True, ensure_ascii=False).splitlines()
+    return "\n".join(difflib.unified_diff(
+        expected_text, actual_text, "expected", "actual", lineterm=""))
+
+
+def load_expected(input_file):
+    expected_file = input_file.with_name(input_file.name.replace("_input.txt", "_expected.json"))
+    if not expected_file.exists():
+        return None
+    with open(expected_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check_results(lines, results, expected, ignored=()):
+    """Compare outputs with expected events, yields one report dict per line."""
+    for index, (line, result) in enumerate(zip(lines, results)):
+        output, latency = result[:2]
+        cached = len(result) > 2 and result[2]
+        report = {"index": index, "line": line, "latency": latency, "output": output,
+                  "cached": cached}
+        if output is None:
+            report["status"] = "ERROR"
+        elif expected is None or index >= len(expected):
+            report["status"] = "NO EXPECTED"
+        else:
+            want = drop_fields(expected[index], ignored)
+            got = drop_fields(output, ignored)
+            if want == got:
+                report["status"] = "PASS"
+            else:
+                report["status"] = "FAIL"
+                report["diff"] = diff_events(want, got)
+        yield report
+
+
+def find_input_files(test_dir):
+    return sorted(Path(test_dir).rglob("*_input.txt"))
+
+
+def read_lines(input_file):
+    with open(input_file, "r", encoding="utf-8") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip()]
+
+
+def print_summary(reports):
+    counts = {}
+    for report in reports:
+        counts[report["status"]] = counts.get(report["status"], 0) + 1
+    latencies = [r["latency"] * 1000 for r in reports
+                 if r["output"] is not None and not r["cached"]]
+    cached = sum(1 for r in reports if r["cached"])
+    print("\nSummary: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+          + f", {len(reports)} total ({cached} from cache)")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"Latency (ms): mean {statistics.mean(latencies):.1f}, "
+              f"p50 {statistics.median(latencies):.1f}, p95 {p95:.1f}, max {latencies[-1]:.1f}")
+
+
+def run_integration_tests(integration_name, integrations_dir=DEFAULT_INTEGRATIONS_DIR,
+                          engine_test=DEFAULT_ENGINE_TEST, jobs=1, ignored=(), verbose=False,
+                          cache=None):
+    """Run every *_input.txt of an integration, returns the list of reports.
+
+    When a ResultCache is given, unchanged events are served from it.
+    """
+    test_dir = Path(integrations_dir, integration_name, "test")
+    input_files = find_input_files(test_dir)
+    if not input_files:
+        print(f"No *_input.txt files found in: {test_dir}")
+        return None
+
+    command = engine_test_command(engine_test, test_dir / "engine-test.conf", integration_name)
+    if cache is not None:
+        assets_digest = digest_paths(integration_asset_paths(integrations_dir, integration_name))
+    all_reports = []
+    for input_file in input_files:
+        print(f"Running {input_file.name}")
+        lines = read_lines(input_file)
+        if cache is not None:
+            results = run_cached_lines(lines, command, jobs, cache, integration_name, assets_digest)
+        else:
+            results = run_lines(lines, command, jobs)
+        expected = load_expected(input_file)
+        for report in check_results(lines, results, expected, ignored):
+            all_reports.append(report)
+            timing = "cached" if report["cached"] else f"{report['latency'] * 1000:.1f} ms"
+            print(f"  [{report['status']}] #{report['index']} ({timing})")
+            if report["status"] != "PASS" and verbose:
+                print(f"    input: {report['line']}")
+            if report.get("diff"):
+                print("\n".join(f"    {line}" for line in report["diff"].splitlines()))
+    print_summary(all_reports)
+    return all_reports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run an integration's decoder tests through persistent engine-test sessions"
+    )
+    parser.add_argument("integration_name", help="Name of the integration")
+    parser.add_argument(
+        "-d", "--integrations-dir", default=DEFAULT_INTEGRATIONS_DIR,
+        help=f"Integrations directory (default: {DEFAULT_INTEGRATIONS_DIR})"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of concurrent engine-test sessions (default: 1)"
+    )
+    parser.add_argument(
+        "-e", "--engine-test", default=DEFAULT_ENGINE_TEST,
+        help=f"engine-test executable (default: {DEFAULT_ENGINE_TEST})"
+    )
+    parser.add_argument(
+        "-i", "--ignore", action="append", default=[], metavar="FIELD",
+        help="Dotted field left out of the comparison, can be repeated"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="Print the input line of every event that didn't pass"
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Run every event instead of serving unchanged ones from the result cache"
+    )
+    parser.add_argument(
+        "--invalidate", action="store_true",
+        help="Drop this integration's cached results before running"
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar="MIB",
+        help=f"Result cache size limit in MiB (default: {DEFAULT_MAX_BYTES // (1024 * 1024)})"
+    )
+    args = parser.parse_args()
+
+    cache = None
+    try:
+        if not args.no_cache:
+            cache = ResultCache(max_bytes=args.cache_size * 1024 * 1024)
+            if args.invalidate:
+                cache.invalidate(args.integration_name)
+        reports = run_integration_tests(
+            args.integration_name, args.integrations_dir, args.engine_test,
+            args.jobs, args.ignore, args.verbose, cache)
+    except (OSError, RuntimeError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
+    if reports is None:
+        sys.exit(1)
+    sys.exit(0 if all(r["status"] in ("PASS", "NO EXPECTED") for r in reports) else 1)
+
+
+if __name__ == "__main__":
+    main()
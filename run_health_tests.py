@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+# Runs the engine health-test stages of run-test.sh as a dependency graph.
+#
+# The static validators run concurrently up to a job limit, alongside the
+# dynamic stages. Those share one engine environment (--ht-env), so they
+# hold a lock on it and run one at a time in the order of run-test.sh,
+# and load_rules waits for every decoder stage. A failed stage only skips the stages that depend on it,
+# every failure is reported at the end, and per-stage wall times are
+# written as a JSON report.
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+DEFAULT_ENGINE_DIR = "/root/wazuh/src/engine"
+DEFAULT_RULESET = "./ruleset"
+DEFAULT_HT_ENV = "/tmp/ht-env"
+DEFAULT_HT_INIT = "/tmp/ht-init"
+DEFAULT_REPORT = "health-test-report.json"
+DEFAULT_LOG_DIR = "health-test-logs"
+
+STATIC_VALIDATORS = [
+    "metadata_validate",
+    "schema_validate",
+    "mandatory_mapping_validate",
+    "event_processing_validate",
+    "non_modifiable_fields_validate",
+    "custom_field_documentation_validate",
+]
+
+
+class Stage:
+    """A node of the graph: a command (or Python callable) and the stages it
+    needs. Stages holding the same lock never run at the same time."""
+
+    def __init__(self, name, command, deps=(), lock=None):
+        self.name = name
+        self.command = command
+        self.deps = tuple(deps)
+        self.lock = lock
+
+
+def build_stages(ruleset, engine_dir, ht_env, ht_init):
+    """The stages of run-test.sh and their dependencies."""
+    stages = []
+    for validator in STATIC_VALIDATORS:
+        stages.append(Stage(validator, ["engine-health-test", "static", "-r", ruleset, validator]))
+
+    def dynamic(*args):
+        return ["engine-health-test", "dynamic", "-e", ht_env, *args]
+
+    def reset_environment():
+        for directory in (ht_env, ht_init):
+            if os.path.isdir(directory):
+                shutil.rmtree(directory)
+
+    skip = ["--skip", "wazuh-core"]
+    dynamic_stages = [
+        Stage("reset_environment", reset_environment),
+        Stage("setup_environment",
+              ["python3", f"{engine_dir}/test/setupEnvironment.py", "-e", ht_env],
+              ["reset_environment"]),
+        Stage("init", dynamic("init", "-t", f"{engine_dir}/test/health_test/", "-r", ruleset),
+              ["setup_environment"]),
+        Stage("assets_validate", dynamic("assets_validate"), ["init"]),
+        Stage("load_decoders", dynamic("load_decoders"), ["assets_validate"]),
+        Stage("decoder_validate_successful_assets",
+              dynamic("validate_successful_assets", "--target", "decoder", *skip), ["load_decoders"]),
+        Stage("decoder_validate_event_indexing",
+              dynamic("validate_event_indexing", "--target", "decoder", *skip), ["load_decoders"]),
+        Stage("decoder_validate_custom_field_indexing",
+              dynamic("validate_custom_field_indexing", "--target", "decoder"), ["load_decoders"]),
+        Stage("decoder_run", dynamic("run", "--target", "decoder", *skip), ["load_decoders"]),
+        Stage("decoder_coverage_validate",
+              dynamic("coverage_validate", "--target", "decoder", *skip,
+                      "--output_file", f"{ht_env}/decoder_coverage_report.txt"),
+              ["load_decoders"]),
+        Stage("load_rules", dynamic("load_rules"),
+              ["decoder_validate_successful_assets", "decoder_validate_event_indexing",
+               "decoder_validate_custom_field_indexing", "decoder_run",
+               "decoder_coverage_validate"]),
+        Stage("rule_validate_successful_assets",
+              dynamic("validate_successful_assets", "--target", "rule", *skip), ["load_rules"]),
+        Stage("rule_validate_event_indexing",
+              dynamic("validate_event_indexing", "--target", "rule", *skip), ["load_rules"]),
+        Stage("rule_validate_custom_field_indexing",
+              dynamic("validate_custom_field_indexing", "--target", "rule"), ["load_rules"]),
+        Stage("rule_run", dynamic("run", "--target", "rule", *skip), ["load_rules"]),
+    ]
+    for stage in dynamic_stages:
+        # They all read or change the one environment
+        stage.lock = ht_env
+    return stages + dynamic_stages
+
+
+def check_graph(stages):
+    """Reject unknown dependencies and cycles before running anything."""
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+    state = {}
+
+    def visit(name, trail):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(trail + [name])}")
+        state[name] = "visiting"
+        for dep in by_name[name].deps:
+            visit(dep, trail + [name])
+        state[name] = "done"
+
+    for stage in stages:
+        visit(stage.name, [])
+
+
+def run_stage(stage, log_dir):
+    """Run one stage, returns (returncode, start, end, log_path)."""
+    start = time.time()
+    if callable(stage.command):
+        try:
+            stage.command()
+            returncode = 0
+        except Exception as e:
+            print(f"[ERROR] {stage.name}: {e}", file=sys.stderr)
+            returncode = 1
+        return returncode, start, time.time(), None
+
+    log_path = Path(log_dir, f"{stage.name}.log")
+    with open(log_path, "w") as log:
+        log.write(f"+ {' '.join(stage.command)}\n")
+        log.flush()
+        try:
+            returncode = subprocess.run(
+                stage.command, stdout=log, stderr=subprocess.STDOUT).returncode
+        except OSError as e:
+            log.write(f"{e}\n")
+            returncode = 127
+    return returncode, start, time.time(), str(log_path)
+
+
+def run_graph(stages, jobs=None, log_dir=DEFAULT_LOG_DIR):
+    """Run stages as soon as their dependencies succeeded and their lock is
+    free, in declaration order among the ready ones.
+
+    Stages depending on a failed or skipped stage are skipped. Returns
+    one result dict per stage, in declaration order.
+    """
+    check_graph(stages)
+    jobs = jobs or os.cpu_count() or 1
+    Path(log_dir).mkdir(parents=True, exist_ok=True)
+    results = {}
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            held = {stage.lock for stage in running.values() if stage.lock is not None}
+            for stage in list(pending):
+                statuses = [results[d]["status"] if d in results else None for d in stage.deps]
+                if any(s in ("failed", "skipped") for s in statuses):
+                    pending.remove(stage)
+                    results[stage.name] = {"name": stage.name, "status": "skipped",
+                                           "deps": list(stage.deps), "wall_time": 0.0}
+                    print(f"[SKIP] {stage.name}")
+                elif (all(s == "passed" for s in statuses) and len(running) < jobs
+                        and stage.lock not in held):
+                    pending.remove(stage)
+                    running[executor.submit(run_stage, stage, log_dir)] = stage
+                    if stage.lock is not None:
+                        held.add(stage.lock)
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                returncode, start, end, log_path = future.result()
+                status = "passed" if returncode == 0 else "failed"
+                results[stage.name] = {
+                    "name": stage.name,
+                    "status": status,
+                    "returncode": returncode,
+                    "deps": list(stage.deps),
+                    "start": start,
+                    "end": end,
+                    "wall_time": round(end - start, 3),
+                    "log": log_path,
+                }
+                label = "PASS" if status == "passed" else "FAIL"
+                print(f"[{label}] {stage.name} ({end - start:.1f}s)")
+
+    return [results[stage.name] for stage in stages]
+
+
+def write_report(results, report_path, wall_time, jobs):
+    report = {
+        "wall_time": round(wall_time, 3),
+        "jobs": jobs,
+        "stages": results,
+    }
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the engine health tests as a parallel dependency graph"
+    )
+    parser.add_argument("-r", "--ruleset", default=DEFAULT_RULESET,
+                        help=f"Ruleset directory (default: {DEFAULT_RULESET})")
+    parser.add_argument("--engine-dir", default=DEFAULT_ENGINE_DIR,
+                        help=f"Wazuh engine source directory (default: {DEFAULT_ENGINE_DIR})")
+    parser.add_argument("--ht-env", default=DEFAULT_HT_ENV,
+                        help=f"Health-test environment directory (default: {DEFAULT_HT_ENV})")
+    parser.add_argument("--ht-init", default=DEFAULT_HT_INIT,
+                        help=f"Health-test init directory (default: {DEFAULT_HT_INIT})")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Maximum concurrent stages (default: number of cores)")
+    parser.add_argument("-o", "--report", default=DEFAULT_REPORT,
+                        help=f"JSON report with per-stage wall times (default: {DEFAULT_REPORT})")
+    parser.add_argument("-l", "--log-dir", default=DEFAULT_LOG_DIR,
+                        help=f"Directory for per-stage output (default: {DEFAULT_LOG_DIR})")
+    parser.add_argument("--only", action="append", metavar="STAGE",
+                        help="Run only these stages and what they depend on, can be repeated")
+    args = parser.parse_args()
+
+    stages = build_stages(args.ruleset, args.engine_dir, args.ht_env, args.ht_init)
+    if args.only:
+        by_name = {stage.name: stage for stage in stages}
+        unknown = [name for name in args.only if name not in by_name]
+        if unknown:
+            print(f"Error: unknown stage(s): {', '.join(unknown)}")
+            sys.exit(1)
+        wanted = set()
+        todo = list(args.only)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(by_name[name].deps)
+        stages = [stage for stage in stages if stage.name in wanted]
+
+    jobs = args.jobs or os.cpu_count() or 1
+    start = time.time()
+    results = run_graph(stages, jobs, args.log_dir)
+    wall_time = time.time() - start
+    write_report(results, args.report, wall_time, jobs)
+
+    failed = [r["name"] for r in results if r["status"] == "failed"]
+    skipped = [r["name"] for r in results if r["status"] == "skipped"]
+    print(f"\n{len(results) - len(failed) - len(skipped)} passed, {len(failed)} failed, "
+          f"{len(skipped)} skipped in {wall_time:.1f}s (report: {args.report})")
+    for name in failed:
+        print(f"  failed: {name} (log: {args.log_dir}/{name}.log)")
+    print(f"Engine log: {args.ht_env}/logs/engine.log")
+    sys.exit(1 if failed or skipped else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+# Profiles the check and parse| blocks of a generated decoder against a
+# sample log corpus (e.g. combined_logs.log from collect_pipeline_files.py).
+#
+# Every line is run through the decoder's blocks in order, recording per
+# block how often its check passes and its parse matches, and what each
+# evaluation costs. Blocks that never fire are listed. The operands of
+# top-level AND checks are reordered so the cheap, selective ones run
+# first (the result doesn't depend on the order); parse alternatives are
+# only suggested, since the first matching one wins.
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import Counter
+
+import yaml
+
+from decoder_eval import (CheckError, Undetermined, apply_statement, compile_check,
+                          compile_parse, conjuncts, event_from_line, parse_block_field)
+from yaml_loader import SafeDumper, load_yaml
+
+DEFAULT_FIELDS = ("message", "event.original")
+DEFAULT_MIN_GAIN = 0.05
+
+
+def timer_overhead(rounds=10000):
+    """Cost of one perf_counter() pair, taken off every measurement."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        time.perf_counter()
+    return (time.perf_counter() - start) / rounds
+
+
+class BlockStats:
+    """Evaluations, hits and cost of one block."""
+
+    def __init__(self, index, block):
+        self.index = index
+        self.block = block
+        self.check = block.get("check")
+        self.parse = parse_block_field(block)
+        self.kind = "parse" if self.parse else "check" if self.check else "map"
+        self.error = None
+        self.conjuncts = []
+        if self.check:
+            try:
+                self.conjuncts = [(text, compile_check(text)) for text in conjuncts(self.check)]
+            except CheckError as e:
+                self.error = str(e)
+        self.patterns = []
+        if self.parse:
+            try:
+                self.patterns = [compile_parse(expression) for expression in self.parse[1]]
+            except (re.error, KeyError) as e:
+                self.error = f"{type(e).__name__}: {e}"
+        self.evaluated = 0
+        self.passed = 0
+        self.undetermined = 0
+        # Outcome of every operand (True, False or None when undetermined)
+        # per event, to replay any operand order
+        self.outcomes = Counter()
+        self.conjunct_time = [0.0] * len(self.conjuncts)
+        self.parse_attempts = 0
+        self.first_matches = [0] * len(self.patterns)
+        self.matches = [0] * len(self.patterns)
+        self.pattern_time = [0.0] * len(self.patterns)
+        self.overlaps = 0
+
+    def run_check(self, event, overhead):
+        """Whether the block's check lets the event through, None if the
+        evaluator can't tell."""
+        if self.error:
+            return None
+        if not self.check:
+            return True
+        outcome = []
+        for position, (_, check) in enumerate(self.conjuncts):
+            start = time.perf_counter()
+            try:
+                result = bool(check(event))
+            except Undetermined:
+                result = None
+            self.conjunct_time[position] += max(time.perf_counter() - start - overhead, 0.0)
+            outcome.append(result)
+        outcome = tuple(outcome)
+        self.outcomes[outcome] += 1
+        if False in outcome:
+            return False
+        return None if None in outcome else True
+
+    def run_parse(self, event, overhead):
+        """Fields captured by the first matching expression, None if none
+        matches."""
+        field, _ = self.parse
+        try:
+            value = event.lookup(field)
+        except Undetermined:
+            value = None
+        self.parse_attempts += 1
+        first = None
+        matched = 0
+        for position, pattern in enumerate(self.patterns):
+            start = time.perf_counter()
+            captured = pattern.match(value)
+            self.pattern_time[position] += max(time.perf_counter() - start - overhead, 0.0)
+            if captured is not None:
+                matched += 1
+                self.matches[position] += 1
+                if first is None:
+                    first = captured
+                    self.first_matches[position] += 1
+        if matched > 1:
+            self.overlaps += 1
+        return first
+
+    def run(self, event, overhead):
+        """Run the block on event, True if it went through."""
+        self.evaluated += 1
+        passed = self.run_check(event, overhead)
+        if passed is None:
+            self.undetermined += 1
+            return False
+        if not passed:
+            return False
+        if self.parse:
+            captured = self.run_parse(event, overhead)
+            if captured is None:
+                return False
+            for field, value in captured.items():
+                event.assign(field, value)
+        self.passed += 1
+        for statement in self.block.get("map") or []:
+            apply_statement(event, statement)
+        return True
+
+    # Costs, in seconds per evaluation
+
+    def mean(self, total, count):
+        return total / count if count else 0.0
+
+    def operand_costs(self):
+        evaluations = sum(self.outcomes.values())
+        return [self.mean(t, evaluations) for t in self.conjunct_time]
+
+    def check_cost(self, order=None):
+        """Mean cost of the check with short-circuit evaluation of its
+        operands in `order` (default: as written)."""
+        if not self.outcomes:
+            return 0.0
+        costs = self.operand_costs()
+        order = order or list(range(len(self.conjuncts)))
+        total = 0.0
+        for outcome, count in self.outcomes.items():
+            for position in order:
+                total += costs[position] * count
+                if outcome[position] is False:
+                    break
+        return total / sum(self.outcomes.values())
+
+    def parse_cost(self, order=None):
+        """Mean cost of a parse, trying the expressions in order until one
+        matches."""
+        if not self.parse_attempts:
+            return 0.0
+        order = order or list(range(len(self.patterns)))
+        total = 0.0
+        costs = [self.mean(t, self.parse_attempts) for t in self.pattern_time]
+        for position in order:
+            remaining = self.parse_attempts - sum(self.first_matches[p] for p in order[:order.index(position)])
+            total += costs[position] * remaining
+        return total / self.parse_attempts
+
+    def pass_rate(self, position):
+        determined = [(o[position], c) for o, c in self.outcomes.items() if o[position] is not None]
+        count = sum(c for _, c in determined)
+        return sum(c for o, c in determined if o) / count if count else None
+
+    def suggested_check_order(self):
+        """Operands by cost / (1 - pass rate), the order minimizing the
+        expected cost of independent operands. None if no better."""
+        if len(self.conjuncts) < 2 or not self.outcomes:
+            return None
+        costs = self.operand_costs()
+
+        def rank(position):
+            rate = self.pass_rate(position)
+            if rate is None or rate >= 1:
+                return float("inf"), position
+            return costs[position] / (1 - rate), position
+
+        order = sorted(range(len(self.conjuncts)), key=rank)
+        if order == list(range(len(self.conjuncts))):
+            return None
+        return order
+
+    def suggested_parse_order(self):
+        """Expressions by first-match hits, None if already in that order."""
+        if len(self.patterns) < 2 or not self.parse_attempts:
+            return None
+        order = sorted(range(len(self.patterns)), key=lambda p: (-self.first_matches[p], p))
+        if order == list(range(len(self.patterns))):
+            return None
+        return order
+
+    def to_dict(self):
+        entry = {
+            "index": self.index,
+            "kind": self.kind,
+            "check": self.check,
+            "evaluated": self.evaluated,
+            "passed": self.passed,
+            "undetermined": self.undetermined,
+            "hit_rate": self.passed / self.evaluated if self.evaluated else None,
+        }
+        if self.error:
+            entry["error"] = self.error
+        if self.check:
+            entry["check_cost_us"] = self.check_cost() * 1e6
+        if len(self.conjuncts) > 1:
+            costs = self.operand_costs()
+            entry["operands"] = [
+                {"check": text, "pass_rate": self.pass_rate(i), "cost_us": costs[i] * 1e6}
+                for i, (text, _) in enumerate(self.conjuncts)]
+        if self.parse:
+            entry["parse"] = {
+                "field": self.parse[0],
+                "attempts": self.parse_attempts,
+                "overlaps": self.overlaps,
+                "cost_us": self.parse_cost() * 1e6,
+                "expressions": [
+                    {"expression": pattern.expression, "first_matches": self.first_matches[i],
+                     "matches": self.matches[i],
+                     "cost_us": self.mean(self.pattern_time[i], self.parse_attempts) * 1e6}
+                    for i, pattern in enumerate(self.patterns)],
+            }
+        return entry
+
+
+class Suggestion:
+    def __init__(self, stats, kind, order, before, after, safe):
+        self.stats = stats
+        self.kind = kind
+        self.order = order
+        self.before = before
+        self.after = after
+        self.safe = safe
+
+    @property
+    def gain(self):
+        return 1 - self.after / self.before if self.before else 0.0
+
+    def describe(self):
+        if self.kind == "check":
+            items = [self.stats.conjuncts[p][0] for p in self.order]
+            what = " AND ".join(items)
+        else:
+            what = ", ".join(f"#{p}" for p in self.order)
+        note = "" if self.safe else (" (first match wins: only if the expressions can't"
+                                     f" match the same line, {self.stats.overlaps} sample"
+                                     " lines matched several)")
+        return (f"block {self.stats.index} {self.kind}: {what}  "
+                f"[{self.before * 1e6:.2f} -> {self.after * 1e6:.2f} us, "
+                f"-{self.gain:.0%}]{note}")
+
+    def to_dict(self):
+        return {"block": self.stats.index, "kind": self.kind, "order": self.order,
+                "cost_us": self.before * 1e6, "suggested_cost_us": self.after * 1e6,
+                "safe": self.safe}
+
+
+def profile_decoder(decoder, lines, fields=DEFAULT_FIELDS):
+    """Run lines through the decoder, returns (BlockStats list, events).
+    A decoder-level check or parse| is block -1."""
+    header = {k: v for k, v in decoder.items() if k == "check" or k.startswith("parse|")}
+    blocks = [BlockStats(-1, header)] if header else []
+    blocks += [BlockStats(i, block) for i, block in enumerate(decoder.get("normalize") or [])
+               if isinstance(block, dict)]
+    overhead = timer_overhead()
+    events = 0
+    for line in lines:
+        events += 1
+        event = event_from_line(line, fields)
+        for stats in blocks:
+            if not stats.run(event, overhead) and stats.index < 0:
+                # The decoder doesn't accept the event
+                break
+    return blocks, events
+
+
+def suggestions(blocks, min_gain=DEFAULT_MIN_GAIN):
+    found = []
+    for stats in blocks:
+        order = stats.suggested_check_order()
+        if order is not None:
+            found.append(Suggestion(stats, "check", order, stats.check_cost(),
+                                    stats.check_cost(order), True))
+        order = stats.suggested_parse_order()
+        if order is not None:
+            found.append(Suggestion(stats, "parse", order, stats.parse_cost(),
+                                    stats.parse_cost(order), stats.overlaps == 0))
+    return [s for s in found if s.gain >= min_gain]
+
+
+def apply_suggestions(decoder, found, reorder_parse=False):
+    """The decoder with the suggested check orders (and the parse ones
+    that never overlapped on the sample, with reorder_parse) applied."""
+    decoder = dict(decoder)
+    normalize = [dict(block) if isinstance(block, dict) else block
+                 for block in decoder.get("normalize") or []]
+    applied = 0
+    for suggestion in found:
+        stats = suggestion.stats
+        target = decoder if stats.index < 0 else normalize[stats.index]
+        if suggestion.kind == "check":
+            target["check"] = " AND ".join(stats.conjuncts[p][0] for p in suggestion.order)
+        elif reorder_parse and suggestion.safe:
+            field, expressions = stats.parse
+            target[f"parse|{field}"] = [expressions[p] for p in suggestion.order]
+        else:
+            continue
+        applied += 1
+    if "normalize" in decoder:
+        decoder["normalize"] = normalize
+    return decoder, applied
+
+
+def read_corpus(path, limit=None):
+    lines = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            lines.append(line)
+            if limit and len(lines) >= limit:
+                break
+    return lines
+
+
+def expression_text(stats):
+    if stats.kind == "parse":
+        return f"{stats.check}  parse|{stats.parse[0]} ({len(stats.patterns)})"
+    return stats.check or "-"
+
+
+def print_report(blocks, events):
+    print(f"{events} events\n")
+    print(f"{'Block':>5}  {'Kind':<5}  {'Evaluated':>9}  {'Hit rate':>8}  {'Undet.':>6}  "
+          f"{'Cost us':>8}  Expression")
+    for stats in blocks:
+        if stats.kind == "map":
+            continue
+        rate = f"{stats.passed / stats.evaluated:.1%}" if stats.evaluated else "-"
+        cost = stats.check_cost() + stats.parse_cost() * (
+            stats.parse_attempts / stats.evaluated if stats.evaluated else 0)
+        label = "hdr" if stats.index < 0 else stats.index
+        print(f"{label:>5}  {stats.kind:<5}  {stats.evaluated:>9}  {rate:>8}  "
+              f"{stats.undetermined:>6}  {cost * 1e6:>8.2f}  {expression_text(stats)}")
+        if stats.error:
+            print(f"{'':>7}not evaluated: {stats.error}")
+
+    never = [s for s in blocks if s.kind != "map" and s.evaluated and not s.passed
+             and not s.undetermined and not s.error]
+    if never:
+        print("\nNever fired:")
+        for stats in never:
+            print(f"  block {stats.index}: {expression_text(stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the hit rate and cost of a decoder's check and parse "
+                    "blocks on sample logs, and reorder checks accordingly"
+    )
+    parser.add_argument("decoder", help="Generated decoder file")
+    parser.add_argument("corpus", help="Sample logs, one per line (e.g. combined_logs.log)")
+    parser.add_argument("-f", "--field", action="append",
+                        help="Field each line is put in (repeatable, "
+                             f"default: {', '.join(DEFAULT_FIELDS)})")
+    parser.add_argument("-n", "--limit", type=int, help="Only use the first N lines")
+    parser.add_argument("--min-gain", type=float, default=DEFAULT_MIN_GAIN,
+                        help=f"Smallest cost reduction worth suggesting (default: {DEFAULT_MIN_GAIN})")
+    parser.add_argument("--json", metavar="FILE", help="Write the per-block stats as JSON")
+    parser.add_argument("--apply", metavar="OUTPUT",
+                        help="Write the decoder with the suggested check orders applied")
+    parser.add_argument("--reorder-parse", action="store_true",
+                        help="With --apply, also reorder parse expressions that never "
+                             "matched the same sample line")
+    args = parser.parse_args()
+
+    try:
+        decoder = load_yaml(args.decoder)
+        lines = read_corpus(args.corpus, args.limit)
+    except (OSError, yaml.YAMLError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not isinstance(decoder, dict):
+        print(f"Error: '{args.decoder}' is not a decoder")
+        sys.exit(1)
+
+    blocks, events = profile_decoder(decoder, lines, tuple(args.field or DEFAULT_FIELDS))
+    print_report(blocks, events)
+    found = suggestions(blocks, args.min_gain)
+    if found:
+        print("\nSuggested orders:")
+        for suggestion in found:
+            print(f"  {suggestion.describe()}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"decoder": args.decoder, "corpus": args.corpus, "events": events,
+                       "blocks": [stats.to_dict() for stats in blocks],
+                       "suggestions": [s.to_dict() for s in found]}, f, indent=2)
+        print(f"\nStats written to {args.json}", file=sys.stderr)
+
+    if args.apply:
+        result, applied = apply_suggestions(decoder, found, args.reorder_parse)
+        with open(args.apply, "w") as f:
+            f.write(yaml.dump(result, Dumper=SafeDumper))
+        print(f"{applied} reordering(s) applied, written to {args.apply}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
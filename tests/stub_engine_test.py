@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+# Stand-in for engine-test: reads events from stdin and prints one JSON
+# document per line, like `engine-test -c CONF run NAME` does.
+#
+# Lines containing DROP get no output, lines containing LATER are printed
+# after all the others, and with --no-original event.original isn't
+# echoed back.
+
+import json
+import sys
+
+
+def output(line, echo):
+    event = {"message": line.upper()}
+    if echo:
+        event["event"] = {"original": line}
+    return json.dumps(event, indent=2)
+
+
+def main():
+    echo = "--no-original" not in sys.argv
+    print("engine-test stub ready")
+    later = []
+    for line in sys.stdin:
+        line = line.rstrip("\n")
+        if "DROP" in line:
+            continue
+        if "LATER" in line:
+            later.append(line)
+            continue
+        print(output(line, echo), flush=True)
+    for line in later:
+        print(output(line, echo), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import http.server
+import json
+import threading
+import time
+
+import pytest
+
+import collect_pipeline_files as collect
+
+PIPELINE = collect.pipeline_test_path("demo")
+
+
+class GitHubStandIn(http.server.ThreadingHTTPServer):
+    """Serves a contents API listing under /contents and raw files under
+    /raw, with ETags. Files named slow-* answer late so downloads finish
+    out of order."""
+
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        if self.path == f"/contents/{PIPELINE}":
+            body = json.dumps([{"name": name, "path": f"{PIPELINE}/{name}"}
+                               for name in server.files]).encode()
+            etag = None
+        elif self.path.startswith(f"/raw/{PIPELINE}/"):
+            name = self.path.rsplit("/", 1)[-1]
+            if name not in server.files:
+                return self.reply(404, b"")
+            if name.startswith("slow-"):
+                time.sleep(0.2)
+            body = server.files[name]
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            if self.headers.get("If-None-Match") == etag:
+                server.requests.append((name, 304))
+                return self.reply(304, b"", etag)
+            server.requests.append((name, 200))
+        else:
+            return self.reply(404, b"")
+        self.reply(200, body, etag)
+
+    def reply(self, status, body, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github(monkeypatch):
+    server = GitHubStandIn({
+        "slow-a.log": b"a1\na2",
+        "b.log": b"b1",
+        "slow-a.log-expected.json": b'{"a": 1}',
+        "c.log": b"c1",
+        "b.log-expected.json": b'{"b": 1}',
+        "config.yml": b"ignored",
+    })
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(collect, "BASE_URL", f"{server.url}/contents")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def collect_files(github, cache_dir):
+    source = collect.GitHubSource(jobs=4, cache_dir=cache_dir, raw_base_url=f"{github.url}/raw")
+    collect.merge_files(source, source.list_files("demo"))
+    return {name: open(name, "rb").read() for name in collect.OUTPUTS.values()}
+
+
+def test_output_follows_listing_order(github, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    outputs = collect_files(github, tmp_path / "cache")
+    assert outputs["combined_logs.log"] == b"a1\na2\nb1\nc1\n"
+    assert outputs["combined_expected.json"] == b'{"a": 1}\n{"b": 1}\n'
+
+
+def test_unchanged_files_are_reused(github, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = collect_files(github, tmp_path / "cache")
+    assert sorted(status for _, status in github.requests) == [200] * 5
+
+    github.requests.clear()
+    github.files["c.log"] = b"c2"
+    second = collect_files(github, tmp_path / "cache")
+    assert sorted(github.requests) == [
+        ("b.log", 304), ("b.log-expected.json", 304), ("c.log", 200),
+        ("slow-a.log", 304), ("slow-a.log-expected.json", 304)]
+    assert second["combined_logs.log"] == b"a1\na2\nb1\nc2\n"
+    assert second["combined_expected.json"] == first["combined_expected.json"]
+
+
+def test_connection_error_is_a_fetch_error(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    # Nothing listens on a port a closed server just released
+    server = GitHubStandIn({})
+    server.server_close()
+    monkeypatch.setattr(collect, "BASE_URL", f"{server.url}/contents")
+    monkeypatch.setattr("sys.argv", ["collect_pipeline_files.py", "demo",
+                                     "--cache-dir", str(tmp_path / "cache")])
+    with pytest.raises(SystemExit) as exit_info:
+        collect.main()
+    assert exit_info.value.code == 1
+    assert capsys.readouterr().out.startswith("Error fetching files:")
@@ -0,0 +1,174 @@
+import http.server
+import json
+import socketserver
+import threading
+
+import pytest
+
+import engine_client
+from engine_client import EngineClient, EngineError, IntegrationManager
+
+
+class FakeEngine(socketserver.UnixStreamServer):
+    """Engine API stand-in: a catalog, KVDBs and a policy in memory. Adding
+    an asset named in fail_on is rejected. The next drop calls are
+    received but answered by closing the connection."""
+
+    def __init__(self, path, fail_on=()):
+        self.catalog, self.kvdbs, self.policy = {}, {}, []
+        self.fail_on = set(fail_on)
+        self.calls = []
+        self.drop = 0
+        super().__init__(str(path), EngineHandler)
+
+    def handle_call(self, endpoint, payload):
+        self.calls.append(endpoint)
+        if endpoint == "/catalog/resource/post":
+            name = payload["content"].split("name:", 1)[1].splitlines()[0].strip()
+            if name in self.fail_on or name in self.catalog:
+                return f"{name} already exists"
+            self.catalog[name] = payload["content"]
+        elif endpoint == "/catalog/resource/delete":
+            if self.catalog.pop(payload["name"], None) is None:
+                return f"{payload['name']} not found"
+        elif endpoint == "/kvdb/manager/post":
+            self.kvdbs[payload["name"]] = payload["path"]
+        elif endpoint == "/kvdb/manager/delete":
+            if self.kvdbs.pop(payload["name"], None) is None:
+                return f"{payload['name']} not found"
+        elif endpoint == "/policy/asset/post":
+            self.policy.append(payload["asset"])
+        elif endpoint == "/policy/asset/delete":
+            if payload["asset"] not in self.policy:
+                return f"{payload['asset']} not found"
+            self.policy.remove(payload["asset"])
+        return None
+
+
+class EngineHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        error = self.server.handle_call(self.path, payload)
+        if self.server.drop:
+            self.server.drop -= 1
+            self.close_connection = True
+            return
+        body = json.dumps({"status": "ERROR", "error": error} if error else {"status": "OK"})
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def address_string(self):
+        return "unix"
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ruleset(tmp_path):
+    root = tmp_path / "ruleset"
+    integration = root / "integrations" / "demo"
+    (integration / "kvdbs").mkdir(parents=True)
+    (integration / "kvdbs" / "demo-codes.json").write_text("{}")
+    (integration / "manifest.yml").write_text(
+        "name: integration/demo/0\n"
+        "decoders:\n  - decoder/demo-child/0\n  - decoder/demo-base/0\n"
+        "rules:\n  - rule/demo/0\n"
+        "kvdbs:\n  - demo-codes\n")
+    decoders = root / "decoders" / "demo"
+    decoders.mkdir(parents=True)
+    (decoders / "a-child.yml").write_text(
+        "name: decoder/demo-child/0\nparents:\n  - decoder/demo-base/0\n")
+    (decoders / "b-base.yml").write_text("name: decoder/demo-base/0\n")
+    (decoders / "c-unlisted.yml").write_text("name: decoder/demo-unlisted/0\n")
+    (root / "rules" / "demo").mkdir(parents=True)
+    (root / "rules" / "demo" / "demo.yml").write_text("name: rule/demo/0\n")
+    return root
+
+
+@pytest.fixture
+def engine(tmp_path, request):
+    server = FakeEngine(tmp_path / "engine.sock", getattr(request, "param", ()))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def manager(engine, ruleset, test_config=False):
+    return IntegrationManager(EngineClient(engine.server_address), ruleset,
+                              test_config=test_config)
+
+
+def test_assets_come_from_the_manifest(engine, ruleset):
+    assets = manager(engine, ruleset).integration_assets("demo")
+    assert [(t, name) for t, name, _, _ in assets] == [
+        ("kvdb", "demo-codes"),
+        ("decoder", "decoder/demo-base/0"),
+        ("decoder", "decoder/demo-child/0"),
+        ("rule", "rule/demo/0"),
+        ("integration", "integration/demo/0"),
+    ]
+
+
+def test_missing_listed_asset(engine, ruleset):
+    (ruleset / "rules" / "demo" / "demo.yml").unlink()
+    with pytest.raises(FileNotFoundError, match="rule/demo/0"):
+        manager(engine, ruleset).integration_assets("demo")
+
+
+def test_up_and_down(engine, ruleset):
+    report = manager(engine, ruleset).up("demo")
+    assert report["ok"]
+    assert sorted(engine.catalog) == ["decoder/demo-base/0", "decoder/demo-child/0",
+                                      "integration/demo/0", "rule/demo/0"]
+    assert list(engine.kvdbs) == ["demo-codes"]
+    assert engine.policy == ["integration/demo/0"]
+
+    report = manager(engine, ruleset).down("demo")
+    assert report["ok"]
+    assert not engine.catalog and not engine.kvdbs and not engine.policy
+
+
+@pytest.mark.parametrize("engine", [("rule/demo/0",)], indirect=True)
+def test_failed_up_rolls_back(engine, ruleset):
+    report = manager(engine, ruleset).up("demo")
+    assert not report["ok"]
+    assert report["error"]["step"] == "add rule/demo/0"
+    assert report["error"]["already_exists"]
+    assert report["rolled_back"] == ["add decoder/demo-child/0", "add decoder/demo-base/0",
+                                     "create kvdb demo-codes"]
+    assert not engine.catalog and not engine.kvdbs and not engine.policy
+
+
+def test_failed_test_configuration_rolls_back_up(engine, ruleset, monkeypatch):
+    commands = []
+
+    def run_engine_test(*args):
+        commands.append(args[0])
+        return (False, "engine-test: can't add") if args[0] == "add" else (True, "")
+
+    monkeypatch.setattr(engine_client, "run_engine_test", run_engine_test)
+    report = manager(engine, ruleset, test_config=True).up("demo")
+    assert not report["ok"]
+    assert report["error"]["step"] == "add test configuration"
+    assert report["rolled_back"][0] == "add integration/demo/0 to policy/wazuh/0"
+    assert commands == ["add"]
+    assert not engine.catalog and not engine.kvdbs and not engine.policy
+
+
+def test_changes_are_not_sent_twice(engine):
+    client = EngineClient(engine.server_address)
+    engine.drop = 1
+    with pytest.raises(EngineError, match="connection failed"):
+        client.add_asset("decoder", "name: decoder/once/0\n")
+    assert engine.calls == ["/catalog/resource/post"]
+
+    engine.drop = 1
+    client.get_asset("decoder/once/0")
+    assert engine.calls[1:] == ["/catalog/resource/get"] * 2
@@ -0,0 +1,37 @@
+import io
+import json
+
+import pytest
+
+from json_stream import JSONStreamReader, iter_documents
+
+NUMBERS = "1.5 -2.25e-3 10 7E+2 [3.75, 4e1]\n0.5"
+
+
+@pytest.mark.parametrize("chunk_size", range(1, len(NUMBERS) + 1))
+def test_numbers_split_across_reads(chunk_size):
+    documents = list(iter_documents(io.StringIO(NUMBERS), chunk_size))
+    assert documents == [1.5, -0.00225, 10, 700.0, 3.75, 40.0, 0.5]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7])
+def test_values_split_across_reads(chunk_size):
+    events = [{"a": 1.25, "b": [True, None, "x y"]}, {"c": {"d": 12345}}]
+    text = "\n".join(json.dumps(event) for event in events)
+    assert list(iter_documents(io.StringIO(text), chunk_size)) == events
+    text = json.dumps({"expected": events}, indent=2)
+    assert list(iter_documents(io.StringIO(text), chunk_size)) == events
+
+
+def test_large_value_is_read_geometrically():
+    class Reads(io.StringIO):
+        count = 0
+
+        def read(self, size=-1):
+            Reads.count += 1
+            return super().read(size)
+
+    value = {"events": ["x" * 100] * 10000}
+    reader = JSONStreamReader(Reads(json.dumps(value)), chunk_size=1024)
+    assert reader.value() == value
+    assert Reads.count < 15
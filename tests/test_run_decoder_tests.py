@@ -0,0 +1,115 @@
+import json
+import sys
+from pathlib import Path
+
+import run_decoder_tests
+from result_cache import ResultCache, digest_paths, integration_asset_paths
+
+STUB = str(Path(__file__).with_name("stub_engine_test.py"))
+
+
+def command(*options):
+    return [sys.executable, STUB, *options]
+
+
+def messages(results):
+    return [output and output["message"] for output, _ in results]
+
+
+def test_outputs_in_order():
+    lines = ["one", "two", "three"]
+    results = run_decoder_tests.run_session(lines, command())
+    assert messages(results) == ["ONE", "TWO", "THREE"]
+
+
+def test_out_of_order_output_is_matched_by_original():
+    lines = ["one", "LATER two", "three", "one"]
+    results = run_decoder_tests.run_session(lines, command())
+    assert messages(results) == ["ONE", "LATER TWO", "THREE", "ONE"]
+
+
+def test_dropped_event_fails_the_session():
+    lines = ["one", "DROP two", "three"]
+    results = run_decoder_tests.run_session(lines, command())
+    assert messages(results) == [None, None, None]
+
+
+def test_dropped_event_without_original_fails_the_session():
+    lines = ["one", "DROP two", "three"]
+    results = run_decoder_tests.run_session(lines, command("--no-original"))
+    assert messages(results) == [None, None, None]
+
+
+def test_failed_session_reports_errors():
+    lines = ["one", "DROP two", "LATER three"]
+    expected = [{"message": "ONE", "event": {"original": "one"}}] * 3
+    results = run_decoder_tests.run_lines(lines, command())
+    reports = list(run_decoder_tests.check_results(lines, results, expected))
+    assert [r["status"] for r in reports] == ["ERROR", "ERROR", "ERROR"]
+
+
+def test_sessions_are_matched_per_chunk():
+    lines = ["a", "LATER b", "c", "d", "DROP e", "f"]
+    results = run_decoder_tests.run_lines(lines, command(), jobs=2)
+    assert messages(results) == ["A", "LATER B", "C", None, None, None]
+
+
+def test_integration_run(tmp_path):
+    integrations = tmp_path / "ruleset" / "integrations"
+    test_dir = integrations / "demo" / "test"
+    test_dir.mkdir(parents=True)
+    (test_dir / "engine-test.conf").write_text("")
+    (test_dir / "demo_input.txt").write_text("x\nLATER y\n")
+    (test_dir / "demo_expected.json").write_text(json.dumps([
+        {"message": "X", "event": {"original": "x"}},
+        {"message": "Y", "event": {"original": "LATER y"}},
+    ]))
+    stub = tmp_path / "engine-test"
+    stub.write_text(f"#!/bin/sh\nexec {sys.executable} {STUB}\n")
+    stub.chmod(0o755)
+    reports = run_decoder_tests.run_integration_tests("demo", integrations, str(stub))
+    assert [r["status"] for r in reports] == ["PASS", "FAIL"]
+
+
+def test_failed_session_is_not_cached(tmp_path):
+    with ResultCache(tmp_path / "results.sqlite") as cache:
+        lines = ["one", "DROP two", "three"]
+        results = run_decoder_tests.run_cached_lines(lines, command(), 1, cache, "demo", "d")
+        assert [r[0] for r in results] == [None, None, None]
+        assert cache.size() == 0
+
+        lines = ["one", "LATER two"]
+        results = run_decoder_tests.run_cached_lines(lines, command(), 1, cache, "demo", "d")
+        assert [r[2] for r in results] == [False, False]
+        results = run_decoder_tests.run_cached_lines(lines, command(), 1, cache, "demo", "d")
+        assert [(r[0]["message"], r[2]) for r in results] == [("ONE", True), ("LATER TWO", True)]
+
+
+def test_cache_key_covers_parents_and_core(tmp_path):
+    ruleset = tmp_path / "ruleset"
+    integrations = ruleset / "integrations"
+    (integrations / "demo" / "test").mkdir(parents=True)
+    for directory, name, parents in [("demo", "decoder/demo/0", ["decoder/shared/0"]),
+                                     ("shared", "decoder/shared/0", ["decoder/base/0"]),
+                                     ("base", "decoder/base/0", []),
+                                     ("other", "decoder/other/0", []),
+                                     ("wazuh-core", "decoder/core/0", [])]:
+        (ruleset / "decoders" / directory).mkdir(parents=True)
+        (ruleset / "decoders" / directory / f"{directory}.yml").write_text(
+            json.dumps({"name": name, "parents": parents}))
+    paths = integration_asset_paths(integrations, "demo")
+
+    def digest():
+        return digest_paths(integration_asset_paths(integrations, "demo"))
+
+    before = digest()
+    for changed, parents in [("shared", ["decoder/base/0"]), ("base", []), ("wazuh-core", [])]:
+        (ruleset / "decoders" / changed / f"{changed}.yml").write_text(
+            json.dumps({"name": f"decoder/{changed}/0", "parents": parents, "v": 2}))
+        assert digest() != before
+        before = digest()
+    (ruleset / "decoders" / "other" / "other.yml").write_text("name: decoder/other/0\nv: 2\n")
+    assert digest() == before
+    (ruleset / ".engine-init-state.json").write_text("{}")
+    assert digest() != before
+    assert not any("other" in path.parts for path in paths)
@@ -4,9 +4,16 @@
 # DESCRIPTION:
 #     This script updates a Wazuh decoder.
 #     Usage: update-decoder.sh <decoder_name> [-d <decoder_dir>] [-f <decoder_file>] [-h]
+#            update-decoder.sh --watch [watch_decoders.py options]
+#
+#     Goes through engine_client.py when the engine API socket exists
+#     (ENGINE_API_SOCKET, default /run/wazuh-server/engine-api.socket).
 
 set -euo pipefail
 
+TOOLS_DIR=$(dirname "$(realpath "$0")")
+ENGINE_API_SOCKET=${ENGINE_API_SOCKET:-/run/wazuh-server/engine-api.socket}
+
 # Logging functions
 log_info() {
     echo "[INFO] $*" >&2
@@ -23,6 +30,7 @@ log_success() {
 usage() {
     cat << EOF
 Usage: $0 <decoder_name> [-d <decoder_dir>] [-f <decoder_file>] [-h]
+       $0 --watch [--test] [--debounce <seconds>]
 
 ARGUMENTS:
     decoder_name         Name of the decoder (required, positional)
@@ -32,11 +40,14 @@ OPTIONS:
     -d <decoder_dir>     Directory of the decoder (optional, default: same as decoder name)
     -f <decoder_file>    File containing the decoder configuration (optional, default: decoder_name.yml)
     -h                   Show this help message
+    --watch              Push every decoder under ruleset/decoders as it is saved
+                        (--test re-runs the changed integration's tests)
 
 EXAMPLES:
     $0 my-decoder
     $0 my-decoder -d custom-dir
     $0 my-decoder -f custom-file.yml
+    $0 --watch --test
 EOF
     exit 0
 }
@@ -115,6 +126,10 @@ navigate_to_repo_root() {
 
 action_update() {
     log_info "Updating decoder: $DECODER_NAME"
+    if [[ -S "$ENGINE_API_SOCKET" ]]; then
+        exec python3 "$TOOLS_DIR/engine_client.py" update-decoder "$DECODER_NAME" \
+            -r "$RULESET_DIR" -d "$DECODER_DIR" -f "$DECODER_FILE" -s "$ENGINE_API_SOCKET"
+    fi
     if ! engine-catalog -n wazuh update decoder/$DECODER_NAME/0 < decoders/$DECODER_DIR/$DECODER_FILE; then
         log_error "Failed to update decoder"
         exit 1
@@ -122,6 +137,12 @@ action_update() {
     log_success "Decoder updated successfully"
 }
 
+if [[ "${1:-}" == "--watch" ]]; then
+    shift
+    navigate_to_repo_root
+    exec python3 "$TOOLS_DIR/watch_decoders.py" -r "$RULESET_DIR" "$@"
+fi
+
 parse_args "$@"
 navigate_to_repo_root
 action_update
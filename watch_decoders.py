@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# Watches ruleset/decoders/** and pushes edited decoders to the engine.
+#
+# Changes are collected with inotify (polling where it isn't available),
+# debounced so an editor's burst of writes becomes one push, mapped to
+# their decoder/<name>/0 asset and pushed only when the content changed,
+# through one engine API connection (engine_client.py) or engine-catalog
+# when the API socket isn't there. With --test, the decoder tests of the
+# integrations that changed are re-run from the result cache.
+
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from engine_client import DEFAULT_NAMESPACE, EngineClient, EngineError, asset_name
+
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 0.5
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_decoder_file(path):
+    return path.suffix in (".yml", ".yaml") and not path.name.startswith(".")
+
+
+class InotifyWatcher:
+    """Recursive inotify watch of a directory tree (Linux only)."""
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is not available")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        for directory, _, _ in os.walk(root):
+            self.add_watch(Path(directory))
+
+    def add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+
+    def close(self):
+        os.close(self.fd)
+
+    def changes(self, timeout):
+        """Paths changed within timeout seconds, an empty set if none."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # New subdirectory, watch it and pick up what's already in it
+                    for sub, _, files in os.walk(path):
+                        self.add_watch(Path(sub))
+                        changed.update(Path(sub, f) for f in files)
+                continue
+            changed.add(path)
+        return changed
+
+
+class PollWatcher:
+    """mtime polling fallback for systems without inotify."""
+
+    def __init__(self, root, interval=DEFAULT_POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for path in self.root.rglob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def close(self):
+        pass
+
+    def changes(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self.scan()
+        changed = {p for p, s in current.items() if self.snapshot.get(p) != s}
+        changed.update(p for p in self.snapshot if p not in current)
+        self.snapshot = current
+        return changed
+
+
+def open_watcher(root, poll=False):
+    if not poll:
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            print(f"[INFO] {e}, polling instead", file=sys.stderr)
+    return PollWatcher(root)
+
+
+def debounced_changes(watcher, debounce=DEFAULT_DEBOUNCE):
+    """Block until something changes, then keep collecting until the tree
+    has been quiet for `debounce` seconds."""
+    changed = set()
+    while not changed:
+        changed = watcher.changes(3600)
+    while True:
+        more = watcher.changes(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+class DecoderPusher:
+    """Pushes changed decoder files, skipping content already pushed."""
+
+    def __init__(self, ruleset_dir, namespace=DEFAULT_NAMESPACE, socket_path=None):
+        self.ruleset_dir = Path(ruleset_dir)
+        self.decoders_dir = self.ruleset_dir / "decoders"
+        self.namespace = namespace
+        self.client = EngineClient(socket_path)
+        self.use_api = os.path.exists(self.client.socket_path)
+        self.pushed = {}
+
+    def close(self):
+        self.client.close()
+
+    def integration_of(self, path):
+        return path.relative_to(self.decoders_dir).parts[0]
+
+    def push_file(self, path):
+        """Returns the asset name if it was pushed, None if unchanged or failed."""
+        try:
+            content = path.read_text(encoding="utf-8")
+            name = asset_name(content)
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            print(f"[ERROR] {path}: {e}", file=sys.stderr)
+            return None
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if self.pushed.get(path) == digest:
+            return None
+
+        start = time.time()
+        try:
+            if self.use_api:
+                try:
+                    self.client.update_asset(name, content, self.namespace)
+                except EngineError as e:
+                    if not e.not_found:
+                        raise
+                    # A new decoder file
+                    self.client.add_asset("decoder", content, self.namespace)
+            else:
+                result = subprocess.run(
+                    ["engine-catalog", "-n", self.namespace, "update", name],
+                    input=content, capture_output=True, text=True)
+                if result.returncode != 0:
+                    raise EngineError("engine-catalog", (result.stderr or result.stdout).strip())
+        except EngineError as e:
+            print(f"[ERROR] {name}: {e.message}", file=sys.stderr)
+            return None
+        except OSError as e:
+            print(f"[ERROR] {name}: {e}", file=sys.stderr)
+            return None
+
+        self.pushed[path] = digest
+        print(f"[PUSHED] {name} ({(time.time() - start) * 1000:.0f} ms)", file=sys.stderr)
+        return name
+
+    def push(self, paths):
+        """Push the decoder files among paths, returns the integrations touched."""
+        integrations = set()
+        for path in sorted(paths):
+            if not is_decoder_file(path):
+                continue
+            if not path.exists():
+                self.pushed.pop(path, None)
+                print(f"[INFO] {path.relative_to(self.decoders_dir)} was removed, "
+                      "the asset is kept in the engine", file=sys.stderr)
+                continue
+            if self.push_file(path):
+                integrations.add(self.integration_of(path))
+        return integrations
+
+
+def run_tests(integrations, integrations_dir, cache):
+    from run_decoder_tests import run_integration_tests
+
+    for integration in sorted(integrations):
+        if Path(integrations_dir, integration, "test").is_dir():
+            run_integration_tests(integration, integrations_dir, jobs=os.cpu_count() or 1,
+                                  cache=cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Push decoders to the engine as they are edited"
+    )
+    parser.add_argument("-r", "--ruleset", default="ruleset",
+                        help="Ruleset directory (default: ./ruleset)")
+    parser.add_argument("-n", "--namespace", default=DEFAULT_NAMESPACE,
+                        help=f"Namespace (default: {DEFAULT_NAMESPACE})")
+    parser.add_argument("-s", "--socket", help="Engine API socket")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"Quiet time before pushing, in seconds (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument("-t", "--test", action="store_true",
+                        help="Re-run the tests of the changed integrations (cached)")
+    parser.add_argument("--poll", action="store_true", help="Poll instead of using inotify")
+    args = parser.parse_args()
+
+    decoders_dir = Path(args.ruleset, "decoders")
+    if not decoders_dir.is_dir():
+        print(f"Error: '{decoders_dir}' is not a directory")
+        sys.exit(1)
+
+    cache = None
+    if args.test:
+        from result_cache import ResultCache
+        cache = ResultCache()
+
+    pusher = DecoderPusher(args.ruleset, args.namespace, args.socket)
+    watcher = open_watcher(decoders_dir, args.poll)
+    via = "the engine API" if pusher.use_api else "engine-catalog"
+    print(f"[INFO] Watching {decoders_dir}, pushing through {via} (Ctrl+C to stop)",
+          file=sys.stderr)
+    try:
+        while True:
+            integrations = pusher.push(debounced_changes(watcher, args.debounce))
+            if integrations and cache is not None:
+                run_tests(integrations, Path(args.ruleset, "integrations"), cache)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        pusher.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
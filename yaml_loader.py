@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Shared YAML loading (and the dumper) for the conversion tools.
+#
+# Uses the libyaml-backed loaders when PyYAML was built with them and
+# keeps an on-disk cache of parsed documents keyed by content hash, so
+# repeated runs over an unchanged integrations checkout skip parsing.
+# The cache is bounded in size, least recently used documents are
+# removed first.
+#
+# Environment:
+#   DECODERS_UTILS_CACHE_DIR   cache location (default: ~/.cache/decoders-utils)
+#   DECODERS_UTILS_YAML_CACHE  set to 0 to disable the parsed-document cache
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import yaml
+
+import cache_dirs
+
+# libyaml is an optional build of PyYAML, fall back to the pure-Python loader
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+HAS_LIBYAML = SafeLoader is not yaml.SafeLoader
+
+# Bump when the cached representation changes
+CACHE_VERSION = 1
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+# The cache is pruned on a process's first write, then every this many
+PRUNE_EVERY = 256
+_writes = 0
+
+
+class NoTagLoader(SafeLoader):
+    pass
+
+
+# Treat unknown tags as plain strings
+NoTagLoader.add_constructor(
+    None, lambda loader, node: loader.construct_scalar(node))
+
+
+def cache_dir():
+    return cache_dirs.cache_dir("yaml")
+
+
+def cache_enabled():
+    return os.environ.get("DECODERS_UTILS_YAML_CACHE", "1") != "0"
+
+
+def cache_key(content, loader):
+    digest = hashlib.sha256()
+    digest.update(f"{CACHE_VERSION}:{loader.__name__}:".encode())
+    digest.update(content)
+    return digest.hexdigest()
+
+
+def read_cache(key):
+    path = cache_dir() / f"{key}.pickle"
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError):
+        return False, None
+    try:
+        # The mtime tracks the last use, for pruning
+        os.utime(path)
+    except OSError:
+        pass
+    return True, data
+
+
+def write_cache(key, data):
+    global _writes
+    directory = cache_dir()
+    tmp_path = None
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, directory / f"{key}.pickle")
+        tmp_path = None
+    except (OSError, pickle.PickleError):
+        # The cache is best effort, a failed write only costs a re-parse
+        return
+    finally:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    if _writes % PRUNE_EVERY == 0:
+        prune_cache()
+    _writes += 1
+
+
+def prune_cache(max_bytes=CACHE_MAX_BYTES):
+    """Remove the least recently used documents until the cache fits
+    max_bytes, returns the number of entries removed."""
+    entries = []
+    for entry in cache_dir().glob("*.pickle"):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        try:
+            entry.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def load_yaml_bytes(content, loader=NoTagLoader, use_cache=None):
+    """Parse a YAML document, serving it from the cache when possible."""
+    if use_cache is None:
+        use_cache = cache_enabled()
+    if not use_cache:
+        return yaml.load(content, Loader=loader)
+
+    key = cache_key(content, loader)
+    hit, data = read_cache(key)
+    if hit:
+        return data
+    data = yaml.load(content, Loader=loader)
+    write_cache(key, data)
+    return data
+
+
+def load_yaml(file_path, loader=NoTagLoader, use_cache=None):
+    """Load a YAML file. Unknown tags are kept as plain strings by default."""
+    with open(file_path, "rb") as f:
+        content = f.read()
+    return load_yaml_bytes(content, loader, use_cache)
+
+
+def clear_cache():
+    """Remove every cached document, returns the number of entries removed."""
+    removed = 0
+    for entry in cache_dir().glob("*.pickle"):
+        try:
+            entry.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed